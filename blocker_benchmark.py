@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Content blocker benchmarks, on synthetic lists shaped like EasyList
+    Usage: ./blocker_benchmark.py [benchmark...]
+    Without arguments, all benchmarks are run. Lists are written to a
+    temporary directory. Exit status is 1 if a check failed (memory: peak
+    RSS over MEMORY_LIMIT, phishing: wrong lookup)
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from random import Random
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+
+# Must be set before GLib reads user directories
+PROFILE = mkdtemp(prefix="eolie-benchmark-")
+os.environ["XDG_DATA_HOME"] = PROFILE
+os.environ["XDG_CACHE_HOME"] = PROFILE
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gi
+gi.require_version("Gtk", "4.0")
+gi.require_version("WebKit", "6.0")
+gi.require_version("Soup", "3.0")
+from gi.repository import GLib
+
+from eolie.content_blocker_abp import AbpConverter
+from eolie.content_blocker_domains import DomainIndex
+from eolie.content_blocker_optimizer import ContentBlockerOptimizer
+from eolie.utils import write_json_items
+
+# Rules in optimizer list
+OPTIMIZE_SIZE = 60000
+# Lines in ABP list
+ABP_SIZE = 100000
+# Domains in phishing index, lookups
+PHISHING_SIZE = 1000000
+PHISHING_LOOKUPS = 100000
+# Rules file size for memory check, in bytes
+MEMORY_SIZE = 100000000
+# Peak RSS allowed while updating rules from MEMORY_SIZE file, in bytes
+MEMORY_LIMIT = 512000000
+# Rules file read in a new interpreter, peak RSS is its own
+MEMORY_STREAM = """
+import gi, sys
+gi.require_version("Gtk", "4.0")
+gi.require_version("WebKit", "6.0")
+gi.require_version("Soup", "3.0")
+from eolie.content_blocker_optimizer import ContentBlockerOptimizer
+from eolie.utils import get_json_items, write_json_items
+with open(sys.argv[1], encoding="utf-8") as stream:
+    rules = ContentBlockerOptimizer().optimize(get_json_items(stream))
+    write_json_items(sys.argv[2], rules)
+"""
+# Rules file loaded at once, as before
+MEMORY_LOAD = """
+import json, sys
+with open(sys.argv[1], "rb") as f:
+    rules = json.loads(f.read().decode("utf-8"))
+with open(sys.argv[2], "wb") as f:
+    f.write(json.dumps(rules).encode("utf-8"))
+"""
+# ABP filters: blocked hosts, exceptions, element hiding and unsupported
+ABP_FILTERS = ["||ads%s.example.com^",
+               "||track%s.net^$third-party",
+               "/banner/%s/*",
+               "@@||good%s.org^$document",
+               "site%s.com##.ad-box",
+               "##.sponsor-%s",
+               "||cdn%s.io^$script,domain=a.com|b.org",
+               "! comment %s",
+               "||x%s.com^$csp=script-src",
+               "example%s.com#@#.ad",
+               "/ads[0-9]+%s/$image"]
+
+
+def print_result(name, value, unit):
+    """
+        Print a benchmark result
+        @param name as str
+        @param value as float/int
+        @param unit as str
+    """
+    if isinstance(value, float):
+        value = "%.2f" % value
+    print("%-48s %10s%s" % (name, value, unit))
+
+
+def get_rules(size):
+    """
+        Get WebKit rules: blocked hosts, some for a few domains or types,
+        element hiding for a domain, a few invalid rules and an exception
+        @param size as int
+        @return [{}]
+    """
+    random = Random(size)
+    rules = []
+    for i in range(size * 3 // 4):
+        trigger = {"url-filter": "ads%s\\.example\\.com" % random.randrange(
+            size * 2 // 3)}
+        if random.random() < 0.3:
+            trigger["if-domain"] = ["*site%s.com" % random.randrange(3000)]
+        if random.random() < 0.2:
+            trigger["resource-type"] = random.sample(
+                ["script", "image", "raw"], 2)
+        rules.append({"trigger": trigger, "action": {"type": "block"}})
+    for i in range(size // 4 - size // 100):
+        rules.append({"trigger": {"url-filter": ".*",
+                                  "if-domain": ["*s%s.org" %
+                                                random.randrange(2000)]},
+                      "action": {"type": "css-display-none",
+                                 "selector": ".ad%s" %
+                                 random.randrange(200)}})
+    # Disjunctions and counted repetitions, rejected by WebKit
+    for i in range(size // 200):
+        rules.append({"trigger": {"url-filter": "a%s|b" % i},
+                      "action": {"type": "block"}})
+        rules.append({"trigger": {"url-filter": "x%s{2}" % i},
+                      "action": {"type": "block"}})
+    rules.append({"trigger": {"url-filter": ".*", "if-domain": ["*ok.com"]},
+                  "action": {"type": "ignore-previous-rules"}})
+    return rules
+
+
+def benchmark_optimize():
+    """
+        Rules optimized before compilation
+    """
+    rules = get_rules(OPTIMIZE_SIZE)
+    optimizer = ContentBlockerOptimizer()
+    start = perf_counter()
+    optimized = list(optimizer.optimize(rules))
+    duration = perf_counter() - start
+    (invalid, duplicates, merged) = optimizer.counts
+    print_result("optimize: rules", len(rules), "")
+    print_result("optimize: optimized rules", len(optimized), "")
+    print_result("optimize: invalid, duplicates, merged",
+                 "%s, %s, %s" % (invalid, duplicates, merged), "")
+    print_result("optimize: JSON size",
+                 len(json.dumps(rules)) / 1000000, "MB")
+    print_result("optimize: optimized JSON size",
+                 len(json.dumps(optimized)) / 1000000, "MB")
+    print_result("optimize: duration", duration, "s")
+
+
+def write_abp_list(path, size):
+    """
+        Write an ABP list
+        @param path as str
+        @param size as int: lines
+    """
+    random = Random(size)
+    with open(path, "w") as f:
+        f.write("[Adblock Plus 2.0]\n")
+        for i in range(size):
+            f.write(random.choice(ABP_FILTERS) % i + "\n")
+
+
+def benchmark_abp():
+    """
+        ABP list converted while read
+    """
+    path = os.path.join(PROFILE, "abp.txt")
+    write_abp_list(path, ABP_SIZE)
+    converter = AbpConverter()
+    start = perf_counter()
+    with open(path) as f:
+        for rule in converter.convert(f):
+            pass
+    duration = perf_counter() - start
+    (lines, rules) = converter.counts
+    # Tracing slows down conversion, measure again
+    tracemalloc.start()
+    try:
+        with open(path) as f:
+            for rule in AbpConverter().convert(f):
+                pass
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    print_result("abp: lines, rules", "%s, %s" % (lines, rules), "")
+    print_result("abp: lines per second", int(lines / duration), "")
+    print_result("abp: peak allocation", peak / 1000, "kB")
+
+
+def get_big_rules(size):
+    """
+        Get blocked hosts rules
+        @param size as int: JSON size in bytes
+        @return generator of {}
+    """
+    random = Random(size)
+    count = 0
+    while size > 0:
+        rule = {"trigger": {"url-filter": "^[^:]+://+([^:/]+\\.)?"
+                            "ads%s\\.example%s\\.com[/:&?=]" % (
+                                count, random.randrange(1000000)),
+                            "resource-type": ["script", "image"]},
+                "action": {"type": "block"}}
+        size -= len(json.dumps(rule)) + 2
+        count += 1
+        yield rule
+
+
+def get_peak_rss(code, *args):
+    """
+        Run code in a new interpreter
+        @param code as str
+        @param args as [str]
+        @return int as peak RSS in bytes
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.abspath(__file__)),
+         env.get("PYTHONPATH", "")])
+    subprocess.run([sys.executable, "-c", code] + list(args),
+                   env=env, check=True)
+    # Maximum of all children: measure smaller processes first. kB on Linux
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1000
+
+
+def benchmark_memory():
+    """
+        Check peak RSS while updating rules from a big rules file
+        @return bool
+    """
+    path = os.path.join(PROFILE, "rules.json")
+    output = os.path.join(PROFILE, "compiled_rules.json")
+    write_json_items(path, get_big_rules(MEMORY_SIZE))
+    print_result("memory: rules file", os.path.getsize(path) / 1000000,
+                 "MB")
+    start = perf_counter()
+    peak = get_peak_rss(MEMORY_STREAM, path, output)
+    print_result("memory: update peak RSS", peak / 1000000, "MB")
+    print_result("memory: update duration", perf_counter() - start, "s")
+    peak_load = get_peak_rss(MEMORY_LOAD, path, output)
+    print_result("memory: loaded at once peak RSS", peak_load / 1000000,
+                 "MB")
+    if peak > MEMORY_LIMIT:
+        print("memory: peak RSS over %sMB" % (MEMORY_LIMIT // 1000000))
+        return False
+    return True
+
+
+def get_hostname(random):
+    """
+        Get a random hostname
+        @param random as Random
+        @return str
+    """
+    name = "".join(random.choice("abcdefghijklmnopqrstuvwxyz0123456789")
+                   for i in range(random.randint(6, 14)))
+    return "%s.%s" % (name, random.choice(["com", "net", "org", "xyz",
+                                           "info", "top", "co.uk"]))
+
+
+def get_phishing_rules(hostnames):
+    """
+        Get rules blocking hostnames, as in phishing list, and exceptions
+        @param hostnames as [str]
+        @return generator of {}
+    """
+    for (i, hostname) in enumerate(hostnames):
+        if i % 2:
+            url_filter = "^https?://([^/]+\\.)?" +\
+                hostname.replace(".", "\\.")
+            yield {"trigger": {"url-filter": url_filter},
+                   "action": {"type": "block"}}
+        else:
+            yield {"trigger": {"url-filter": ".*", "if-domain": [hostname]},
+                   "action": {"type": "block"}}
+    yield {"trigger": {"url-filter": "phish\\.php"},
+           "action": {"type": "block"}}
+    for hostname in hostnames[:100]:
+        yield {"trigger": {"url-filter": "^https?://%s/safe/" %
+                           hostname.replace(".", "\\.")},
+               "action": {"type": "ignore-previous-rules"}}
+
+
+def benchmark_phishing():
+    """
+        Phishing domains indexed instead of compiled
+        @return bool
+    """
+    random = Random(PHISHING_SIZE)
+    hostnames = [get_hostname(random) for i in range(PHISHING_SIZE)]
+    index = DomainIndex(os.path.join(PROFILE, "block-phishing.idx"))
+    start = perf_counter()
+    passed = len(list(index.filter_rules(get_phishing_rules(hostnames))))
+    print_result("phishing: index build", perf_counter() - start, "s")
+    # Index is set in main loop
+    while GLib.MainContext.default().iteration(False):
+        pass
+    print_result("phishing: domains indexed, rules passed",
+                 "%s, %s" % (index.count, passed), "")
+    print_result("phishing: index size", os.path.getsize(
+        os.path.join(PROFILE, "block-phishing.idx")) / 1000000, "MB")
+    # Subdomains of url-filter rules are blocked, not of if-domain ones
+    blocked = ["www.%s" % hostnames[i] if i % 2 else hostnames[i]
+               for i in random.sample(range(PHISHING_SIZE),
+                                      PHISHING_LOOKUPS)]
+    unknown = ["www.%s" % get_hostname(random)
+               for i in range(PHISHING_LOOKUPS)]
+    for (name, lookups, expected) in [("blocked", blocked, True),
+                                      ("unknown", unknown, False)]:
+        start = perf_counter()
+        found = [index.contains(hostname) for hostname in lookups]
+        duration = perf_counter() - start
+        print_result("phishing: %s lookup" % name,
+                     duration / len(lookups) * 1000000, "us")
+        if found.count(expected) != len(found):
+            print("phishing: %s lookup failed" % name)
+            return False
+    # Exceptions are for a path only
+    if not index.is_allowed("https://%s/safe/" % hostnames[0]) or\
+            index.is_allowed("https://%s/" % hostnames[0]):
+        print("phishing: exception not indexed")
+        return False
+    return True
+
+
+BENCHMARKS = {
+    "optimize": benchmark_optimize,
+    "abp": benchmark_abp,
+    "phishing": benchmark_phishing,
+    "memory": benchmark_memory,
+}
+
+
+def main():
+    """
+        Run benchmarks given on command line, all by default
+    """
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        if name not in BENCHMARKS.keys():
+            print("Unknown benchmark: %s, available: %s" % (
+                name, ", ".join(BENCHMARKS.keys())))
+            return 1
+    status = 0
+    try:
+        for name in names:
+            # Checks return False on failure
+            if BENCHMARKS[name]() is False:
+                status = 1
+    finally:
+        rmtree(PROFILE, ignore_errors=True)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Night mode CSS parser throughput
+    Usage: ./css_benchmark.py [stylesheet or directory...]
+    Without arguments, stylesheets shipped by the system are used as
+    corpus: sphinx, jquery-ui, gitweb, gtk-doc, ...
+"""
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eolie.css_parser import CSSParser
+
+# Directories with real world stylesheets on most distributions
+CORPUS_PATHS = ["/usr/share/javascript", "/usr/share/doc",
+                "/usr/share/gitweb", "/usr/share/gtk-doc"]
+# Stylesheets used from corpus paths, smallest are skipped
+CORPUS_SIZE = 20
+MIN_SIZE = 8192
+# Runs per stylesheet, best one is kept
+RUNS = 7
+
+
+def get_stylesheets(paths):
+    """
+        Get stylesheets in paths, one per name
+        @param paths as [str]: files or directories
+        @return [str]
+    """
+    stylesheets = {}
+    for path in paths:
+        if os.path.isfile(path):
+            stylesheets[path] = path
+            continue
+        for (root, dirs, files) in os.walk(path):
+            for name in files:
+                filename = os.path.join(root, name)
+                if name.endswith(".css") and name not in stylesheets and\
+                        os.path.getsize(filename) >= MIN_SIZE:
+                    stylesheets[name] = filename
+    return sorted(stylesheets.values())
+
+
+def get_throughput(css):
+    """
+        Get parser throughput for css
+        @param css as str
+        @return (float, float) as (MB, seconds)
+    """
+    duration = None
+    for i in range(RUNS):
+        start = perf_counter()
+        CSSParser(css).parse()
+        elapsed = perf_counter() - start
+        if duration is None or elapsed < duration:
+            duration = elapsed
+    return (len(css.encode("utf-8")) / 1000000, duration)
+
+
+def main():
+    """
+        Print throughput per stylesheet and for corpus
+    """
+    if len(sys.argv) > 1:
+        stylesheets = get_stylesheets(sys.argv[1:])
+    else:
+        stylesheets = get_stylesheets(CORPUS_PATHS)[:CORPUS_SIZE]
+    if not stylesheets:
+        print("No stylesheet found")
+        return 1
+    total_size = total_duration = 0
+    for filename in stylesheets:
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            css = f.read()
+        (size, duration) = get_throughput(css)
+        total_size += size
+        total_duration += duration
+        print("%-40s %8.1fkB %7.1fMB/s" % (
+            os.path.basename(filename)[:40], size * 1000, size / duration))
+    name = "Corpus (%s stylesheets)" % len(stylesheets)
+    print("%-40s %8.1fkB %7.1fMB/s" % (
+        name, total_size * 1000, total_size / total_duration))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
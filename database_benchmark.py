@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    History and bookmarks database benchmarks
+    Usage: ./database_benchmark.py [benchmark...]
+    Without arguments, all benchmarks are run. Databases are created in a
+    temporary profile, user profile is not used. Exit status is 1 if a
+    check failed (records: N+1 requests)
+"""
+
+import os
+import sys
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter, time
+
+# Must be set before GLib reads user directories
+PROFILE = mkdtemp(prefix="eolie-benchmark-")
+os.environ["XDG_DATA_HOME"] = PROFILE
+os.environ["XDG_CACHE_HOME"] = PROFILE
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gi
+gi.require_version("Gtk", "4.0")
+gi.require_version("WebKit", "6.0")
+gi.require_version("Soup", "3.0")
+from gi.repository import Gio
+
+from eolie.bookmarks_html import BookmarksHtmlParser
+from eolie.database_bookmarks import DatabaseBookmarks
+from eolie.database_history import DatabaseHistory
+from eolie.sqlcursor import SqlCursor
+from eolie.utils import get_sql_chunks
+
+# Calls per measure
+CALLS = 10000
+# Rows in generated history
+HISTORY_SIZE = 10000
+# History sizes for search
+SEARCH_SIZES = [10000, 100000]
+# Visits generated over VISITS_DAYS
+VISITS = 1000000
+VISITS_DAYS = 365
+# Bookmarks imported in bulk, and one by one as before
+IMPORT_SIZE = 50000
+IMPORT_SLOW_SIZE = 2000
+# Bookmarks fetched as records
+RECORDS_SIZES = [10, 2000]
+# Selective searches, as typed in URL bar
+SEARCHES = ["31337", "site42 4242", "site345.example page/12345"]
+
+
+class Application(Gio.Application):
+    """
+        Databases only need App().cursors
+    """
+
+    def __init__(self):
+        """
+            Init application
+        """
+        Gio.Application.__init__(
+            self, application_id="org.gnome.Eolie.Benchmark",
+            flags=Gio.ApplicationFlags.NON_UNIQUE)
+        self.cursors = {}
+
+
+def print_result(name, value, unit):
+    """
+        Print a benchmark result
+        @param name as str
+        @param value as float/int
+        @param unit as str
+    """
+    if isinstance(value, float):
+        value = "%.2f" % value
+    print("%-48s %10s%s" % (name, value, unit))
+
+
+def get_history(size):
+    """
+        Get a history database with size entries
+        @param size as int
+        @return DatabaseHistory
+    """
+    history = DatabaseHistory()
+    now = int(time())
+    with SqlCursor(history, True) as sql:
+        count = sql.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        sql.executemany("INSERT INTO history\
+                         (title, uri, netloc, mtime, popularity, guid)\
+                         VALUES (?, ?, ?, ?, ?, ?)",
+                        (("Page %s" % i,
+                          "https://site%s.example.org/page/%s" % (i % 500, i),
+                          "site%s.example.org" % (i % 500),
+                          now - i, i % 50, "guid%s" % i)
+                         for i in range(count, size)))
+    return history
+
+
+def benchmark_pool():
+    """
+        Per call overhead of a fresh connection against a pooled one
+    """
+    history = get_history(HISTORY_SIZE)
+    ids = [i % HISTORY_SIZE + 1 for i in range(CALLS)]
+    # What SqlCursor did for each with block before pooling
+    start = perf_counter()
+    for history_id in ids:
+        c = history.get_cursor()
+        c.execute("SELECT uri FROM history WHERE rowid=?",
+                  (history_id,)).fetchone()
+        c.close()
+    fresh = (perf_counter() - start) / CALLS
+    start = perf_counter()
+    for history_id in ids:
+        with SqlCursor(history) as sql:
+            sql.execute("SELECT uri FROM history WHERE rowid=?",
+                        (history_id,)).fetchone()
+    pooled = (perf_counter() - start) / CALLS
+    print_result("pool: fresh connection per call", fresh * 1000000, "us")
+    print_result("pool: pooled connection per call", pooled * 1000000, "us")
+
+
+def benchmark_search():
+    """
+        URL bar search with a full LIKE scan against FTS5
+    """
+    for size in SEARCH_SIZES:
+        history = get_history(size)
+        # Used when FTS5 is missing, this was the only search before
+        search_like = history._DatabaseHistory__search_like
+        for (name, search) in [
+                ("LIKE", lambda words: search_like(words.split(), 10)),
+                ("FTS5", lambda words: history.search(words, 10))]:
+            start = perf_counter()
+            for words in SEARCHES:
+                search(words)
+            duration = (perf_counter() - start) / len(SEARCHES)
+            print_result("search: %s, %s rows" % (name, size),
+                         duration * 1000, "ms")
+
+
+def benchmark_visits():
+    """
+        Day view and page visits with and without history_atime indexes
+    """
+    history = get_history(HISTORY_SIZE)
+    now = int(time())
+    with SqlCursor(history, True) as sql:
+        sql.execute("DELETE FROM history_atime")
+        sql.executemany("INSERT OR IGNORE INTO history_atime\
+                         (history_id, atime) VALUES (?, ?)",
+                        ((i * 7919 % HISTORY_SIZE + 1,
+                          now - i * 86400 * VISITS_DAYS // VISITS)
+                         for i in range(VISITS)))
+    days = [now - day * 86400 for day in range(0, VISITS_DAYS, 30)]
+    ids = list(range(1, HISTORY_SIZE + 1, HISTORY_SIZE // 100))
+    for name in ["indexes", "no index"]:
+        if name == "no index":
+            # As before history_atime was indexed
+            with SqlCursor(history, True) as sql:
+                sql.execute("DROP INDEX idx_atime_id")
+                sql.execute("DROP INDEX idx_atime")
+        start = perf_counter()
+        for atime in days:
+            history.get(atime)
+        day_view = (perf_counter() - start) / len(days)
+        start = perf_counter()
+        for history_id in ids:
+            history.get_atimes(history_id)
+        atimes = (perf_counter() - start) / len(ids)
+        print_result("visits: day view, %s" % name, day_view * 1000, "ms")
+        print_result("visits: page visits, %s" % name, atimes * 1000, "ms")
+    with SqlCursor(history, True) as sql:
+        sql.execute("CREATE UNIQUE INDEX idx_atime_id\
+                     ON history_atime(history_id, atime)")
+        sql.execute("CREATE INDEX idx_atime ON history_atime(atime)")
+    start = perf_counter()
+    history.compact_atimes()
+    print_result("visits: compact %s visits" % VISITS,
+                 perf_counter() - start, "s")
+
+
+def get_bookmarks():
+    """
+        Get an empty bookmarks database
+        @return DatabaseBookmarks
+    """
+    SqlCursor.evict(True)
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(DatabaseBookmarks.DB_PATH + suffix):
+            os.remove(DatabaseBookmarks.DB_PATH + suffix)
+    return DatabaseBookmarks()
+
+
+def write_bookmarks_html(path, size):
+    """
+        Write a Netscape bookmarks file, 100 bookmarks per folder, a third
+        of them tagged
+        @param path as str
+        @param size as int
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<DL><p>\n")
+        for i in range(size):
+            if i % 100 == 0:
+                if i != 0:
+                    f.write("</DL><p>\n")
+                f.write("<DT><H3>Folder %s</H3>\n<DL><p>\n" % (i // 100))
+            tags = ' TAGS="tag%s,tag%s"' % (i % 7, i % 13) if i % 3 else ""
+            f.write('<DT><A HREF="https://site%s.example.org/%s"%s>'
+                    "Bookmark %s</A>\n" % (i % 1000, i, tags, i))
+        f.write("</DL><p>\n</DL><p>\n")
+
+
+def benchmark_import():
+    """
+        Bookmarks import in bulk against one bookmark at a time
+    """
+    path = os.path.join(PROFILE, "bookmarks.html")
+    write_bookmarks_html(path, IMPORT_SLOW_SIZE)
+    bookmarks = get_bookmarks()
+    parser = BookmarksHtmlParser()
+    with open(path, "r", encoding="utf-8") as f:
+        parser.feed(f.read())
+    parser.close()
+    # What importers did for each bookmark before bulk import
+    start = perf_counter()
+    SqlCursor.add(bookmarks)
+    for (position, (title, uri, tags)) in enumerate(
+            parser.pop_bookmarks()):
+        if bookmarks.get_id(uri) is None:
+            bookmark_id = bookmarks.add(title, uri, None, tags, 0)
+            bookmarks.set_position(bookmark_id, position)
+    SqlCursor.remove(bookmarks)
+    print_result("import: %s bookmarks, one at a time" % IMPORT_SLOW_SIZE,
+                 perf_counter() - start, "s")
+    for size in [IMPORT_SLOW_SIZE, IMPORT_SIZE]:
+        write_bookmarks_html(path, size)
+        bookmarks = get_bookmarks()
+        start = perf_counter()
+        count = bookmarks.import_html(path)
+        print_result("import: %s bookmarks, bulk" % count,
+                     perf_counter() - start, "s")
+
+
+def get_statements(db, function, *args):
+    """
+        Get SQL statements run by function
+        @param db as Database
+        @param function as function
+        @param args as function arguments
+        @return [str]
+    """
+    statements = []
+    # Nested cursors in this thread share the pooled connection
+    with SqlCursor(db) as sql:
+        sql.set_trace_callback(statements.append)
+        try:
+            function(*args)
+        finally:
+            sql.set_trace_callback(None)
+    return statements
+
+
+def benchmark_records():
+    """
+        Requests to fetch bookmark records, fails on N+1 requests
+    """
+    path = os.path.join(PROFILE, "bookmarks.html")
+    write_bookmarks_html(path, max(RECORDS_SIZES))
+    bookmarks = get_bookmarks()
+    bookmarks.import_html(path)
+    with SqlCursor(bookmarks) as sql:
+        all_ids = [row[0] for row in sql.execute(
+            "SELECT rowid FROM bookmarks ORDER BY rowid")]
+    passed = True
+    for size in RECORDS_SIZES:
+        ids = all_ids[:size]
+        # What callers did before get_records()
+        getters = get_statements(bookmarks, lambda: [
+            (bookmarks.get_guid(bookmark_id),
+             bookmarks.get_uri(bookmark_id),
+             bookmarks.get_title(bookmark_id),
+             bookmarks.get_position(bookmark_id),
+             bookmarks.get_parent_guid(bookmark_id),
+             bookmarks.get_parent_name(bookmark_id),
+             bookmarks.get_tags(bookmark_id))
+            for bookmark_id in ids])
+        start = perf_counter()
+        records = get_statements(bookmarks, bookmarks.get_records, ids)
+        duration = perf_counter() - start
+        # One request for rows and one for tags per chunk
+        expected = 2 * len(list(get_sql_chunks(ids)))
+        print_result("records: %s bookmarks, getters" % size,
+                     len(getters), " requests")
+        print_result("records: %s bookmarks, get_records()" % size,
+                     len(records), " requests")
+        print_result("records: %s bookmarks, get_records()" % size,
+                     duration * 1000, "ms")
+        if len(records) > expected:
+            print("records: FAILED, %s requests, expected %s" % (
+                len(records), expected))
+            passed = False
+    return passed
+
+
+BENCHMARKS = {
+    "pool": benchmark_pool,
+    "search": benchmark_search,
+    "visits": benchmark_visits,
+    "import": benchmark_import,
+    "records": benchmark_records,
+}
+
+
+def main():
+    """
+        Run benchmarks given on command line, all by default
+    """
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        if name not in BENCHMARKS.keys():
+            print("Unknown benchmark: %s, available: %s" % (
+                name, ", ".join(BENCHMARKS.keys())))
+            return 1
+    Application().set_default()
+    status = 0
+    try:
+        for name in names:
+            # Checks return False on failure
+            if BENCHMARKS[name]() is False:
+                status = 1
+    finally:
+        SqlCursor.evict(True)
+        rmtree(PROFILE, ignore_errors=True)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
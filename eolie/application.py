@@ -22,7 +22,7 @@ from threading import current_thread
 from gettext import gettext as _
 from pickle import dump, load
 from urllib.parse import urlparse
-from time import time
+from time import time, monotonic
 from getpass import getuser
 from signal import signal, SIGINT, SIGTERM
 import gc
@@ -39,11 +39,16 @@ from eolie.content_blocker_phishing import PhishingContentBlocker
 from eolie.database_history import DatabaseHistory
 from eolie.database_bookmarks import DatabaseBookmarks
 from eolie.database_settings import DatabaseSettings
+from eolie.database_writer import DatabaseWriter
 from eolie.sqlcursor import SqlCursor
 from eolie.search import Search
 from eolie.download_manager import DownloadManager
 from eolie.menu_pages import PagesMenu
 from eolie.helper_task import TaskHelper
+from eolie.css_stylesheet_cache import StyleSheetCache
+from eolie.css_downloader import CSSDownloader
+from eolie.helper_database import DatabaseHelper
+from eolie.maintenance_scheduler import MaintenanceScheduler
 from eolie.define import EOLIE_DATA_PATH, TimeSpan, TimeSpanValues, LoadingType
 from eolie.define import StartPage
 from eolie.utils import is_unity, wanted_loading_type
@@ -57,6 +62,8 @@ class Application(Gtk.Application):
     """
 
     __FAVICONS_PATH = "/tmp/eolie_%s" % getuser()
+    # Milliseconds to wait for content filters before loading pages
+    __CONTENT_FILTERS_TIMEOUT = 3000
 
     def __init__(self, version, data_dir, app_id):
         """
@@ -70,6 +77,10 @@ class Application(Gtk.Application):
         self.__data_dir = data_dir
         self.__app_id = app_id
         self.__content_blockers = []
+        self.__content_blockers_ready = False
+        self.__content_blockers_start = None
+        # Callbacks waiting for content filters: [(callback, *args)]
+        self.__content_blockers_callbacks = []
         signal(SIGINT, lambda a, b: self.quit())
         signal(SIGTERM, lambda a, b: self.quit())
         # Set main thread name
@@ -168,15 +179,18 @@ class Application(Gtk.Application):
                 self.__unity.set_property("progress", fraction)
                 self.__unity.set_property("progress_visible", fraction != 1.0)
 
-    def quit(self, vacuum=False):
+    def quit(self):
         """
             Quit application
-            @param vacuum as bool
         """
         self.__save_state()
         for window in self.windows:
             window.hide()
         # Stop pending tasks
+        self.maintenance_scheduler.stop()
+        self.stylesheet_cache.save()
+        self.database_helper.stop()
+        self.database_writer.stop()
         self.download_manager.cancel()
         for content_blocker in self.__content_blockers:
             content_blocker.stop()
@@ -196,12 +210,8 @@ class Application(Gtk.Application):
             for x in gc.garbage:
                 s = str(x)
                 print(type(x), "\n  ", s)
-        if vacuum:
-            self.task_helper.run(
-                        self.__vacuum,
-                        callback=(lambda x: Gio.Application.quit(self),))
-        else:
-            Gio.Application.quit(self)
+        SqlCursor.evict(True)
+        Gio.Application.quit(self)
 
     def get_content_blocker(self, name):
         """
@@ -213,17 +223,26 @@ class Application(Gtk.Application):
             if content_blocker.name == name:
                 return content_blocker
 
+    def run_when_content_filters_ready(self, callback, *args):
+        """
+            Run callback in main loop, wait for content filters if user
+            wants pages to be loaded with filters
+            @param callback as function
+            @param *args as callback arguments
+        """
+        if self.__content_blockers_ready or\
+                not self.settings.get_value("wait-content-filters"):
+            GLib.idle_add(callback, *args)
+        else:
+            self.__content_blockers_callbacks.append((callback, *args))
+
     @property
-    def content_filters(self):
+    def content_blockers(self):
         """
-            Get content filters
-            @return [WebKit.UserContentFilter]
+            Get content blockers
+            @return [ContentBlocker]
         """
-        filters = []
-        for content_blocker in self.__content_blockers:
-            if content_blocker.enabled:
-                filters.append(content_blocker.filter)
-        return filters
+        return self.__content_blockers
 
     @property
     def start_page(self):
@@ -283,6 +302,7 @@ class Application(Gtk.Application):
         """
             Init main application
         """
+        start = monotonic()
         Adw.init()
         self.settings = Settings.new()
         NightApplication.__init__(self)
@@ -311,21 +331,29 @@ class Application(Gtk.Application):
             styleContext = Gtk.StyleContext()
             styleContext.add_provider_for_screen(
                 screen, cssProvider, Gtk.STYLE_PROVIDER_PRIORITY_USER + 1)
+        Logger.debug("Application::__init(): settings and sync in %.3fs",
+                     monotonic() - start)
+        start = monotonic()
+        self.database_writer = DatabaseWriter()
+        self.database_helper = DatabaseHelper()
         self.history = DatabaseHistory()
         self.bookmarks = DatabaseBookmarks()
         self.websettings = DatabaseSettings()
-        for cls in [AdContentBlocker,
-                    PopupsContentBlocker,
-                    ImagesContentBlocker,
-                    MediasContentBlocker,
-                    ScriptsContentBlocker,
-                    PhishingContentBlocker]:
-            content_blocker = cls()
-            content_blocker.connect("set-filter",
-                                    self.__on_content_blocker_set_filter)
-            content_blocker.connect("unset-filter",
-                                    self.__on_content_blocker_unset_filter)
-            self.__content_blockers.append(content_blocker)
+        Logger.debug("Application::__init(): databases in %.3fs",
+                     monotonic() - start)
+        # Do not delay first window
+        GLib.idle_add(self.__init_content_blockers,
+                      [AdContentBlocker,
+                       PopupsContentBlocker,
+                       ImagesContentBlocker,
+                       MediasContentBlocker,
+                       ScriptsContentBlocker,
+                       PhishingContentBlocker],
+                      monotonic())
+        # Do not hold pages forever
+        GLib.timeout_add(self.__CONTENT_FILTERS_TIMEOUT,
+                         self.__set_content_blockers_ready)
+        start = monotonic()
         self.art = Art()
 
         # Get a default user agent for search
@@ -333,8 +361,13 @@ class Application(Gtk.Application):
         self.search = Search(settings.get_user_agent())
 
         self.task_helper = TaskHelper()
+        self.stylesheet_cache = StyleSheetCache()
+        self.css_downloader = CSSDownloader()
+        self.maintenance_scheduler = MaintenanceScheduler()
         self.download_manager = DownloadManager()
         self.pages_menu = PagesMenu()
+        Logger.debug("Application::__init(): helpers in %.3fs",
+                     monotonic() - start)
 
         # Check MOZ_PLUGIN_PATH
         if self.settings.get_value('enable-plugins') and\
@@ -408,23 +441,42 @@ class Application(Gtk.Application):
         self.set_accels_for_action("win.shortcut::mse_enabled",
                                    ["<Control>m"])
 
-    def __vacuum(self):
-        """
-            VACUUM DB
-            @thread safe
-        """
-        try:
-            with SqlCursor(self.bookmarks) as sql:
-                sql.isolation_level = None
-                sql.execute("VACUUM")
-                sql.isolation_level = ""
-            with SqlCursor(self.history) as sql:
-                sql.isolation_level = None
-                sql.execute("VACUUM")
-                sql.isolation_level = ""
-        except Exception as e:
-            Logger.error("Application::__vacuum(): %s ", e)
-        self.art.vacuum()
+    def __init_content_blockers(self, classes, start):
+        """
+            Init one content blocker per main loop iteration
+            @param classes as [class]
+            @param start as float
+            @return bool
+        """
+        cls = classes.pop(0)
+        stage_start = monotonic()
+        content_blocker = cls()
+        content_blocker.connect("set-filter",
+                                self.__on_content_blocker_set_filter)
+        content_blocker.connect("unset-filter",
+                                self.__on_content_blocker_unset_filter)
+        content_blocker.connect("loaded", self.__on_content_blocker_loaded)
+        self.__content_blockers.append(content_blocker)
+        Logger.debug("Application::__init_content_blockers(): %s in %.3fs",
+                     content_blocker.name, monotonic() - stage_start)
+        if classes:
+            return True
+        Logger.debug("Application::__init_content_blockers(): all in %.3fs",
+                     monotonic() - start)
+        self.__content_blockers_start = start
+        self.__on_content_blocker_loaded(None)
+        return False
+
+    def __set_content_blockers_ready(self):
+        """
+            Run callbacks waiting for content filters
+        """
+        if self.__content_blockers_ready:
+            return
+        self.__content_blockers_ready = True
+        for (callback, *args) in self.__content_blockers_callbacks:
+            GLib.idle_add(callback, *args)
+        self.__content_blockers_callbacks = []
 
     def __save_state(self):
         """
@@ -588,7 +640,7 @@ class Application(Gtk.Application):
                 GLib.timeout_add(10000, self.__clean_state_cache, state.wid)
             window.destroy()
         else:
-            self.quit(True)
+            self.quit()
 
     def __try_closing(self, window, webviews):
         """
@@ -723,23 +775,39 @@ class Application(Gtk.Application):
 
     def __on_content_blocker_set_filter(self, content_blocker, content_filter):
         """
-            Add filter to content manager
+            Update web views content filters
             @param content_blocker as ContentBlocker
             @param content_filter as WebKit.UserContentFilter
         """
         for window in self.windows:
             for webview in window.container.webviews:
-                content_manager = webview.get_user_content_manager()
-                content_manager.add_filter(content_filter)
+                webview.update_content_filters(webview.uri)
+                webview.update_cosmetic_filter(webview.uri)
+
+    def __on_content_blocker_loaded(self, content_blocker):
+        """
+            Check if all content filters are loaded
+            @param content_blocker as ContentBlocker/None
+        """
+        if self.__content_blockers_start is None or\
+                self.__content_blockers_ready:
+            return
+        for blocker in self.__content_blockers:
+            if not blocker.loaded:
+                return
+        Logger.debug("Application::__on_content_blocker_loaded():"
+                     " content filters ready in %.3fs",
+                     monotonic() - self.__content_blockers_start)
+        self.__set_content_blockers_ready()
 
     def __on_content_blocker_unset_filter(self, content_blocker,
                                           content_filter):
         """
-            Remove filter from content manager
+            Update web views content filters
             @param content_blocker as ContentBlocker
             @param content_filter as WebKit.UserContentFilter
         """
         for window in self.windows:
             for webview in window.container.webviews:
-                content_manager = webview.get_user_content_manager()
-                content_manager.remove_filter(content_filter)
+                webview.update_content_filters(webview.uri)
+                webview.update_cosmetic_filter(webview.uri)
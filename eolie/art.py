@@ -192,25 +192,34 @@ class Art:
         else:
             return False
 
-    def vacuum(self):
+    def vacuum(self, count=100):
         """
-            Remove artwork older than 1 month
+            Remove artwork older than 1 year, count files at a time
+            @param count as int
+            @return generator of reclaimed bytes, one per chunk of files
         """
         current_time = time()
         try:
             d = Gio.File.new_for_path("%s/art" % EOLIE_CACHE_PATH)
-            children = d.enumerate_children("standard::name",
-                                            Gio.FileQueryInfoFlags.NONE,
-                                            None)
-            for child in children:
-                f = children.get_child(child)
-                if child.get_file_type() == Gio.FileType.REGULAR:
-                    info = f.query_info("time::modified",
-                                        Gio.FileQueryInfoFlags.NONE,
-                                        None)
+            children = d.enumerate_children(
+                "standard::name,standard::type,standard::size,"
+                "time::modified",
+                Gio.FileQueryInfoFlags.NONE,
+                None)
+            while True:
+                infos = children.next_files(count, None)
+                if not infos:
+                    break
+                reclaimed = 0
+                for info in infos:
+                    if info.get_file_type() != Gio.FileType.REGULAR:
+                        continue
                     mtime = info.get_attribute_uint64("time::modified")
                     if current_time - mtime > 31536000:
-                        f.delete()
+                        children.get_child(info).delete()
+                        reclaimed += info.get_size()
+                yield reclaimed
+            children.close(None)
         except Exception as e:
             Logger.error("Art::vacuum(): %s", e)
 
@@ -0,0 +1,108 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from html.parser import HTMLParser
+
+
+class BookmarksHtmlParser(HTMLParser):
+    """
+        Incremental parser for Netscape bookmark files
+        Feed it with chunks and pop parsed bookmarks as they come
+    """
+
+    def __init__(self):
+        """
+            Init parser
+        """
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.__bookmarks = []
+        # Folder names, one per opened <DL>
+        self.__folders = []
+        self.__folder = None
+        self.__text = None
+        self.__href = None
+        self.__tags = None
+
+    def pop_bookmarks(self):
+        """
+            Get bookmarks parsed since last call
+            @return [(str, str, [str])] as (title, uri, tags)
+        """
+        bookmarks = self.__bookmarks
+        self.__bookmarks = []
+        return bookmarks
+
+    def handle_starttag(self, tag, attrs):
+        """
+            Track folders and links
+            @param tag as str
+            @param attrs as [(str, str)]
+        """
+        if tag == "h3":
+            self.__text = []
+        elif tag == "a":
+            attrs = dict(attrs)
+            self.__text = []
+            self.__href = attrs.get("href")
+            self.__tags = attrs.get("tags")
+        elif tag == "dl":
+            if self.__folder is None:
+                self.__folder = self.__get_parent_name()
+            self.__folders.append(self.__folder)
+            self.__folder = None
+
+    def handle_endtag(self, tag):
+        """
+            Track folders and links
+            @param tag as str
+        """
+        if self.__text is None:
+            if tag == "dl" and self.__folders:
+                self.__folders.pop(-1)
+            return
+        title = "".join(self.__text).strip()
+        if tag == "h3":
+            self.__folder = title
+            self.__text = None
+        elif tag == "a":
+            # Links without uri are folders for some exporters
+            if self.__href is None:
+                self.__folder = title
+            else:
+                if self.__tags:
+                    tags = [tag.strip() for tag in self.__tags.split(",")]
+                else:
+                    tags = [self.__get_parent_name()]
+                self.__bookmarks.append((title, self.__href, tags))
+            self.__text = None
+
+    def handle_data(self, data):
+        """
+            Collect title text
+            @param data as str
+        """
+        if self.__text is not None:
+            self.__text.append(data)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_parent_name(self):
+        """
+            Get current folder name
+            @return str
+        """
+        if self.__folder is not None:
+            return self.__folder
+        elif self.__folders:
+            return self.__folders[-1]
+        return ""
@@ -123,7 +123,9 @@ class StackContainer:
             return
         webviews.remove(webview)
         webviews_count = len(webviews)
-        App().history.set_page_state(webview.uri)
+        App().database_writer.queue(App().history.set_page_state,
+                                    webview.uri,
+                                    key=("page-state", webview.uri))
         # Needed to unfocus titlebar
         self._window.set_focus(None)
         was_current = webview == self._window.container.webview
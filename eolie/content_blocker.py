@@ -10,14 +10,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gio, GObject, GLib, WebKit
+from gi.repository import Gio, GObject, GLib, WebKit, Soup
 
 import json
+import re
+from os import replace, remove
+from hashlib import md5
+from itertools import chain
+from time import monotonic
 
 from eolie.helper_task import TaskHelper
-from eolie.utils import emit_signal
+from eolie.utils import emit_signal, get_json_items, write_json_items
 from eolie.define import EOLIE_DATA_PATH, App
 from eolie.content_blocker_exceptions import ContentBlockerExceptions
+from eolie.content_blocker_optimizer import ContentBlockerOptimizer
+from eolie.content_blocker_abp import AbpConverter
 from eolie.logger import Logger
 
 
@@ -27,11 +34,17 @@ class ContentBlocker(GObject.Object):
     """
     _DB_PATH = "%s/content_blocker" % EOLIE_DATA_PATH
     _JSON_PATH = "%s/content_blocker_json" % EOLIE_DATA_PATH
+    # Rules sources, downloaded by _download_sources(), WebKit JSON or
+    # Adblock Plus filters
+    _SOURCES = []
+    # Session shared by all blockers
+    __session = None
     __gsignals__ = {
         "set-filter": (GObject.SignalFlags.RUN_FIRST, None,
                        (GObject.TYPE_PYOBJECT,)),
         "unset-filter": (GObject.SignalFlags.RUN_FIRST, None,
-                         (GObject.TYPE_PYOBJECT,))
+                         (GObject.TYPE_PYOBJECT,)),
+        "loaded": (GObject.SignalFlags.RUN_FIRST, None, ())
     }
 
     def __init__(self, name):
@@ -42,6 +55,13 @@ class ContentBlocker(GObject.Object):
         try:
             GObject.Object.__init__(self)
             self.__filter = None
+            # Exception rules compiled in filter, None if unknown
+            self.__compiled_exceptions = None
+            # Rules file to compile if store can't load filter
+            self.__pending = None
+            self.__loading = False
+            self.__loaded = False
+            self.__save_start = None
             self.__name = name
             self.__exceptions = ContentBlockerExceptions(name)
             self._cancellable = Gio.Cancellable.new()
@@ -60,30 +80,42 @@ class ContentBlocker(GObject.Object):
         """
             Load from store
         """
+        self.__loading = True
         self.__store.load(self.__name, self._cancellable,
                           self.__on_store_load)
 
-    def save(self, bytes):
+    def save(self, f, checksum):
         """
-            Save to store
+            Save to store, load previous filter if rules didn't change
+            @param f as Gio.File: JSON rules
+            @param checksum as str: rules file checksum
         """
-        self.__store.save(self.__name, GLib.Bytes(bytes), self._cancellable,
-                          self.__on_store_save)
+        (previous, duration) = self.__get_checksum()
+        if checksum == previous:
+            Logger.debug("ContentBlocker::save(): %s unchanged,"
+                         " saved %.3fs of compilation",
+                         self.__name, duration)
+            self.__pending = (f, checksum)
+            if not self.__loading:
+                self.load()
+            return
+        self.__pending = None
+        self.__save_start = monotonic()
+        self.__store.save_from_file(self.__name, f, self._cancellable,
+                                    self.__on_store_save, checksum)
 
     def update(self):
         """
             Update current filters with new exceptions
         """
         try:
-            f = Gio.File.new_for_path(
-                "%s/%s.json" % (self._JSON_PATH, self.__name))
-            if f.query_exists():
-                (status, content, tag) = f.load_contents(None)
-                if status:
-                    rules = json.loads(content.decode("utf-8"))
-                    self._task_helper.run(self._save_rules, rules)
-            else:
-                self._task_helper.run(self._save_rules, self.DEFAULT)
+            # Domain exceptions only change which web views get filter
+            if self.__filter is not None and\
+                    self.__exceptions.rules == self.__compiled_exceptions:
+                if self.enabled:
+                    emit_signal(self, "set-filter", self.__filter)
+                return
+            self._compile()
         except Exception as e:
             Logger.error("ContentBlocker::update(): %s", e)
 
@@ -93,6 +125,7 @@ class ContentBlocker(GObject.Object):
         """
         self._cancellable.cancel()
         self._cancellable = Gio.Cancellable.new()
+        self.__exceptions.flush()
 
     @property
     def exceptions(self):
@@ -118,6 +151,14 @@ class ContentBlocker(GObject.Object):
         """
         return self.__name
 
+    @property
+    def loaded(self):
+        """
+            True if first filter load finished or blocker is disabled
+            @return bool
+        """
+        return self.__loaded or not self.enabled
+
     @property
     def enabled(self):
         """
@@ -129,24 +170,361 @@ class ContentBlocker(GObject.Object):
 #######################
 # PROTECTED           #
 #######################
+    def _download_sources(self):
+        """
+            Download sources concurrently, only sources that changed since
+            last download are transferred. Rules are updated if one changed
+        """
+        if not Gio.NetworkMonitor.get_default().get_network_available():
+            return
+        if ContentBlocker.__session is None:
+            ContentBlocker.__session = Soup.Session.new()
+        validators = self.__get_validators()
+        sources = self._get_sources()
+        # Rules from removed sources need a merge too
+        removed = [uri for uri in validators.keys() if uri not in sources]
+        for uri in removed:
+            del validators[uri]
+            f = self.__get_source_file(uri)
+            if f.query_exists():
+                f.delete(None)
+        # [pending downloads, sources changed]
+        state = [len(sources), bool(removed)]
+        for uri in sources:
+            message = Soup.Message.new("GET", uri)
+            headers = message.get_request_headers()
+            (etag, modified) = validators.get(uri, (None, None))
+            if self.__get_source_file(uri).query_exists():
+                if etag is not None:
+                    headers.append("If-None-Match", etag)
+                if modified is not None:
+                    headers.append("If-Modified-Since", modified)
+            ContentBlocker.__session.send_async(
+                message, GLib.PRIORITY_LOW, self._cancellable,
+                self.__on_send, message, uri, validators, state)
+
+    def _get_sources(self):
+        """
+            Get rules sources
+            @return [str]
+        """
+        return self._SOURCES
+
+    def _compile(self):
+        """
+            Compile rules file, default rules if missing
+        """
+        f = Gio.File.new_for_path(
+            "%s/%s.json" % (self._JSON_PATH, self.__name))
+        if f.query_exists():
+            self._task_helper.run(self._save_rules,
+                                  self.__get_file_rules(f.get_path()))
+        else:
+            self._task_helper.run(self._save_rules, self.DEFAULT)
+
     def _save_rules(self, rules):
         """
-            Save rules to file
-            @param uri as str
-            @param rules []
+            Save rules to file and compile it
+            @param rules as iterable of {}
         """
         try:
-            new_rules = list(rules)
-            if self.__exceptions is not None:
-                new_rules += self.__exceptions.rules
-            bytes = json.dumps(new_rules).encode("utf-8")
-            self.save(bytes)
+            exceptions = self.__exceptions.rules
+            rules = ContentBlockerOptimizer().optimize(
+                chain(rules, exceptions))
+            f = Gio.File.new_for_path(
+                "%s/compiled_%s.json" % (self._JSON_PATH, self.__name))
+            checksum = write_json_items(f.get_path(), rules)
+            del rules
+            self.save(f, checksum)
+            self.__compiled_exceptions = exceptions
         except Exception as e:
             Logger.error("ContentBlocker::_save_rules(): %s", e)
 
 #######################
 # PRIVATE             #
 #######################
+    def __get_file_rules(self, path):
+        """
+            Read rules from JSON file, item by item
+            @param path as str
+            @return generator of {}
+        """
+        with open(path, "r", encoding="utf-8") as stream:
+            for rule in get_json_items(stream):
+                yield rule
+
+    def __is_json(self, content):
+        """
+            True if content is a JSON rules list, else Adblock Plus filters
+            @param content as bytes
+            @return bool
+        """
+        # Adblock Plus lists start with [Adblock Plus 2.0]
+        return re.match(rb"\s*\[\s*[{\]]", content) is not None
+
+    def __get_source_file(self, uri):
+        """
+            Get file caching source content
+            @param uri as str
+            @return Gio.File
+        """
+        encoded = md5(uri.encode("utf-8")).hexdigest()
+        return Gio.File.new_for_path(
+            "%s/%s_%s.json" % (self._JSON_PATH, self.__name, encoded))
+
+    def __get_validators_file(self):
+        """
+            Get file storing sources HTTP validators
+            @return Gio.File
+        """
+        return Gio.File.new_for_path(
+            "%s/sources_%s.json" % (self._JSON_PATH, self.__name))
+
+    def __get_validators(self):
+        """
+            Get HTTP validators for sources
+            @return {str: (str, str)} as {uri: (etag, last modified)}
+        """
+        try:
+            f = self.__get_validators_file()
+            if f.query_exists():
+                (status, content, tag) = f.load_contents(None)
+                if status:
+                    validators = json.loads(content.decode("utf-8"))
+                    return {uri: tuple(value)
+                            for (uri, value) in validators.items()}
+        except Exception as e:
+            Logger.error("ContentBlocker::__get_validators(): %s", e)
+        return {}
+
+    def __merge_sources(self, validators):
+        """
+            Merge sources into rules file and compile it
+            @param validators as {str: (str, str)}
+            @thread safe
+        """
+        try:
+            path = "%s/%s.json" % (self._JSON_PATH, self.__name)
+            self.__write_rules(path, self.__get_sources_rules())
+            # Only trust validators once rules are saved
+            content = json.dumps(validators).encode("utf-8")
+            self.__get_validators_file().replace_contents(
+                content,
+                None,
+                False,
+                Gio.FileCreateFlags.REPLACE_DESTINATION,
+                None)
+            self._save_rules(self.__get_file_rules(path))
+        except Exception as e:
+            Logger.error("ContentBlocker::__merge_sources(): %s", e)
+
+    def __get_sources_rules(self):
+        """
+            Read rules from cached sources, item by item
+            @return generator of {}
+        """
+        # ABP exceptions apply to all filters, WebKit only ignores rules
+        # before an ignore-previous-rules rule
+        exceptions = []
+        for uri in self._get_sources():
+            f = self.__get_source_file(uri)
+            if not f.query_exists():
+                continue
+            try:
+                with open(f.get_path(), "rb") as stream:
+                    is_json = self.__is_json(stream.read(64))
+                if is_json:
+                    for rule in self.__get_file_rules(f.get_path()):
+                        yield rule
+                    continue
+                # Convert line by line
+                converter = AbpConverter()
+                with open(f.get_path(), "r", encoding="utf-8",
+                          errors="replace") as stream:
+                    for rule in converter.convert(stream):
+                        if rule["action"]["type"] == "ignore-previous-rules":
+                            exceptions.append(rule)
+                        else:
+                            yield rule
+                Logger.debug("ContentBlocker::__get_sources_rules(): %s,"
+                             " %s lines -> %s rules", uri, *converter.counts)
+            except Exception as e:
+                Logger.error("ContentBlocker::__get_sources_rules():"
+                             " %s, %s", uri, e)
+        for rule in exceptions:
+            yield rule
+
+    def __is_valid_source(self, path):
+        """
+            True if downloaded source can be read as rules
+            @param path as str
+            @return bool
+            @thread safe
+        """
+        try:
+            with open(path, "rb") as stream:
+                head = stream.read(64)
+            if self.__is_json(head):
+                for rule in self.__get_file_rules(path):
+                    if not isinstance(rule, dict) or\
+                            "trigger" not in rule or "action" not in rule:
+                        return False
+                return True
+            # Error pages served with a 200 status
+            if head.lstrip()[:1] in [b"<", b"{"]:
+                return False
+            with open(path, "r", encoding="utf-8",
+                      errors="replace") as stream:
+                for rule in AbpConverter().convert(stream):
+                    return True
+        except Exception as e:
+            Logger.error("ContentBlocker::__is_valid_source(): %s", e)
+        return False
+
+    def __set_source_done(self, validators, state):
+        """
+            Merge sources once all are downloaded
+            @param validators as {str: (str, str)}
+            @param state as [int, bool]
+        """
+        state[0] -= 1
+        if state[0] == 0 and state[1]:
+            self._task_helper.run(self.__merge_sources, validators)
+
+    def __on_send(self, session, result, message, uri, validators, state):
+        """
+            Write source content to disk if changed
+            @param session as Soup.Session
+            @param result as Gio.AsyncResult
+            @param message as Soup.Message
+            @param uri as str
+            @param validators as {str: (str, str)}
+            @param state as [int, bool]
+        """
+        try:
+            stream = session.send_finish(result)
+            status = message.get_status()
+            Logger.debug("ContentBlocker::__on_send(): %s, %s", uri, status)
+            if status == Soup.Status.OK:
+                path = self.__get_source_file(uri).get_path()
+                f = Gio.File.new_for_path(path + ".part")
+                output = f.replace(None,
+                                   False,
+                                   Gio.FileCreateFlags.REPLACE_DESTINATION,
+                                   None)
+                output.splice_async(
+                    stream,
+                    Gio.OutputStreamSpliceFlags.CLOSE_SOURCE |
+                    Gio.OutputStreamSpliceFlags.CLOSE_TARGET,
+                    GLib.PRIORITY_LOW, self._cancellable,
+                    self.__on_splice, message, uri, validators, state)
+                return
+            stream.close(None)
+        except Exception as e:
+            Logger.error("ContentBlocker::__on_send(): %s, %s", uri, e)
+        self.__set_source_done(validators, state)
+
+    def __on_splice(self, output, result, message, uri, validators, state):
+        """
+            Replace cached source with downloaded content
+            @param output as Gio.OutputStream
+            @param result as Gio.AsyncResult
+            @param message as Soup.Message
+            @param uri as str
+            @param validators as {str: (str, str)}
+            @param state as [int, bool]
+        """
+        try:
+            output.splice_finish(result)
+            path = self.__get_source_file(uri).get_path()
+            self._task_helper.run(self.__is_valid_source, path + ".part",
+                                  callback=(self.__on_source_checked,
+                                            message, uri, validators, state))
+            return
+        except Exception as e:
+            Logger.error("ContentBlocker::__on_splice(): %s, %s", uri, e)
+        self.__set_source_done(validators, state)
+
+    def __on_source_checked(self, valid, message, uri, validators, state):
+        """
+            Replace cached source with downloaded content if valid, else
+            keep previous content and validators
+            @param valid as bool
+            @param message as Soup.Message
+            @param uri as str
+            @param validators as {str: (str, str)}
+            @param state as [int, bool]
+        """
+        path = self.__get_source_file(uri).get_path()
+        try:
+            if valid:
+                replace(path + ".part", path)
+                headers = message.get_response_headers()
+                validators[uri] = (headers.get_one("ETag"),
+                                   headers.get_one("Last-Modified"))
+                state[1] = True
+            else:
+                Logger.warning("ContentBlocker::__on_source_checked():"
+                               " invalid content, %s", uri)
+                remove(path + ".part")
+        except Exception as e:
+            Logger.error("ContentBlocker::__on_source_checked(): %s, %s",
+                         uri, e)
+        self.__set_source_done(validators, state)
+
+    def __get_checksum_file(self):
+        """
+            Get file storing checksum of compiled rules
+            @return Gio.File
+        """
+        return Gio.File.new_for_path(
+            "%s/%s.md5" % (self._DB_PATH, self.__name))
+
+    def __get_checksum(self):
+        """
+            Get checksum of compiled rules and compilation duration
+            @return (str, float)/(None, 0)
+        """
+        try:
+            f = self.__get_checksum_file()
+            if f.query_exists():
+                (status, content, tag) = f.load_contents(None)
+                if status:
+                    (checksum, duration) = content.decode("utf-8").split()
+                    return (checksum, float(duration))
+        except Exception as e:
+            Logger.error("ContentBlocker::__get_checksum(): %s", e)
+        return (None, 0)
+
+    def __set_checksum(self, checksum, duration):
+        """
+            Store checksum of compiled rules
+            @param checksum as str/None
+            @param duration as float
+        """
+        try:
+            f = self.__get_checksum_file()
+            if checksum is None:
+                if f.query_exists():
+                    f.delete(None)
+            else:
+                content = "%s %s" % (checksum, duration)
+                f.replace_contents(content.encode("utf-8"),
+                                   None,
+                                   False,
+                                   Gio.FileCreateFlags.REPLACE_DESTINATION,
+                                   None)
+        except Exception as e:
+            Logger.error("ContentBlocker::__set_checksum(): %s", e)
+
+    def __set_loaded(self):
+        """
+            Notify first filter load
+        """
+        if not self.__loaded:
+            self.__loaded = True
+            emit_signal(self, "loaded")
+
     def __on_store_load(self, store, result):
         """
             Notify for new filter
@@ -154,23 +532,37 @@ class ContentBlocker(GObject.Object):
             @param result as Gio.AsyncResult
             @param encoded as str
         """
+        self.__loading = False
         try:
-            self.__filter = store.save_finish(result)
+            self.__filter = store.load_finish(result)
+            self.__pending = None
             if self.enabled:
                 emit_signal(self, "set-filter", self.__filter)
+            self.__set_loaded()
         except Exception as e:
+            # On first run, loaded once rules are compiled or on timeout
             Logger.error("ContentBlocker::__on_store_load(): %s", e)
+            # Store lost our filter, compile it again
+            if self.__pending is not None:
+                self.__set_checksum(None, 0)
+                self.save(*self.__pending)
 
-    def __on_store_save(self, store, result):
+    def __on_store_save(self, store, result, checksum):
         """
             Notify for new filter
             @param store as WebKit.UserContentFilterStore
             @param result as Gio.AsyncResult
+            @param checksum as str
         """
         try:
-            self.__filter = store.load_finish(result)
+            self.__filter = store.save_finish(result)
+            duration = monotonic() - self.__save_start
+            Logger.debug("ContentBlocker::__on_store_save(): %s compiled"
+                         " in %.3fs", self.__name, duration)
+            self.__set_checksum(checksum, duration)
             if self.enabled:
                 emit_signal(self, "set-filter", self.__filter)
+            self.__set_loaded()
         except Exception as e:
             Logger.error("ContentBlocker::__on_store_save(): %s", e)
 
@@ -0,0 +1,264 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+
+class AbpConverter:
+    """
+        Convert Adblock Plus filters to WebKit content blocker rules
+        Lines are converted one by one, unsupported filters are skipped
+    """
+    # ABP option: WebKit resource types
+    __TYPES = {
+        "script": ["script"],
+        "image": ["image"],
+        "stylesheet": ["style-sheet"],
+        "xmlhttprequest": ["raw", "fetch"],
+        "document": ["document"],
+        "media": ["media"],
+        "font": ["font"],
+        "popup": ["popup"],
+        "websocket": ["websocket"],
+        "ping": ["ping"],
+        "other": ["other"]
+    }
+    # Types blocked by a filter with negated types only. ABP never blocks
+    # pages and popups that way
+    __SUBRESOURCE_TYPES = sorted({value for values in __TYPES.values()
+                                  for value in values} -
+                                 {"document", "popup"})
+    # ABP options WebKit has no resource type for (plugins)
+    __UNSUPPORTED_TYPES = ["object", "object-subrequest"]
+    # Options without effect on WebKit rules
+    __IGNORED_OPTIONS = ["important", "collapse", "~collapse"]
+    # Scheme and any subdomain
+    __DOMAIN_ANCHOR = "^[^:]+://+([^:/]+\\.)?"
+    # Escape regex specials, convert wildcard and separator
+    __TRANSLATION = str.maketrans(dict(
+        [(char, "\\" + char) for char in ".+?{}()[]\\$"] +
+        [("*", ".*"), ("^", "[/:&?=]")]))
+    # Separator also matches end of address. WebKit rejects disjunctions,
+    # so "([/:&?=]|$)" is only possible at the end of filter
+    __SEPARATOR_END = "([/:&?=].*)?$"
+    # Action of element hiding exceptions (#@#, @@...$elemhide). WebKit
+    # can not express them, CosmeticFilter consumes them and the optimizer
+    # drops them
+    HIDING_EXCEPTION = "ignore-css-display-none"
+
+    def __init__(self):
+        """
+            Init converter
+        """
+        self.__lines = 0
+        self.__rules = 0
+
+    def convert(self, lines):
+        """
+            Convert lines
+            @param lines as iterable of str
+            @return generator of {}
+        """
+        for line in lines:
+            self.__lines += 1
+            rule = self.convert_line(line.strip())
+            if rule is not None:
+                self.__rules += 1
+                yield rule
+
+    def convert_line(self, line):
+        """
+            Convert a stripped line
+            @param line as str
+            @return {}/None
+        """
+        if not line or line[0] in "![":
+            return None
+        if "#" in line:
+            index = line.find("##")
+            if index != -1:
+                return self.__convert_cosmetic(line[:index],
+                                               line[index + 2:],
+                                               "css-display-none")
+            index = line.find("#@#")
+            if index != -1:
+                return self.__convert_cosmetic(line[:index],
+                                               line[index + 3:],
+                                               self.HIDING_EXCEPTION)
+            # Extended syntax: #?#, #$#, #@?#, ...
+            elif re.search(r"#[@?$]+#", line) is not None:
+                return None
+        return self.__convert_network(line)
+
+    @property
+    def counts(self):
+        """
+            Get converted counts
+            @return (int, int) as (lines, rules)
+        """
+        return (self.__lines, self.__rules)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_domains(self, domains, separator):
+        """
+            Split domains in included and excluded domains
+            @param domains as str
+            @param separator as str
+            @return ([str], [str])
+        """
+        included = []
+        excluded = []
+        for domain in domains.split(separator):
+            domain = domain.strip().lower()
+            if domain.startswith("~"):
+                excluded.append("*%s" % domain[1:])
+            elif domain:
+                included.append("*%s" % domain)
+        return (included, excluded)
+
+    def __set_domains(self, trigger, included, excluded):
+        """
+            Set domain conditions on trigger
+            @param trigger as {}
+            @param included as [str]
+            @param excluded as [str]
+            @return bool: False if WebKit can't express it
+        """
+        # WebKit does not allow both
+        if included and excluded:
+            return False
+        if included:
+            trigger["if-domain"] = included
+        elif excluded:
+            trigger["unless-domain"] = excluded
+        return True
+
+    def __convert_cosmetic(self, domains, selector, action):
+        """
+            Convert element hiding filter or exception
+            @param domains as str
+            @param selector as str
+            @param action as str: css-display-none or HIDING_EXCEPTION
+            @return {}/None
+        """
+        if not selector:
+            return None
+        trigger = {"url-filter": ".*"}
+        (included, excluded) = self.__get_domains(domains, ",")
+        if not self.__set_domains(trigger, included, excluded):
+            return None
+        return {"trigger": trigger,
+                "action": {"type": action, "selector": selector}}
+
+    def __get_url_filter(self, pattern):
+        """
+            Get regex for ABP pattern
+            @param pattern as str
+            @return str
+        """
+        # Already a regex
+        if len(pattern) > 2 and pattern[0] == "/" and pattern[-1] == "/":
+            return pattern[1:-1]
+        prefix = ""
+        suffix = ""
+        if pattern.startswith("||"):
+            prefix = self.__DOMAIN_ANCHOR
+            pattern = pattern[2:]
+        elif pattern.startswith("|"):
+            prefix = "^"
+            pattern = pattern[1:]
+        if pattern.endswith("|"):
+            suffix = "$"
+            pattern = pattern[:-1]
+        if pattern.endswith("^"):
+            suffix = "[/:&?=]?$" if suffix else self.__SEPARATOR_END
+            pattern = pattern[:-1]
+        url_filter = prefix + pattern.translate(self.__TRANSLATION) + suffix
+        return url_filter or ".*"
+
+    def __convert_network(self, line):
+        """
+            Convert network filter
+            @param line as str
+            @return {}/None
+        """
+        action = "block"
+        if line.startswith("@@"):
+            action = "ignore-previous-rules"
+            line = line[2:]
+        trigger = {}
+        index = line.rfind("$")
+        # $ may be part of a regex
+        if index != -1 and not (line.startswith("/") and
+                                line.endswith("/")):
+            options = line[index + 1:].split(",")
+            line = line[:index]
+            types = []
+            excluded_types = []
+            unsupported = False
+            child_frame = False
+            elemhide = False
+            for option in options:
+                option = option.strip().lower()
+                if option in self.__IGNORED_OPTIONS:
+                    continue
+                elif option.startswith("domain="):
+                    (included, excluded) = self.__get_domains(option[7:],
+                                                              "|")
+                    if not self.__set_domains(trigger, included, excluded):
+                        return None
+                elif option == "third-party":
+                    trigger["load-type"] = ["third-party"]
+                elif option == "~third-party":
+                    trigger["load-type"] = ["first-party"]
+                elif option == "match-case":
+                    trigger["url-filter-is-case-sensitive"] = True
+                elif option == "subdocument":
+                    child_frame = True
+                elif option == "elemhide" and\
+                        action == "ignore-previous-rules":
+                    elemhide = True
+                elif option == "~subdocument":
+                    excluded_types.append("document")
+                elif option.lstrip("~") in self.__UNSUPPORTED_TYPES:
+                    unsupported = True
+                elif option in self.__TYPES:
+                    types += self.__TYPES[option]
+                elif option[1:] in self.__TYPES and option[0] == "~":
+                    excluded_types += self.__TYPES[option[1:]]
+                else:
+                    # csp, redirect, rewrite, generichide, ...
+                    return None
+            # Element hiding only, for matching pages. Load type, frames
+            # and resource types can't be checked for a page
+            if elemhide and not types:
+                if child_frame or excluded_types or unsupported or\
+                        "load-type" in trigger:
+                    return None
+                action = self.HIDING_EXCEPTION
+            # Load context applies to all types of rule, documents in
+            # frames can only be blocked by a rule of their own
+            elif child_frame and not types:
+                types = ["document"]
+                trigger["load-context"] = ["child-frame"]
+            # Would block other types
+            elif unsupported and not types:
+                return None
+            if excluded_types and not types:
+                types = [value for value in self.__SUBRESOURCE_TYPES
+                         if value not in excluded_types]
+            if types:
+                trigger["resource-type"] = sorted(set(types))
+        trigger["url-filter"] = self.__get_url_filter(line)
+        return {"trigger": trigger, "action": {"type": action}}
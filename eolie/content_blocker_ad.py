@@ -14,10 +14,10 @@ from gi.repository import Gio, GLib
 from gi.repository.Gio import FILE_ATTRIBUTE_STANDARD_NAME, \
                               FILE_ATTRIBUTE_TIME_MODIFIED
 
-import json
 from time import time
 
 from eolie.content_blocker import ContentBlocker
+from eolie.content_blocker_cosmetic import CosmeticFilter
 from eolie.define import ADBLOCK_URIS, App
 from eolie.logger import Logger
 
@@ -30,12 +30,15 @@ class AdContentBlocker(ContentBlocker):
     """
         A WebKit Content Blocker for ads
     """
+    _SOURCES = ADBLOCK_URIS
 
     def __init__(self):
         """
             Init adblock helper
         """
         try:
+            self.__cosmetic_filter = CosmeticFilter(
+                "%s/cosmetic_block-ads.json" % self._JSON_PATH)
             ContentBlocker.__init__(self, "block-ads")
             f = Gio.File.new_for_path(
                     "%s/block-ads.json" % self._JSON_PATH)
@@ -46,13 +49,50 @@ class AdContentBlocker(ContentBlocker):
                 mtime = int(info.get_attribute_as_string("time::modified"))
             else:
                 mtime = 0
+            App().settings.connect("changed::adblock-lists",
+                                   self.__on_lists_changed)
             if App().settings.get_value("block-ads"):
+                # Rules compiled before element hiding rules were indexed
+                if f.query_exists() and not GLib.file_test(
+                        "%s/cosmetic_block-ads.json" % self._JSON_PATH,
+                        GLib.FileTest.EXISTS):
+                    self.update()
+                else:
+                    self._task_helper.run(self.__cosmetic_filter.load)
                 GLib.timeout_add_seconds(7200, self.__download_task, True)
                 if time() - mtime > 7200:
                     GLib.timeout_add_seconds(20, self.__download_task, False)
         except Exception as e:
             Logger.error("AdContentBlocker::__init__(): %s", e)
 
+    @property
+    def cosmetic_filter(self):
+        """
+            Get element hiding rules
+            @return CosmeticFilter
+        """
+        return self.__cosmetic_filter
+
+#######################
+# PROTECTED           #
+#######################
+    def _save_rules(self, rules):
+        """
+            Index element hiding rules, save others to file and compile it
+            @param rules as iterable of {}
+        """
+        ContentBlocker._save_rules(self,
+                                   self.__cosmetic_filter.filter_rules(rules))
+
+    def _get_sources(self):
+        """
+            Get default sources and user lists
+            @return [str]
+        """
+        return self._SOURCES + [
+            uri for uri in App().settings.get_value("adblock-lists")
+            if uri not in self._SOURCES]
+
 #######################
 # PRIVATE             #
 #######################
@@ -62,50 +102,14 @@ class AdContentBlocker(ContentBlocker):
             @param loop as bool
         """
         if not Gio.NetworkMonitor.get_default().get_network_metered():
-            self.__download_uris(list(ADBLOCK_URIS))
+            self._download_sources()
         return loop
 
-    def __download_uris(self, uris, rules=[]):
-        """
-            Update database from the web
-            @param uris as [str]
-            @param data as []
-        """
-        if not Gio.NetworkMonitor.get_default().get_network_available():
-            return
-        if uris:
-            uri = uris.pop(0)
-            self._task_helper.load_uri_content(uri,
-                                               self._cancellable,
-                                               self.__on_load_uri_content,
-                                               uris,
-                                               rules)
-
-    def __on_load_uri_content(self, uri, status, content, uris, rules):
+    def __on_lists_changed(self, settings, value):
         """
-            Save loaded values
-            @param uri as str
-            @param status as bool
-            @param content as bytes
-            @param uris as [str]
-            @param rules as []
+            Download new lists
+            @param settings as Gio.Settings
+            @param value as GLib.Variant
         """
-        try:
-            Logger.debug("AdContentBlocker::__on_load_uri_content(): %s", uri)
-            if status:
-                rules += json.loads(content.decode("utf-8"))
-            if uris:
-                self.__download_uris(uris, rules)
-            elif rules:
-                # Save to sources
-                f = Gio.File.new_for_path(
-                    "%s/block-ads.json" % self._JSON_PATH)
-                content = json.dumps(rules).encode("utf-8")
-                f.replace_contents(content,
-                                   None,
-                                   False,
-                                   Gio.FileCreateFlags.REPLACE_DESTINATION,
-                                   None)
-                self._task_helper.run(self._save_rules, rules)
-        except Exception as e:
-            Logger.error("AdContentBlocker::__on_load_uri_content(): %s", e)
+        if self.enabled:
+            self._download_sources()
@@ -0,0 +1,357 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib, WebKit
+
+import json
+import re
+from os import replace
+from collections import OrderedDict
+
+from eolie.content_blocker_abp import AbpConverter
+from eolie.logger import Logger
+
+
+class CosmeticFilter:
+    """
+        Element hiding rules indexed by domain
+        In a WebKit content filter, css-display-none rules are matched for
+        every page. Here a page only gets generic selectors and selectors
+        for its domain, as a user style sheet
+    """
+    # Style sheets kept for last used hostnames
+    __CACHE_SIZE = 50
+    # Exception triggers matched against a page, other keys are not
+    __EXCEPTION_KEYS = {"url-filter", "url-filter-is-case-sensitive",
+                        "resource-type", "if-domain", "unless-domain"}
+    # Selector ending its CSS rule would inject properties or rules
+    __UNSAFE_SELECTOR = re.compile(r"[{};]")
+
+    def __init__(self, path):
+        """
+            Init filter
+            @param path as str: index file
+        """
+        self.__path = path
+        self.__index = self.__get_empty_index()
+        self.__exceptions = []
+        self.__generic_css = None
+        self.__style_sheets = OrderedDict()
+
+    def load(self):
+        """
+            Load index from disk
+            @thread safe
+        """
+        try:
+            with open(self.__path, "r", encoding="utf-8") as stream:
+                index = json.load(stream)
+            GLib.idle_add(self.__set_index, index)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Logger.error("CosmeticFilter::load(): %s", e)
+
+    def filter_rules(self, rules):
+        """
+            Index element hiding rules, pass other rules
+            Page exceptions are indexed and passed
+            Index is saved and applied once rules are consumed
+            @param rules as iterable of {}
+            @return generator of {}
+            @thread safe
+        """
+        index = self.__get_empty_index()
+        count = 0
+        for rule in rules:
+            if self.__add_rule(index, rule):
+                count += 1
+            else:
+                # Element hiding is disabled for pages allowed by list
+                if rule.get("action", {}).get("type") ==\
+                        "ignore-previous-rules":
+                    self.__add_exception(index, rule)
+                yield rule
+        # Sets are not JSON serializable
+        for key in ["generic", "unless", "domains", "exact", "visible"]:
+            if isinstance(index[key], dict):
+                index[key] = {domain: sorted(selectors)
+                              for (domain, selectors) in index[key].items()}
+            else:
+                index[key] = sorted(index[key])
+        try:
+            with open(self.__path + ".part", "w", encoding="utf-8") as stream:
+                json.dump(index, stream)
+            replace(self.__path + ".part", self.__path)
+        except Exception as e:
+            Logger.error("CosmeticFilter::filter_rules(): %s", e)
+        Logger.debug("CosmeticFilter::filter_rules(): %s rules indexed",
+                     count)
+        GLib.idle_add(self.__set_index, index)
+
+    def get_style_sheet(self, hostname):
+        """
+            Get style sheet hiding elements for hostname
+            @param hostname as str
+            @return WebKit.UserStyleSheet/None
+        """
+        if hostname in self.__style_sheets:
+            self.__style_sheets.move_to_end(hostname)
+            return self.__style_sheets[hostname]
+        domains = self.__get_domains(hostname)
+        visible = self.__get_visible_selectors(hostname, domains)
+        # List allows page, no element hiding
+        allowed = self.__is_allowed(hostname, domains)
+        if allowed:
+            css = ""
+        elif visible:
+            css = self.__get_css([selector
+                                  for selector in self.__index["generic"]
+                                  if selector not in visible])
+        else:
+            if self.__generic_css is None:
+                self.__generic_css = self.__get_css(self.__index["generic"])
+            css = self.__generic_css
+        if not allowed:
+            css += self.__get_css(
+                [selector for selector in
+                 self.__get_domain_selectors(hostname, domains)
+                 if selector not in visible])
+        if css:
+            style_sheet = WebKit.UserStyleSheet(
+                css,
+                WebKit.UserContentInjectedFrames.ALL_FRAMES,
+                WebKit.UserStyleLevel.USER,
+                None,
+                None)
+        else:
+            style_sheet = None
+        self.__style_sheets[hostname] = style_sheet
+        if len(self.__style_sheets) > self.__CACHE_SIZE:
+            self.__style_sheets.popitem(last=False)
+        return style_sheet
+
+    def get_selectors(self, hostname):
+        """
+            Get selectors to hide for hostname
+            @param hostname as str
+            @return [str]
+        """
+        domains = self.__get_domains(hostname)
+        if self.__is_allowed(hostname, domains):
+            return []
+        visible = self.__get_visible_selectors(hostname, domains)
+        return [selector for selector in list(self.__index["generic"]) +
+                self.__get_domain_selectors(hostname, domains)
+                if selector not in visible]
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_domains(self, hostname):
+        """
+            Get hostname and its parent domains
+            @param hostname as str
+            @return [str]
+        """
+        split = hostname.split(".")
+        return [".".join(split[i:]) for i in range(0, len(split))]
+
+    def __get_visible_selectors(self, hostname, domains):
+        """
+            Get selectors not to hide for hostname (#@# exceptions)
+            @param hostname as str
+            @param domains as [str]: hostname and its parent domains
+            @return set of str
+        """
+        # Missing in indexes written before exceptions were handled
+        return {selector
+                for (selector, patterns) in self.__index.get(
+                    "visible", {}).items()
+                if not patterns or self.__match(hostname, domains, patterns)}
+
+    def __is_allowed(self, hostname, domains):
+        """
+            True if a page exception matches hostname
+            Only hostname is known: exceptions for a path are not matched
+            @param hostname as str
+            @param domains as [str]: hostname and its parent domains
+            @return bool
+        """
+        for (regex, if_domain, unless_domain) in self.__exceptions:
+            if if_domain is not None and\
+                    not self.__match(hostname, domains, if_domain):
+                continue
+            if unless_domain is not None and\
+                    self.__match(hostname, domains, unless_domain):
+                continue
+            for scheme in ["https", "http"]:
+                if regex.search("%s://%s/" % (scheme, hostname)):
+                    return True
+        return False
+
+    def __get_domain_selectors(self, hostname, domains):
+        """
+            Get selectors to hide for hostname, generic ones excepted
+            @param hostname as str
+            @param domains as [str]: hostname and its parent domains
+            @return [str]
+        """
+        index = self.__index
+        selectors = []
+        for (selector, excluded) in index["unless"].items():
+            if not self.__match(hostname, domains, excluded):
+                selectors.append(selector)
+        selectors += index["exact"].get(hostname, [])
+        for domain in domains:
+            selectors += index["domains"].get(domain, [])
+        return selectors
+
+    def __get_css(self, selectors):
+        """
+            Get CSS hiding selectors
+            A rule per selector. Selectors can't end their rule (checked
+            when indexed), an invalid selector only drops its rule
+            @param selectors as [str]
+            @return str
+        """
+        return "".join("%s { display: none !important; }\n" % selector
+                       for selector in selectors)
+
+    def __get_empty_index(self):
+        """
+            Get an empty index
+            @return {}
+        """
+        # generic: [selector], unless: {selector: [excluded domain]},
+        # domains: {domain and subdomains: [selector]},
+        # exact: {domain: [selector]},
+        # visible: {selector: [if-domain pattern]}, [] for all domains,
+        # exceptions: [trigger] of pages without element hiding
+        return {"generic": set(), "unless": {}, "domains": {}, "exact": {},
+                "visible": {}, "exceptions": []}
+
+    def __match(self, hostname, domains, patterns):
+        """
+            True if hostname matches one of if-domain patterns
+            @param hostname as str
+            @param domains as [str]: hostname and its parent domains
+            @param patterns as [str]
+            @return bool
+        """
+        for pattern in patterns:
+            if pattern.startswith("*"):
+                if pattern[1:] in domains:
+                    return True
+            elif pattern == hostname:
+                return True
+        return False
+
+    def __add_exception(self, index, rule):
+        """
+            Add trigger to index if rule allows pages
+            @param index as {}
+            @param rule as {}
+        """
+        trigger = rule.get("trigger", {})
+        # Load type, frames, ... can't be checked for a hostname
+        if not set(trigger.keys()) <= self.__EXCEPTION_KEYS or\
+                "url-filter" not in trigger:
+            return
+        if "document" not in trigger.get("resource-type", ["document"]):
+            return
+        exception = {key: trigger[key]
+                     for key in ["url-filter", "url-filter-is-case-sensitive"]
+                     if key in trigger}
+        for key in ["if-domain", "unless-domain"]:
+            if key in trigger:
+                exception[key] = [domain.lower() for domain in trigger[key]]
+        index["exceptions"].append(exception)
+
+    def __add_rule(self, index, rule):
+        """
+            Add rule to index if an element hiding rule for all urls
+            @param index as {}
+            @param rule as {}
+            @return bool: True if indexed
+        """
+        try:
+            action = rule["action"]
+            trigger = rule["trigger"]
+            # Page exception without selector ($elemhide)
+            if action["type"] == AbpConverter.HIDING_EXCEPTION and\
+                    "selector" not in action:
+                self.__add_exception(index, rule)
+                return True
+            if action["type"] not in ["css-display-none",
+                                      AbpConverter.HIDING_EXCEPTION] or\
+                    trigger.get("url-filter") != ".*" or\
+                    not set(trigger.keys()) <= {"url-filter", "if-domain",
+                                                "unless-domain"}:
+                return False
+            selector = action["selector"]
+            # Dropped
+            if self.__UNSAFE_SELECTOR.search(selector) is not None:
+                return True
+            if action["type"] == AbpConverter.HIDING_EXCEPTION:
+                patterns = index["visible"].get(selector)
+                # Exceptions for all domains but some are not supported
+                if "unless-domain" in trigger:
+                    pass
+                elif "if-domain" not in trigger:
+                    index["visible"][selector] = set()
+                elif patterns is None:
+                    index["visible"][selector] = {
+                        domain.lower() for domain in trigger["if-domain"]}
+                # Empty for all domains
+                elif patterns:
+                    patterns.update(domain.lower()
+                                    for domain in trigger["if-domain"])
+            elif "if-domain" in trigger:
+                for pattern in trigger["if-domain"]:
+                    pattern = pattern.lower()
+                    if pattern.startswith("*"):
+                        key = "domains"
+                        pattern = pattern[1:]
+                    else:
+                        key = "exact"
+                    index[key].setdefault(pattern, set()).add(selector)
+            elif "unless-domain" in trigger:
+                excluded = index["unless"].setdefault(selector, set())
+                excluded.update(domain.lower()
+                                for domain in trigger["unless-domain"])
+            else:
+                index["generic"].add(selector)
+            return True
+        except Exception:
+            return False
+
+    def __set_index(self, index):
+        """
+            Use index
+            @param index as {}
+        """
+        self.__index = index
+        self.__exceptions = []
+        # Missing in indexes written before exceptions were handled
+        for trigger in index.get("exceptions", []):
+            try:
+                flags = 0 if trigger.get("url-filter-is-case-sensitive")\
+                    else re.IGNORECASE
+                self.__exceptions.append(
+                    (re.compile(trigger["url-filter"], flags),
+                     trigger.get("if-domain"),
+                     trigger.get("unless-domain")))
+            except Exception as e:
+                Logger.error("CosmeticFilter::__set_index(): %s", e)
+        self.__generic_css = None
+        self.__style_sheets = OrderedDict()
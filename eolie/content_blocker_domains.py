@@ -0,0 +1,309 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+import re
+import json
+import mmap
+from os import replace
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from urllib.parse import urlparse
+
+from eolie.logger import Logger
+
+
+class DomainIndex:
+    """
+        Blocked domains, looked up from a memory mapped file
+        File is a sorted array of 64 bits domain hashes, offsets and domains,
+        so lookups are a binary search and a string compare. Domains
+        starting with * also match subdomains. Page exceptions of list
+        follow, as JSON
+    """
+    __MAGIC = b"EDI1"
+    # Rules blocking a whole host
+    __HOST_FILTER = re.compile(
+        r"^(?:\.\*)?\^?(?:https\?|https?|\[\^:\]\+|\[a-z\]\+)://\+?"
+        r"(\(\[\^[^\]]*\]\+\\\.\)\?)?"
+        r"((?:[a-z0-9_-]+\\\.)+[a-z0-9-]+)"
+        r"(?:/|:|\$|\[[/:&?=]+\])?(?:\.\*)?$")
+
+    # Exception triggers matched against a page, other keys are not
+    __EXCEPTION_KEYS = {"url-filter", "url-filter-is-case-sensitive",
+                        "resource-type", "if-domain", "unless-domain"}
+
+    def __init__(self, path):
+        """
+            Init index
+            @param path as str: index file
+        """
+        self.__path = path
+        self.__mmap = None
+        self.__hashes = []
+        self.__offsets = []
+        self.__domains = b""
+        self.__exceptions = []
+
+    def load(self):
+        """
+            Map index from disk
+            @thread safe
+        """
+        try:
+            with open(self.__path, "rb") as stream:
+                mapped = mmap.mmap(stream.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            if mapped[:4] != self.__MAGIC:
+                raise Exception("Invalid index %s" % self.__path)
+            count = int.from_bytes(mapped[4:8], "little")
+            view = memoryview(mapped)
+            start = 8
+            end = start + count * 8
+            hashes = view[start:end].cast("Q")
+            start = end
+            end = start + (count + 1) * 4
+            offsets = view[start:end].cast("I")
+            start = end
+            end = start + offsets[count]
+            # Missing in indexes written before exceptions were handled
+            exceptions = []
+            for trigger in json.loads(bytes(view[end:]) or b"[]"):
+                flags = 0 if trigger.get("url-filter-is-case-sensitive")\
+                    else re.IGNORECASE
+                exceptions.append((re.compile(trigger["url-filter"], flags),
+                                   trigger.get("if-domain"),
+                                   trigger.get("unless-domain")))
+            GLib.idle_add(self.__set_index, mapped, hashes, offsets,
+                          view[start:end], exceptions)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Logger.error("DomainIndex::load(): %s", e)
+
+    def filter_rules(self, rules):
+        """
+            Index rules blocking whole domains, pass other rules
+            Page exceptions are indexed and passed: they cancel host rules
+            when compiled, not when indexed
+            Index is saved and loaded once rules are consumed
+            @param rules as iterable of {}
+            @return generator of {}
+            @thread safe
+        """
+        domains = set()
+        exceptions = []
+        for rule in rules:
+            rule_domains = self.__get_rule_domains(rule)
+            if rule_domains is None:
+                exception = self.__get_rule_exception(rule)
+                if exception is not None:
+                    exceptions.append(exception)
+                yield rule
+            else:
+                domains.update(rule_domains)
+        try:
+            self.__write(domains, exceptions)
+            Logger.debug("DomainIndex::filter_rules(): %s domains indexed",
+                         len(domains))
+        except Exception as e:
+            Logger.error("DomainIndex::filter_rules(): %s", e)
+        del domains
+        self.load()
+
+    def contains(self, hostname):
+        """
+            True if hostname is blocked
+            @param hostname as str
+            @return bool
+        """
+        if not self.__hashes:
+            return False
+        split = hostname.lower().rstrip(".").split(".")
+        # Top level domains are never blocked
+        for i in range(0, len(split) - 1):
+            if self.__find(".".join(split[i:]), i == 0):
+                return True
+        return False
+
+    def is_allowed(self, uri):
+        """
+            True if a page exception of list matches uri
+            @param uri as str
+            @return bool
+        """
+        hostname = (urlparse(uri).hostname or "").rstrip(".")
+        split = hostname.split(".")
+        domains = [".".join(split[i:]) for i in range(0, len(split))]
+        for (regex, if_domain, unless_domain) in self.__exceptions:
+            if if_domain is not None and\
+                    not self.__match(hostname, domains, if_domain):
+                continue
+            if unless_domain is not None and\
+                    self.__match(hostname, domains, unless_domain):
+                continue
+            if regex.search(uri) is not None:
+                return True
+        return False
+
+    @property
+    def count(self):
+        """
+            Get indexed domains count
+            @return int
+        """
+        return len(self.__hashes)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_hash(self, domain):
+        """
+            Get hash for domain
+            @param domain as str
+            @return int
+        """
+        return int.from_bytes(
+            blake2b(domain.encode("utf-8"), digest_size=8).digest(),
+            "little")
+
+    def __find(self, domain, exact):
+        """
+            True if domain is in index
+            @param domain as str
+            @param exact as bool: True to also match domains without *
+            @return bool
+        """
+        hashes = self.__hashes
+        offsets = self.__offsets
+        key = self.__get_hash(domain)
+        index = bisect_left(hashes, key)
+        while index < len(hashes) and hashes[index] == key:
+            found = bytes(
+                self.__domains[offsets[index]:offsets[index + 1]]).decode(
+                    "utf-8")
+            if found == "*" + domain or (exact and found == domain):
+                return True
+            index += 1
+        return False
+
+    def __match(self, hostname, domains, patterns):
+        """
+            True if hostname matches one of if-domain patterns
+            @param hostname as str
+            @param domains as [str]: hostname and its parent domains
+            @param patterns as [str]
+            @return bool
+        """
+        for pattern in patterns:
+            if pattern.startswith("*"):
+                if pattern[1:] in domains:
+                    return True
+            elif pattern == hostname:
+                return True
+        return False
+
+    def __get_rule_exception(self, rule):
+        """
+            Get trigger of rule if an exception for pages
+            @param rule as {}
+            @return {}/None
+        """
+        try:
+            trigger = rule["trigger"]
+            # Load type, frames, ... can't be checked for a page
+            if rule["action"]["type"] != "ignore-previous-rules" or\
+                    not set(trigger.keys()) <= self.__EXCEPTION_KEYS or\
+                    "document" not in trigger.get("resource-type",
+                                                  ["document"]):
+                return None
+            exception = {"url-filter": trigger["url-filter"]}
+            if trigger.get("url-filter-is-case-sensitive"):
+                exception["url-filter-is-case-sensitive"] = True
+            for key in ["if-domain", "unless-domain"]:
+                if key in trigger:
+                    exception[key] = [domain.lower()
+                                      for domain in trigger[key]]
+            # Checked now, index would not load
+            re.compile(exception["url-filter"])
+            return exception
+        except Exception:
+            return None
+
+    def __get_rule_domains(self, rule):
+        """
+            Get domains blocked by rule
+            @param rule as {}
+            @return [str]/None if rule does not block whole domains
+        """
+        try:
+            trigger = rule["trigger"]
+            if rule["action"]["type"] != "block":
+                return None
+            keys = set(trigger.keys())
+            if keys == {"url-filter", "if-domain"} and\
+                    trigger["url-filter"] == ".*":
+                return [domain.lower() for domain in trigger["if-domain"]
+                        if isinstance(domain, str) and domain.isascii()]
+            elif keys == {"url-filter"}:
+                match = self.__HOST_FILTER.match(trigger["url-filter"])
+                if match is not None:
+                    domain = match.group(2).replace("\\.", ".").lower()
+                    if match.group(1) is not None:
+                        domain = "*" + domain
+                    return [domain]
+        except Exception:
+            pass
+        return None
+
+    def __write(self, domains, exceptions):
+        """
+            Write index for domains
+            @param domains as set of str
+            @param exceptions as [{}]: triggers
+        """
+        entries = sorted((self.__get_hash(domain.lstrip("*")), domain)
+                         for domain in domains)
+        hashes = array("Q", (entry[0] for entry in entries))
+        offsets = array("I", [0])
+        encoded = []
+        offset = 0
+        for (key, domain) in entries:
+            data = domain.encode("utf-8")
+            encoded.append(data)
+            offset += len(data)
+            offsets.append(offset)
+        with open(self.__path + ".part", "wb") as stream:
+            stream.write(self.__MAGIC)
+            stream.write(len(entries).to_bytes(4, "little"))
+            stream.write(hashes.tobytes())
+            stream.write(offsets.tobytes())
+            stream.write(b"".join(encoded))
+            stream.write(json.dumps(exceptions).encode("utf-8"))
+        replace(self.__path + ".part", self.__path)
+
+    def __set_index(self, mapped, hashes, offsets, domains, exceptions):
+        """
+            Use mapped index
+            @param mapped as mmap.mmap
+            @param hashes as memoryview
+            @param offsets as memoryview
+            @param domains as memoryview
+            @param exceptions as [(re.Pattern, [str]/None, [str]/None)]
+        """
+        self.__mmap = mapped
+        self.__hashes = hashes
+        self.__offsets = offsets
+        self.__domains = domains
+        self.__exceptions = exceptions
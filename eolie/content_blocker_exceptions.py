@@ -10,7 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gio
+from gi.repository import Gio, GLib
 
 import json
 
@@ -21,8 +21,12 @@ from eolie.logger import Logger
 class ContentBlockerExceptions:
     """
         Exception handler
+        Rules are indexed by (domain, url filter, action type), insertion
+        order is kept as WebKit applies rules in order
     """
     __JSON_PATH = "%s/content_blocker_json" % EOLIE_DATA_PATH
+    # Milliseconds to wait for more changes before saving
+    __SAVE_DELAY = 1000
 
     def __init__(self, name):
         """
@@ -30,31 +34,39 @@ class ContentBlockerExceptions:
         """
         try:
             self.__name = name
-            self.__rules = []
+            # {(domain, url filter, action type): rule}
+            self.__rules = {}
+            # {domain: [key]}
+            self.__domains = {}
+            self.__cached_rules = None
+            self.__save_timeout_id = None
             f = Gio.File.new_for_path(
                 "%s/exceptions_%s.json" % (self.__JSON_PATH, self.__name))
             if f.query_exists():
                 (status, contents, tag) = f.load_contents(None)
                 if status:
-                    self.__rules = json.loads(contents.decode("utf-8"))
+                    for rule in json.loads(contents.decode("utf-8")):
+                        self.__add_rule(rule)
         except Exception as e:
             Logger.error("AdblockExceptions::__init__(): %s", e)
 
     def save(self):
         """
-            Save rules to disk
+            Save rules to disk, changes in next second are saved together
         """
-        try:
-            f = Gio.File.new_for_path(
-                "%s/exceptions_%s.json" % (self.__JSON_PATH, self.__name))
-            content = json.dumps(self.__rules)
-            f.replace_contents(content.encode("utf-8"),
-                               None,
-                               False,
-                               Gio.FileCreateFlags.REPLACE_DESTINATION,
-                               None)
-        except Exception as e:
-            Logger.error("AdblockExceptions::save(): %s", e)
+        if self.__save_timeout_id is not None:
+            GLib.source_remove(self.__save_timeout_id)
+        self.__save_timeout_id = GLib.timeout_add(self.__SAVE_DELAY,
+                                                  self.__on_save_timeout)
+
+    def flush(self):
+        """
+            Save pending changes now
+        """
+        if self.__save_timeout_id is not None:
+            GLib.source_remove(self.__save_timeout_id)
+            self.__save_timeout_id = None
+            self.__write()
 
     def add_domain_exception(self, domain, url_filter=".*", internal=False):
         """
@@ -64,12 +76,9 @@ class ContentBlockerExceptions:
             @param internal as bool
         """
         if internal:
-            rule = self.__get_rule_for_internal_domain(domain, url_filter)
-            if rule in self.__rules:
-                self.__rules.remove(rule)
+            self.__remove_rule(domain, url_filter, "block")
         else:
-            rule = self.__get_rule_for_domain(domain, url_filter)
-            self.__rules.append(rule)
+            self.__add_rule(self.__get_rule_for_domain(domain, url_filter))
 
     def remove_domain_exception(self, domain, url_filter=".*", internal=False):
         """
@@ -79,22 +88,19 @@ class ContentBlockerExceptions:
             @param internal as bool
         """
         if internal:
-            rule = self.__get_rule_for_internal_domain(domain, url_filter)
-            self.__rules.append(rule)
+            self.__add_rule(
+                self.__get_rule_for_internal_domain(domain, url_filter))
         else:
-            rule = self.__get_rule_for_domain(domain, url_filter)
-            if rule in self.__rules:
-                self.__rules.remove(rule)
+            self.__remove_rule(domain, url_filter, "ignore-previous-rules")
 
     def remove_all_domain_exceptions(self, domain):
         """
             Remove all exceptions for a domain
             @param domain as str
         """
-        for rule in list(self.__rules):
-            if rule["trigger"]["if-domain"] == ["*%s" % domain]:
-                self.remove_domain_exception(
-                    domain, rule["trigger"]["url-filter"])
+        for key in list(self.__domains.get(domain, [])):
+            if key[2] == "ignore-previous-rules":
+                self.__remove_rule(*key)
 
     def is_domain_exception(self, domain, url_filter=".*", internal=False):
         """
@@ -105,23 +111,86 @@ class ContentBlockerExceptions:
             @return bool
         """
         if internal:
-            rule = self.__get_rule_for_internal_domain(domain, url_filter)
-            return rule not in self.__rules
+            return (domain, url_filter, "block") not in self.__rules
         else:
-            rule = self.__get_rule_for_domain(domain, url_filter)
-            return rule in self.__rules
+            return (domain, url_filter,
+                    "ignore-previous-rules") in self.__rules
+
+    def is_domain_allowed(self, netloc):
+        """
+            True if netloc or one of its parent domains has an
+            exception for all urls
+            Exceptions are added for netlocs, not hostnames
+            @param netloc as str
+            @return bool
+        """
+        split = netloc.split(".")
+        for i in range(0, len(split)):
+            if self.is_domain_exception(".".join(split[i:])):
+                return True
+        return False
 
     @property
     def rules(self):
         """
-            Get rules
+            Get rules to compile with blocker rules, exceptions for all
+            urls of a domain are handled by is_domain_allowed()
             @return []
         """
-        return self.__rules
+        if self.__cached_rules is None:
+            self.__cached_rules = [
+                rule for (key, rule) in self.__rules.items()
+                if key[1] != ".*" or key[2] != "ignore-previous-rules"]
+        return self.__cached_rules
 
 #######################
 # PRIVATE             #
 #######################
+    def __write(self):
+        """
+            Write rules to disk
+        """
+        try:
+            f = Gio.File.new_for_path(
+                "%s/exceptions_%s.json" % (self.__JSON_PATH, self.__name))
+            content = json.dumps(list(self.__rules.values()))
+            f.replace_contents(content.encode("utf-8"),
+                               None,
+                               False,
+                               Gio.FileCreateFlags.REPLACE_DESTINATION,
+                               None)
+        except Exception as e:
+            Logger.error("AdblockExceptions::__write(): %s", e)
+
+    def __add_rule(self, rule):
+        """
+            Add rule to index
+            @param rule as {}
+        """
+        trigger = rule["trigger"]
+        domain = trigger["if-domain"][0][1:]
+        key = (domain, trigger["url-filter"], rule["action"]["type"])
+        if key not in self.__rules:
+            self.__rules[key] = rule
+            self.__domains.setdefault(domain, []).append(key)
+            self.__cached_rules = None
+
+    def __remove_rule(self, domain, url_filter, action):
+        """
+            Remove rule from index
+            @param domain as str
+            @param url_filter as str
+            @param action as str
+        """
+        key = (domain, url_filter, action)
+        if key in self.__rules:
+            del self.__rules[key]
+            keys = self.__domains[domain]
+            keys.remove(key)
+            if not keys:
+                del self.__domains[domain]
+            self.__cached_rules = None
+
     def __get_rule_for_domain(self, domain, url_filter):
         """
             Return rule for domain
@@ -157,3 +226,10 @@ class ContentBlockerExceptions:
                 "type": "block"
             }
         }
+
+    def __on_save_timeout(self):
+        """
+            Save rules
+        """
+        self.__save_timeout_id = None
+        self.__write()
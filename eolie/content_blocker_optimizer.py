@@ -0,0 +1,268 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import re
+from hashlib import md5
+
+from eolie.logger import Logger
+
+
+class ContentBlockerOptimizer:
+    """
+        Clean rules before WebKit compiles them
+        WebKit rejects a whole list for one invalid rule and compiles
+        duplicates as is, so:
+        - invalid rules are dropped
+        - duplicates are removed, last one wins
+        - rules only differing by if-domain are merged
+        ignore-previous-rules only applies to rules before it, so rules are
+        never merged across an ignore-previous-rules rule
+    """
+    __ACTIONS = ["block", "block-cookies", "css-display-none",
+                 "ignore-previous-rules", "make-https", "notify"]
+    __RESOURCE_TYPES = ["document", "image", "style-sheet", "script",
+                        "font", "raw", "svg-document", "media", "popup",
+                        "ping", "fetch", "websocket", "other"]
+    __LOAD_TYPES = ["first-party", "third-party"]
+    __DOMAIN_KEYS = ["if-domain", "unless-domain"]
+    __LIST_KEYS = ["if-top-url", "unless-top-url", "load-context",
+                   "if-frame-url"]
+    # WebKit url-filter does not support backreferences, word boundaries
+    # and built-in character classes
+    __ESCAPES = re.compile(r"\\(.)")
+    __UNSUPPORTED_ESCAPES = "123456789bBdDwWsS"
+    __CLASSES = re.compile(r"\[\^?\]?[^\]]*\]")
+
+    def __init__(self):
+        """
+            Init optimizer
+        """
+        self.__invalid = 0
+        self.__duplicates = 0
+        self.__merged = 0
+
+    def optimize(self, rules):
+        """
+            Get optimized rules
+            Rules are kept serialized while optimizing, so memory stays
+            far below a list of rule dicts
+            @param rules as iterable of {}
+            @return generator of {}
+        """
+        self.__invalid = self.__duplicates = self.__merged = 0
+        count = 0
+        entries = []
+        for rule in rules:
+            count += 1
+            rule = self.__normalize(rule)
+            if rule is None:
+                self.__invalid += 1
+            else:
+                entries.append(self.__get_entry(rule))
+        entries = self.__merge(self.__deduplicate(entries))
+        Logger.info("ContentBlockerOptimizer: %s rules -> %s, %s invalid,"
+                    " %s duplicates, %s merged", count, len(entries),
+                    self.__invalid, self.__duplicates, self.__merged)
+        return self.__get_rules(entries)
+
+    @property
+    def counts(self):
+        """
+            Get counts for last optimization
+            @return (int, int, int) as (invalid, duplicates, merged)
+        """
+        return (self.__invalid, self.__duplicates, self.__merged)
+
+#######################
+# PRIVATE             #
+#######################
+    def __is_url_filter_valid(self, url_filter):
+        """
+            True if WebKit can compile url filter
+            @param url_filter as str
+            @return bool
+        """
+        if not isinstance(url_filter, str) or not url_filter or\
+                not url_filter.isascii():
+            return False
+        for char in self.__ESCAPES.findall(url_filter):
+            if char in self.__UNSUPPORTED_ESCAPES:
+                return False
+        # Drop escapes and character classes, their content is literal
+        stripped = self.__CLASSES.sub(
+            "a", self.__ESCAPES.sub("a", url_filter))
+        # No disjunction, arbitrary repetition, lookaround or flags
+        if "[" in stripped or "|" in stripped or "{" in stripped or\
+                "(?" in stripped or stripped[0] in "*+?" or\
+                "^" in stripped[1:] or "$" in stripped[:-1]:
+            return False
+        # Balanced groups, quantifiers need an atom
+        depth = 0
+        previous = None
+        for char in stripped:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth < 0 or previous == "(":
+                    return False
+            elif char in "*+?" and previous in "(*+":
+                return False
+            previous = char
+        return depth == 0
+
+    def __normalize_domains(self, domains):
+        """
+            Get domains as WebKit wants them
+            @param domains as [str]
+            @return [str]/None
+        """
+        if not isinstance(domains, list) or not domains:
+            return None
+        normalized = set()
+        for domain in domains:
+            if not isinstance(domain, str) or not domain.isascii():
+                return None
+            normalized.add(domain.lower())
+        return sorted(normalized)
+
+    def __normalize(self, rule):
+        """
+            Get a normalized copy of rule
+            @param rule as {}
+            @return {}/None if invalid
+        """
+        try:
+            trigger = dict(rule["trigger"])
+            action = dict(rule["action"])
+        except Exception:
+            return None
+        if action.get("type") not in self.__ACTIONS or\
+                (action["type"] == "css-display-none" and
+                 not action.get("selector")):
+            return None
+        url_filter = trigger.get("url-filter")
+        # Filters are not anchored, leading .* matches nothing more
+        while isinstance(url_filter, str) and url_filter.startswith(".*") and\
+                len(url_filter) > 2:
+            url_filter = url_filter[2:]
+        if not self.__is_url_filter_valid(url_filter):
+            return None
+        trigger["url-filter"] = url_filter
+        if trigger.get("url-filter-is-case-sensitive") is False:
+            del trigger["url-filter-is-case-sensitive"]
+        if all(key in trigger for key in self.__DOMAIN_KEYS):
+            return None
+        for key in self.__DOMAIN_KEYS:
+            if key in trigger:
+                trigger[key] = self.__normalize_domains(trigger[key])
+                if trigger[key] is None:
+                    return None
+        for (key, values) in [("resource-type", self.__RESOURCE_TYPES),
+                              ("load-type", self.__LOAD_TYPES)]:
+            if key in trigger:
+                types = trigger[key]
+                if not isinstance(types, list) or not types or\
+                        any(value not in values for value in types):
+                    return None
+                trigger[key] = sorted(set(types))
+        for key in self.__LIST_KEYS:
+            if key in trigger and (not isinstance(trigger[key], list) or
+                                   not trigger[key]):
+                return None
+        return {"trigger": trigger, "action": action}
+
+    def __get_entry(self, rule):
+        """
+            Get a compact entry for rule
+            @param rule as {}
+            @return (str, tuple, bool, bool) as
+                    (key without if-domain, if-domain, is ignore rule,
+                     matches all domains)
+        """
+        trigger = rule["trigger"]
+        domains = tuple(trigger.pop("if-domain", ()))
+        key = json.dumps((trigger, rule["action"]), sort_keys=True)
+        return (key,
+                domains,
+                rule["action"]["type"] == "ignore-previous-rules",
+                not domains and "unless-domain" not in trigger)
+
+    def __get_rules(self, entries):
+        """
+            Get rules for entries
+            @param entries as [(str, tuple/set, bool, bool)]
+            @return generator of {}
+        """
+        for (key, domains, ignore, unconditional) in entries:
+            (trigger, action) = json.loads(key)
+            if domains:
+                trigger["if-domain"] = sorted(domains)
+            yield {"trigger": trigger, "action": action}
+
+    def __deduplicate(self, entries):
+        """
+            Remove duplicates, keep last one
+            @param entries as [(str, tuple, bool, bool)]
+            @return [(str, tuple, bool, bool)]
+        """
+        seen = set()
+        deduplicated = []
+        for entry in reversed(entries):
+            encoded = md5("\n".join((entry[0],) + entry[1]).encode(
+                "utf-8")).digest()
+            if encoded in seen:
+                self.__duplicates += 1
+            else:
+                seen.add(encoded)
+                deduplicated.append(entry)
+        deduplicated.reverse()
+        return deduplicated
+
+    def __merge(self, entries):
+        """
+            Merge if-domain of rules in same group
+            A group is a run of rules with same ignore-previous-rules status
+            @param entries as [(str, tuple, bool, bool)]
+            @return [(str, tuple/set, bool, bool)]
+        """
+        merged = []
+        # {key: index in merged}
+        group = {}
+        # Keys of rules without domain conditions
+        unconditional_keys = set()
+        previous_ignore = None
+        for (key, domains, ignore, unconditional) in entries:
+            if ignore != previous_ignore:
+                group = {}
+                unconditional_keys = set()
+                previous_ignore = ignore
+            if not domains:
+                if unconditional:
+                    unconditional_keys.add(key)
+                merged.append((key, domains, ignore, unconditional))
+            elif key in unconditional_keys:
+                # Already matching on all domains
+                self.__merged += 1
+            elif key in group:
+                index = group[key]
+                entry = merged[index]
+                if isinstance(entry[1], tuple):
+                    entry = (key, set(entry[1]), ignore, False)
+                    merged[index] = entry
+                entry[1].update(domains)
+                self.__merged += 1
+            else:
+                group[key] = len(merged)
+                merged.append((key, domains, ignore, unconditional))
+        return merged
@@ -14,10 +14,11 @@ from gi.repository import Gio, GLib
 from gi.repository.Gio import FILE_ATTRIBUTE_STANDARD_NAME, \
                               FILE_ATTRIBUTE_TIME_MODIFIED
 
-import json
 from time import time
+from urllib.parse import urlparse
 
 from eolie.content_blocker import ContentBlocker
+from eolie.content_blocker_domains import DomainIndex
 from eolie.define import PHISHING_URI, App
 from eolie.logger import Logger
 
@@ -30,12 +31,15 @@ class PhishingContentBlocker(ContentBlocker):
     """
         A WebKit Content Blocker for phishing
     """
+    _SOURCES = [PHISHING_URI]
 
     def __init__(self):
         """
             Init adblock helper
         """
         try:
+            self.__domain_index = DomainIndex(
+                "%s/block-phishing.idx" % self._JSON_PATH)
             ContentBlocker.__init__(self, "block-phishing")
             f = Gio.File.new_for_path(
                     "%s/block-phishing.json" % self._JSON_PATH)
@@ -46,13 +50,49 @@ class PhishingContentBlocker(ContentBlocker):
                 mtime = int(info.get_attribute_as_string("time::modified"))
             else:
                 mtime = 0
+            App().settings.connect("changed::phishing-index",
+                                   self.__on_index_changed)
             if App().settings.get_value("block-phishing"):
+                if App().settings.get_value("phishing-index"):
+                    if GLib.file_test(
+                            "%s/block-phishing.idx" % self._JSON_PATH,
+                            GLib.FileTest.EXISTS):
+                        self._task_helper.run(self.__domain_index.load)
+                    elif f.query_exists():
+                        self._compile()
                 GLib.timeout_add_seconds(7200, self.__download_task, True)
                 if time() - mtime > 7200:
                     GLib.timeout_add_seconds(10, self.__download_task, False)
         except Exception as e:
             Logger.error("PhishingContentBlocker::__init__(): %s", e)
 
+    def is_phishing(self, uri):
+        """
+            True if uri host is a phishing domain, only checked when phishing
+            domains are indexed instead of compiled into filter
+            @param uri as str
+            @return bool
+        """
+        parsed = urlparse(uri)
+        return bool(self.enabled and parsed.hostname and
+                    App().settings.get_value("phishing-index") and
+                    self.__domain_index.contains(parsed.hostname) and
+                    not self.__domain_index.is_allowed(uri) and
+                    not self.exceptions.is_domain_allowed(parsed.netloc))
+
+#######################
+# PROTECTED           #
+#######################
+    def _save_rules(self, rules):
+        """
+            Index rules blocking whole domains if wanted, save others to
+            file and compile it
+            @param rules as iterable of {}
+        """
+        if App().settings.get_value("phishing-index"):
+            rules = self.__domain_index.filter_rules(rules)
+        ContentBlocker._save_rules(self, rules)
+
 #######################
 # PRIVATE             #
 #######################
@@ -62,43 +102,18 @@ class PhishingContentBlocker(ContentBlocker):
             @param loop as bool
         """
         if not Gio.NetworkMonitor.get_default().get_network_metered():
-            self.__download_uri(PHISHING_URI)
+            self._download_sources()
         return loop
 
-    def __download_uri(self, uri):
+    def __on_index_changed(self, settings, value):
         """
-            Update database from the web
-            @param uris as [str]
-            @param data as []
-        """
-        if not Gio.NetworkMonitor.get_default().get_network_available():
-            return
-        self._task_helper.load_uri_content(uri,
-                                           self._cancellable,
-                                           self.__on_load_uri_content)
-
-    def __on_load_uri_content(self, uri, status, content):
-        """
-            Save loaded values
-            @param uri as str
-            @param status as bool
-            @param content as bytes
+            Recompile rules with or without phishing domains
+            @param settings as Gio.Settings
+            @param value as GLib.Variant
         """
         try:
-            Logger.debug(
-                "PhishingContentBlocker::__on_load_uri_content(): %s", uri)
-            if status:
-                rules = json.loads(content.decode("utf-8"))
-                # Save to sources
-                f = Gio.File.new_for_path(
-                    "%s/block-phishing.json" % self._JSON_PATH)
-                content = json.dumps(rules).encode("utf-8")
-                f.replace_contents(content,
-                                   None,
-                                   False,
-                                   Gio.FileCreateFlags.REPLACE_DESTINATION,
-                                   None)
-                self._task_helper.run(self._save_rules, rules)
+            if self.enabled:
+                self._compile()
         except Exception as e:
-            Logger.error(
-                "PhishingContentBlocker::__on_load_uri_content(): %s", e)
+            Logger.error("PhishingContentBlocker::__on_index_changed(): %s",
+                         e)
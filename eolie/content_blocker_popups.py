@@ -10,8 +10,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import json
-
 from eolie.content_blocker import ContentBlocker
 from eolie.logger import Logger
 
@@ -40,8 +38,6 @@ class PopupsContentBlocker(ContentBlocker):
         """
         try:
             ContentBlocker.__init__(self, "block-popups")
-            rules = self.DEFAULT + self.exceptions.rules
-            bytes = json.dumps(rules).encode("utf-8")
-            self.save(bytes)
+            self._save_rules(self.DEFAULT)
         except Exception as e:
             Logger.error("PopupsContentBlocker::__init__(): %s", e)
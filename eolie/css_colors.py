@@ -0,0 +1,324 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+from math import pi
+from importlib import util
+from colorsys import rgb_to_hls
+
+from eolie.define import COLORS
+
+
+class ColorProperty:
+    COLOR = 0
+    BACKGROUND_COLOR = 1
+    BACKGROUND_IMAGE = 2
+    BACKGROUND = 3
+    BORDER = 4
+    VARIABLE = 5
+
+
+class CSSColors:
+    """
+        Night mode color transformation
+        Results are memoized per color literal and property, for all
+        stylesheets. With NumPy, colors of a stylesheet can be converted
+        in one pass before its rules are written
+    """
+    # Memoized colors, cache is reset when full
+    __MAX_SIZE = 8192
+    # Under this, converting with NumPy costs more than it saves
+    __BATCH_MIN = 256
+    # {(literal, ColorProperty): str/None}, None for invalid colors
+    __cache = {}
+    __numpy = util.find_spec("numpy") is not None
+    __COLOR = re.compile(
+        r"#(?:[0-9a-f]{8}|[0-9a-f]{6}|[0-9a-f]{3,4})(?![-\w])|"
+        r"(?:rgb|hsl)a?\([^)]*\)|"
+        r"(?<![-\w#.])(?:%s)(?![-\w(])" % "|".join(
+            sorted(COLORS.keys(), key=len, reverse=True)),
+        re.IGNORECASE)
+    __IGNORE = re.compile(r"inherit|transparent|data:|unset|currentcolor",
+                          re.IGNORECASE)
+    __HUE = re.compile(r"([-+.\de]+)(deg|grad|rad|turn)?$", re.IGNORECASE)
+    __HUE_UNITS = {"deg": 360, "grad": 400, "rad": 2 * pi, "turn": 1}
+
+    @staticmethod
+    def contains_color(value):
+        """
+            True if value contains a color to transform
+            @param value as str
+            @return bool
+        """
+        return CSSColors.__IGNORE.search(value) is None and\
+            CSSColors.__COLOR.search(value) is not None
+
+    @staticmethod
+    def get_colors(value):
+        """
+            Get color literals in value
+            @param value as str
+            @return [str]
+        """
+        return CSSColors.__COLOR.findall(value)
+
+    @staticmethod
+    def transform_colors(value, prop):
+        """
+            Transform colors in value for night mode
+            @param value as str
+            @param prop as ColorProperty
+            @return str/None if value has no color
+            @raise ValueError if a color is invalid
+        """
+        (value, count) = CSSColors.__COLOR.subn(
+            lambda match: CSSColors.transform_color(match.group(0), prop),
+            value)
+        return value if count else None
+
+    @staticmethod
+    def transform_color(literal, prop):
+        """
+            Transform color literal for night mode
+            @param literal as str
+            @param prop as ColorProperty
+            @return str
+            @raise ValueError if literal is invalid
+        """
+        key = (literal, prop)
+        try:
+            color = CSSColors.__cache[key]
+        except KeyError:
+            try:
+                color = CSSColors.__transform(literal, prop)
+            except (ValueError, IndexError):
+                color = None
+            CSSColors.__store(key, color)
+        if color is None:
+            raise ValueError("Invalid color: %s" % literal)
+        return color
+
+    @staticmethod
+    def prepare_colors(colors):
+        """
+            Transform colors not memoized yet, in one NumPy pass
+            Does nothing without NumPy or for a few colors
+            @param colors as [(str, ColorProperty)]
+            @thread safe
+        """
+        if not CSSColors.__numpy:
+            return
+        cache = CSSColors.__cache
+        pending = {color for color in colors if color not in cache}
+        if len(pending) >= CSSColors.__BATCH_MIN:
+            CSSColors.__transform_batch(
+                list(pending)[:CSSColors.__MAX_SIZE])
+
+#######################
+# PRIVATE             #
+#######################
+    @staticmethod
+    def __store(key, color):
+        """
+            Memoize color
+            @param key as (str, ColorProperty)
+            @param color as str/None
+        """
+        if len(CSSColors.__cache) >= CSSColors.__MAX_SIZE:
+            CSSColors.__cache.clear()
+        CSSColors.__cache[key] = color
+
+    @staticmethod
+    def __get_float(value, scale):
+        """
+            Get a percent or a number as float
+            @param value as str
+            @param scale as float: number for 100%
+            @return float
+        """
+        if value.endswith("%"):
+            return float(value[:-1]) / 100
+        return float(value) / scale
+
+    @staticmethod
+    def __get_hue(value):
+        """
+            Get hue as a fraction of turn
+            @param value as str
+            @return float
+        """
+        match = CSSColors.__HUE.match(value)
+        if match is None:
+            raise ValueError("Invalid hue: %s" % value)
+        unit = (match.group(2) or "deg").lower()
+        return float(match.group(1)) / CSSColors.__HUE_UNITS[unit] % 1.0
+
+    @staticmethod
+    def __get_arguments(literal):
+        """
+            Get rgb()/hsl() arguments (CSS3 vs CSS4 syntax)
+            @param literal as str
+            @return [str]
+        """
+        arguments = literal[literal.index("(") + 1:].rstrip(")")
+        if "," in arguments:
+            split = [argument.strip() for argument in arguments.split(",")]
+        else:
+            (values, slash, alpha) = arguments.partition("/")
+            split = values.split()
+            if slash:
+                split.append(alpha.strip())
+        if len(split) not in [3, 4]:
+            raise ValueError("Invalid color: %s" % literal)
+        return split
+
+    @staticmethod
+    def __parse(literal):
+        """
+            Parse color literal
+            @param literal as str
+            @return (bool, float, float, float, float)
+                    as (hsl, r/h, g/s, b/l, a), values in 0..1
+        """
+        lower = literal.lower()
+        if lower.startswith("#"):
+            hexa = lower[1:]
+            if len(hexa) < 6:
+                hexa = "".join(letter * 2 for letter in hexa)
+            (r, g, b) = (int(hexa[i:i + 2], 16) / 255 for i in (0, 2, 4))
+            a = int(hexa[6:8], 16) / 255 if len(hexa) == 8 else 1
+            return (False, r, g, b, a)
+        elif lower.startswith("rgb") or lower.startswith("hsl"):
+            split = CSSColors.__get_arguments(lower)
+            a = CSSColors.__get_float(split[3], 1) if len(split) == 4 else 1
+            if lower.startswith("hsl"):
+                return (True,
+                        CSSColors.__get_hue(split[0]),
+                        CSSColors.__get_float(split[1], 100),
+                        CSSColors.__get_float(split[2], 100),
+                        a)
+            (r, g, b) = (CSSColors.__get_float(value, 255)
+                         for value in split[:3])
+            return (False, r, g, b, a)
+        (r, g, b) = COLORS[lower]
+        return (False, r / 255, g / 255, b / 255, 1)
+
+    @staticmethod
+    def __to_css(h, s, l, a):
+        """
+            Get hsla() color
+            @param h as float: 0..1
+            @param s as float: 0..1
+            @param l as float: 0..1
+            @param a as float: 0..1
+            @return str
+        """
+        return "hsla(%g, %g%%, %g%%, %g)" % (h * 360, s * 100, l * 100, a)
+
+    @staticmethod
+    def __transform(literal, prop):
+        """
+            Transform color literal for night mode
+            @param literal as str
+            @param prop as ColorProperty
+            @return str
+        """
+        (hsl, x, y, z, a) = CSSColors.__parse(literal)
+        if hsl:
+            (h, s, l) = (x, y, z)
+        else:
+            (h, l, s) = rgb_to_hls(x, y, z)
+        if prop in [ColorProperty.BACKGROUND_COLOR,
+                    ColorProperty.BACKGROUND_IMAGE]:
+            # Keep translucent backgrounds
+            if a < 0.4:
+                return literal
+            elif s > 0.2:
+                return CSSColors.__to_css(h, s, 0.1 if l > 0.7 else 0.3, a)
+            return CSSColors.__to_css(0, 0, 0.21, 1)
+        elif prop == ColorProperty.BACKGROUND:
+            if a < 0.4:
+                return literal
+            return CSSColors.__to_css(0, 0, 0.21, 1)
+        elif prop == ColorProperty.COLOR:
+            return CSSColors.__to_css(h, s, 0.8, a)
+        elif prop == ColorProperty.BORDER:
+            return CSSColors.__to_css(h, s, 0.3, a)
+        elif l > 0.75:
+            return CSSColors.__to_css(0, 0, 0.21, a)
+        elif l > 0.5:
+            return CSSColors.__to_css(0, 0, 1 - l, a)
+        return CSSColors.__to_css(h, s, 0.5 + l, a)
+
+    @staticmethod
+    def __transform_batch(colors):
+        """
+            Transform colors with NumPy, same result as __transform()
+            @param colors as [(str, ColorProperty)]
+        """
+        import numpy
+        keys = []
+        rows = []
+        for key in colors:
+            try:
+                rows.append(CSSColors.__parse(key[0]) + (key[1],))
+                keys.append(key)
+            except (ValueError, IndexError):
+                CSSColors.__store(key, None)
+        if not rows:
+            return
+        (hsl, x, y, z, a, prop) = numpy.array(rows, dtype=float).T
+        hsl = hsl == 1
+        # colorsys.rgb_to_hls()
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            maxc = numpy.maximum(numpy.maximum(x, y), z)
+            minc = numpy.minimum(numpy.minimum(x, y), z)
+            sumc = maxc + minc
+            rangec = maxc - minc
+            l = sumc / 2.0
+            s = numpy.where(l <= 0.5, rangec / sumc,
+                            rangec / (2.0 - maxc - minc))
+            rc = (maxc - x) / rangec
+            gc = (maxc - y) / rangec
+            bc = (maxc - z) / rangec
+            h = numpy.where(x == maxc, bc - gc,
+                            numpy.where(y == maxc, 2.0 + rc - bc,
+                                        4.0 + gc - rc))
+            h = (h / 6.0) % 1.0
+        grey = minc == maxc
+        h = numpy.where(hsl, x, numpy.where(grey, 0.0, h))
+        s = numpy.where(hsl, y, numpy.where(grey, 0.0, s))
+        l = numpy.where(hsl, z, l)
+        # Night mode rules
+        background = (prop == ColorProperty.BACKGROUND_COLOR) |\
+            (prop == ColorProperty.BACKGROUND_IMAGE)
+        keep = (background | (prop == ColorProperty.BACKGROUND)) &\
+            (a < 0.4)
+        dark = (background & (s <= 0.2)) |\
+            (prop == ColorProperty.BACKGROUND)
+        variable = prop == ColorProperty.VARIABLE
+        variable_light = variable & (l > 0.75)
+        variable_medium = variable & (l > 0.5) & ~variable_light
+        grey = dark | variable_light | variable_medium
+        l = numpy.select(
+            [prop == ColorProperty.COLOR, prop == ColorProperty.BORDER,
+             dark | variable_light, background, variable_medium],
+            [0.8, 0.3, 0.21, numpy.where(l > 0.7, 0.1, 0.3), 1 - l],
+            0.5 + l)
+        h = numpy.where(grey, 0.0, h)
+        s = numpy.where(grey, 0.0, s)
+        a = numpy.where(dark, 1.0, a)
+        for (key, kept, h, s, l, a) in zip(keys, keep.tolist(),
+                                           h.tolist(), s.tolist(),
+                                           l.tolist(), a.tolist()):
+            CSSColors.__store(
+                key, key[0] if kept else CSSColors.__to_css(h, s, l, a))
@@ -0,0 +1,396 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio, GLib
+
+import json
+from os import replace, remove
+from time import time
+from hashlib import md5
+from threading import Condition
+
+from eolie import css_colors, css_parser, css_rule_import, css_rule_list
+from eolie import css_rule_media, css_rule_style, css_rule_supports
+from eolie import css_stylesheet
+from eolie.define import App, EOLIE_CACHE_PATH
+from eolie.logger import Logger
+
+
+class CSSDiskCache:
+    """
+        Transformed CSS on disk
+        An index keeps size, last access and source validators of entries.
+        Least recently used entries are removed over the size budget. All
+        entries are removed when the code transforming CSS changes
+        Lock only protects index: files are written and deleted without it
+    """
+    # Seconds before checking a stylesheet upstream again
+    __REVALIDATE_DELAY = 3600
+    # Part of budget kept on eviction
+    __EVICT_RATIO = 0.9
+    # Seconds before writing index after a change
+    __SAVE_DELAY = 10
+    # Modules whose code changes transformed CSS
+    __MODULES = [css_colors, css_parser, css_rule_import, css_rule_list,
+                 css_rule_media, css_rule_style, css_rule_supports,
+                 css_stylesheet]
+    # Index entry fields
+    __SIZE = 0
+    __ATIME = 1
+    __VALIDATED = 2
+    __URI = 3
+    __ETAG = 4
+    __MODIFIED = 5
+
+    def __init__(self):
+        """
+            Init cache, index is loaded by load() or on first use
+        """
+        self.__path = "%s/css" % EOLIE_CACHE_PATH
+        self.__lock = Condition()
+        self.__version = None
+        # {name: [size, atime, validated, uri, etag, modified]}
+        self.__index = None
+        self.__size = 0
+        # Names of entries being written, being deleted
+        self.__writing = set()
+        self.__deleting = set()
+        self.__save_id = None
+
+    def load(self):
+        """
+            Load index if not loaded
+            @thread safe
+        """
+        if self.__index is not None:
+            return
+        version = self.__get_version()
+        entries = {}
+        try:
+            with open("%s/index.json" % self.__path, "r",
+                      encoding="utf-8") as f:
+                index = json.load(f)
+            if index["version"] == version:
+                entries = index["entries"]
+            else:
+                # Entries are now orphaned files, removed by vacuum()
+                Logger.info("CSSDiskCache: night mode changed, cache reset")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Logger.error("CSSDiskCache::load(): %s", e)
+        with self.__lock:
+            # Loaded meanwhile by another thread
+            if self.__index is None:
+                self.__version = version
+                self.__index = entries
+                self.__size = sum(entry[self.__SIZE]
+                                  for entry in entries.values())
+
+    def contains(self, key):
+        """
+            True if CSS for key is on disk, False until index is loaded
+            @param key as str
+            @return bool
+        """
+        with self.__lock:
+            return self.__index is not None and\
+                self.__get_name(key) in self.__index.keys()
+
+    def get(self, key):
+        """
+            Get CSS for key
+            @param key as str
+            @return str/None
+            @thread safe
+        """
+        name = self.__get_name(key)
+        self.load()
+        with self.__lock:
+            entry = self.__index.get(name)
+            if entry is None:
+                return None
+            entry[self.__ATIME] = int(time())
+            self.__schedule_save()
+        try:
+            with open(self.__get_path(name), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted meanwhile or removed by user, CSS will be saved again
+            pass
+        except Exception as e:
+            Logger.warning("CSSDiskCache::get(): %s", e)
+        return None
+
+    def set(self, key, css_text, uri, etag, modified):
+        """
+            Save CSS for key, remove old entries over budget
+            @param key as str
+            @param css_text as str
+            @param uri as str/None: source to revalidate
+            @param etag as str/None
+            @param modified as str/None: Last-Modified value
+            @thread safe
+        """
+        name = self.__get_name(key)
+        path = self.__get_path(name)
+        data = css_text.encode("utf-8")
+        self.load()
+        # vacuum() does not delete files being written
+        with self.__lock:
+            while name in self.__deleting:
+                self.__lock.wait()
+            self.__writing.add(name)
+        try:
+            with open(path + ".part", "wb") as f:
+                f.write(data)
+            replace(path + ".part", path)
+        except Exception as e:
+            Logger.error("CSSDiskCache::set(): %s", e)
+            with self.__lock:
+                self.__writing.discard(name)
+            return
+        now = int(time())
+        with self.__lock:
+            self.__writing.discard(name)
+            if name in self.__index.keys():
+                self.__size -= self.__index[name][self.__SIZE]
+            self.__index[name] = [len(data), now, now, uri, etag, modified]
+            self.__size += len(data)
+            evicted = self.__evict(self.__get_budget())
+            self.__schedule_save()
+        self.__delete(evicted)
+
+    def remove(self, key):
+        """
+            Remove CSS for key
+            @param key as str
+            @thread safe
+        """
+        name = self.__get_name(key)
+        with self.__lock:
+            if self.__index is None or not self.__pop(name):
+                return
+            self.__schedule_save()
+        self.__delete([name])
+
+    def get_revalidation(self, key):
+        """
+            Get source validators if entry needs to be checked upstream
+            Entry is then considered as validated. Without validators,
+            entry is checked with an unconditional request
+            @param key as str
+            @return (str, str, str)/None as (uri, etag, modified)
+        """
+        now = int(time())
+        with self.__lock:
+            if self.__index is None:
+                return None
+            entry = self.__index.get(self.__get_name(key))
+            if entry is None or entry[self.__URI] is None or\
+                    now - entry[self.__VALIDATED] < self.__REVALIDATE_DELAY:
+                return None
+            entry[self.__VALIDATED] = now
+            self.__schedule_save()
+            return (entry[self.__URI],
+                    entry[self.__ETAG],
+                    entry[self.__MODIFIED])
+
+    def save(self):
+        """
+            Write index to disk
+        """
+        if self.__save_id is not None:
+            GLib.source_remove(self.__save_id)
+            self.__save_id = None
+        with self.__lock:
+            if self.__index is None:
+                return
+            index = {"version": self.__version, "entries": self.__index}
+            data = json.dumps(index)
+        try:
+            path = "%s/index.json" % self.__path
+            with open(path + ".part", "w", encoding="utf-8") as f:
+                f.write(data)
+            replace(path + ".part", path)
+        except Exception as e:
+            Logger.error("CSSDiskCache::save(): %s", e)
+
+    def vacuum(self, count=100):
+        """
+            Remove files not in index and entries over budget
+            @param count as int: files handled at a time
+            @return generator of reclaimed bytes
+        """
+        self.load()
+        with self.__lock:
+            size = self.__size
+            evicted = self.__evict(self.__get_budget())
+            reclaimed = size - self.__size
+        self.__schedule_save()
+        self.__delete(evicted)
+        yield reclaimed
+        try:
+            d = Gio.File.new_for_path(self.__path)
+            children = d.enumerate_children(
+                "standard::name,standard::type,standard::size",
+                Gio.FileQueryInfoFlags.NONE,
+                None)
+            while True:
+                infos = children.next_files(count, None)
+                if not infos:
+                    break
+                reclaimed = 0
+                orphans = []
+                with self.__lock:
+                    for info in infos:
+                        filename = info.get_name()
+                        # Entry name, also for .part files of set()
+                        name = filename.split(".")[0]
+                        if info.get_file_type() != Gio.FileType.REGULAR or\
+                                filename in ["index.json",
+                                             "index.json.part"] or\
+                                name in self.__index.keys() or\
+                                name in self.__writing or\
+                                name in self.__deleting:
+                            continue
+                        orphans.append((name, info))
+                    # set() waits for deletion
+                    names = {name for (name, info) in orphans}
+                    self.__deleting |= names
+                for (name, info) in orphans:
+                    try:
+                        children.get_child(info).delete()
+                        reclaimed += info.get_size()
+                    except GLib.Error as e:
+                        # Removed meanwhile by __delete()
+                        Logger.debug("CSSDiskCache::vacuum(): %s", e)
+                with self.__lock:
+                    self.__deleting -= names
+                    self.__lock.notify_all()
+                yield reclaimed
+            children.close(None)
+        except Exception as e:
+            Logger.error("CSSDiskCache::vacuum(): %s", e)
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_name(self, key):
+        """
+            Get entry name for key
+            @param key as str: uri or contents hash
+            @return str
+        """
+        return md5(key.encode("utf-8")).hexdigest()
+
+    def __get_path(self, name):
+        """
+            Get file path for entry
+            @param name as str
+            @return str
+        """
+        return "%s/%s.css" % (self.__path, name)
+
+    def __get_budget(self):
+        """
+            Get cache size budget
+            @return int as bytes
+        """
+        size = App().settings.get_value("night-mode-cache-size").get_int32()
+        return size * 1024 * 1024
+
+    def __get_version(self):
+        """
+            Get a stamp of the code transforming CSS
+            @return str
+        """
+        version = md5()
+        for module in self.__MODULES:
+            try:
+                with open(module.__file__, "rb") as f:
+                    version.update(f.read())
+            except Exception as e:
+                Logger.warning("CSSDiskCache::__get_version(): %s", e)
+                version.update(module.__name__.encode("utf-8"))
+        return version.hexdigest()
+
+    def __pop(self, name):
+        """
+            Remove entry from index
+            Lock must be held
+            @param name as str
+            @return bool: True if entry was in index
+        """
+        entry = self.__index.pop(name, None)
+        if entry is None:
+            return False
+        self.__size -= entry[self.__SIZE]
+        return True
+
+    def __delete(self, names):
+        """
+            Delete files of removed entries
+            @param names as [str]
+        """
+        # Not if saved again meanwhile, set() waits for deletion
+        with self.__lock:
+            names = {name for name in names
+                     if name not in self.__index.keys() and
+                     name not in self.__writing}
+            self.__deleting |= names
+        for name in names:
+            try:
+                remove(self.__get_path(name))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                Logger.error("CSSDiskCache::__delete(): %s", e)
+        with self.__lock:
+            self.__deleting -= names
+            self.__lock.notify_all()
+
+    def __evict(self, budget):
+        """
+            Remove least recently used entries over budget from index
+            Goes under budget, so next stylesheets do not evict again
+            Lock must be held
+            @param budget as int
+            @return [str]: names of entries to delete with __delete()
+        """
+        if self.__size <= budget:
+            return []
+        budget *= self.__EVICT_RATIO
+        entries = sorted(self.__index.items(),
+                         key=lambda item: item[1][self.__ATIME])
+        evicted = []
+        for (name, entry) in entries:
+            if self.__size <= budget:
+                break
+            self.__pop(name)
+            evicted.append(name)
+        return evicted
+
+    def __schedule_save(self):
+        """
+            Write index later, many changes happen together
+        """
+        if self.__save_id is None:
+            self.__save_id = GLib.timeout_add_seconds(self.__SAVE_DELAY,
+                                                      self.__on_save_timeout)
+
+    def __on_save_timeout(self):
+        """
+            Write index
+        """
+        self.__save_id = None
+        self.save()
@@ -0,0 +1,169 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio, Soup
+
+from threading import Event, Lock, local
+from collections import OrderedDict
+
+from eolie.logger import Logger
+
+
+class CSSDownloader:
+    """
+        Download stylesheets for night mode, from any thread
+        A session is shared, so connections are reused (one per thread
+        before libsoup 3.2). Contents are kept
+        in memory (LRU), requests for an URI being downloaded wait for it
+    """
+    # Characters of CSS kept in memory
+    __MAX_SIZE = 4 * 1024 * 1024
+
+    def __init__(self):
+        """
+            Init downloader
+        """
+        # libsoup >= 3.2 sync API can be used from several threads
+        if Soup.get_minor_version() >= 2:
+            self.__session = Soup.Session.new()
+        else:
+            self.__session = None
+        self.__local = local()
+        self.__lock = Lock()
+        # {uri: (css, etag, last modified)}
+        self.__contents = OrderedDict()
+        self.__size = 0
+        # {uri: [Event, css/None]}
+        self.__loading = {}
+
+    def get(self, uri, cancellable):
+        """
+            Get stylesheet contents
+            @param uri as str
+            @param cancellable as Gio.Cancellable
+            @return str/None
+            @thread safe
+        """
+        with self.__lock:
+            if uri in self.__contents.keys():
+                self.__contents.move_to_end(uri)
+                return self.__contents[uri][0]
+            loading = self.__loading.get(uri)
+            if loading is None:
+                self.__loading[uri] = [Event(), None]
+        if loading is not None:
+            loading[0].wait()
+            return loading[1]
+        (contents, etag, modified) = self.__download(uri, cancellable)
+        with self.__lock:
+            if contents is not None:
+                self.__contents[uri] = (contents, etag, modified)
+                self.__size += len(contents)
+                while self.__size > self.__MAX_SIZE and\
+                        len(self.__contents) > 1:
+                    self.__size -= len(self.__contents.popitem(
+                        last=False)[1][0])
+            loading = self.__loading.pop(uri)
+        loading[1] = contents
+        loading[0].set()
+        return contents
+
+    def get_validators(self, uri):
+        """
+            Get validators of downloaded stylesheet
+            @param uri as str
+            @return (str, str) as (etag, last modified), values may be None
+        """
+        with self.__lock:
+            if uri in self.__contents.keys():
+                return self.__contents[uri][1:]
+        return (None, None)
+
+    def is_modified(self, uri, etag, modified):
+        """
+            Check stylesheet upstream with a conditional request. Without
+            validators, stylesheet is modified if it can be downloaded
+            @param uri as str
+            @param etag as str/None
+            @param modified as str/None: Last-Modified value
+            @return bool: False if not modified or unknown
+            @thread safe
+        """
+        try:
+            message = Soup.Message.new("GET", uri)
+            headers = message.get_request_headers()
+            if etag is not None:
+                headers.append("If-None-Match", etag)
+            if modified is not None:
+                headers.append("If-Modified-Since", modified)
+            # Body is not needed
+            self.__get_session().send(message, None).close(None)
+            status = message.get_status()
+            Logger.debug("CSSDownloader::is_modified(): %s, %s",
+                         uri, status)
+            if status == Soup.Status.OK:
+                with self.__lock:
+                    if uri in self.__contents.keys():
+                        self.__size -= len(self.__contents.pop(uri)[0])
+                return True
+        except Exception as e:
+            Logger.warning("CSSDownloader::is_modified(): %s -> %s", e, uri)
+        return False
+
+#######################
+# PRIVATE             #
+#######################
+    def __get_session(self):
+        """
+            Get session for current thread
+            @return Soup.Session
+        """
+        if self.__session is not None:
+            return self.__session
+        session = getattr(self.__local, "session", None)
+        if session is None:
+            session = Soup.Session.new()
+            self.__local.session = session
+        return session
+
+    def __download(self, uri, cancellable):
+        """
+            Download stylesheet
+            @param uri as str
+            @param cancellable as Gio.Cancellable
+            @return (str, str, str) as (css, etag, last modified)
+                    values may be None
+        """
+        etag = modified = None
+        try:
+            if uri.startswith("http:") or uri.startswith("https:"):
+                message = Soup.Message.new("GET", uri)
+                # Body is read in one GBytes, not in small chunks
+                data = self.__get_session().send_and_read(
+                    message, cancellable).get_data()
+                if message.get_status() != Soup.Status.OK:
+                    Logger.warning("CSSDownloader::__download(): %s -> %s",
+                                   message.get_status(), uri)
+                    return (None, None, None)
+                headers = message.get_response_headers()
+                etag = headers.get_one("ETag")
+                modified = headers.get_one("Last-Modified")
+            else:
+                (status, data, tag) = Gio.File.new_for_uri(
+                    uri).load_contents(cancellable)
+            try:
+                return (data.decode("utf-8"), etag, modified)
+            except UnicodeDecodeError:
+                return (data.decode("iso8859-1"), etag, modified)
+        except Exception as e:
+            Logger.error("CSSDownloader::__download(): %s -> %s", e, uri)
+        return (None, None, None)
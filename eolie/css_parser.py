@@ -0,0 +1,226 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+
+class CSSParser:
+    """
+        Single pass CSS parser
+        Text between two special characters is skipped by a regex search,
+        strings, comments and parenthesis (url(), var(), ...) are handled
+        while scanning, so each character is read once
+        Rules are tuples:
+        - (CSSParser.STYLE, selector, [(property, value)])
+        - (CSSParser.MEDIA, condition, [rule])
+        - (CSSParser.SUPPORTS, condition, [rule])
+        - (CSSParser.IMPORT, url, None)
+        Other at-rules are skipped
+    """
+    STYLE = 0
+    MEDIA = 1
+    SUPPORTS = 2
+    IMPORT = 3
+
+    __SPECIAL = re.compile(r'/\*|["\'{}();\\]')
+    # Declaration blocks needing a scan, only url() may contain ; or }
+    __COMPLEX = re.compile(r'[/"\'{\\]|url\(', re.IGNORECASE)
+    # Unterminated strings end at newline
+    __STRINGS = {
+        '"': re.compile(r'"(?:[^"\\\n]|\\.)*"?', re.DOTALL),
+        "'": re.compile(r"'(?:[^'\\\n]|\\.)*'?", re.DOTALL)
+    }
+    # Style rule without comments or nested blocks, strings in declarations
+    # do not contain ;
+    __SIMPLE_RULE = re.compile(
+        r'\s*([^\s@{};"\'/\\][^{};"\'/\\]*)\{([^{}"\'/\\]*'
+        r'(?:(?:"(?:[^"\\\n;]|\\[^\n;])*"|\'(?:[^\'\\\n;]|\\[^\n;])*\')'
+        r'[^{}"\'/\\]*)*)\}')
+    __URL = re.compile(r"\s*[^\s\"')][^)]*\)?")
+    __AT_RULE = re.compile(r"@([-\w]+) ?(.*)")
+    __IMPORT_URL = re.compile(
+        r"""\s*(?:url\(\s*)?(?:"([^"]*)"|'([^']*)'|([^\s)'"]+))""")
+
+    def __init__(self, css):
+        """
+            Init parser
+            @param css as str
+        """
+        self.__css = css
+        self.__position = 0
+
+    def parse(self):
+        """
+            Get rules
+            @return [tuple]
+        """
+        self.__position = 0
+        return self.__parse_rules(False)
+
+#######################
+# PRIVATE             #
+#######################
+    def __read(self, stops):
+        """
+            Read until a stop character, comments are removed
+            ; only stops outside parenthesis
+            @param stops as str
+            @return (str, str/None) as (text, stop character, None at end)
+        """
+        css = self.__css
+        search = self.__SPECIAL.search
+        position = text_start = self.__position
+        # Text before comments
+        parts = []
+        depth = 0
+        while True:
+            match = search(css, position)
+            if match is None:
+                parts.append(css[text_start:])
+                self.__position = len(css)
+                return ("".join(parts), None)
+            start = match.start()
+            char = css[start]
+            if char == "/":
+                parts.append(css[text_start:start])
+                end = css.find("*/", start + 2)
+                position = text_start = len(css) if end == -1 else end + 2
+            elif char in "\"'":
+                position = self.__STRINGS[char].match(css, start).end()
+            elif char == "\\":
+                position = start + 2
+            elif char == "(":
+                # Unquoted url() may contain anything but )
+                url = self.__URL.match(css, start + 1)\
+                    if css[start - 3:start].lower() == "url" else None
+                if url is None:
+                    depth += 1
+                    position = start + 1
+                else:
+                    position = url.end()
+            elif char == ")":
+                if depth:
+                    depth -= 1
+                position = start + 1
+            elif char in stops and (char != ";" or depth == 0):
+                self.__position = start + 1
+                if parts:
+                    parts.append(css[text_start:start])
+                    return ("".join(parts), char)
+                return (css[text_start:start], char)
+            else:
+                position = start + 1
+
+    def __skip_block(self):
+        """
+            Skip a block, opening bracket already read
+        """
+        depth = 1
+        while depth:
+            (text, stop) = self.__read("{}")
+            if stop is None:
+                break
+            depth += 1 if stop == "{" else -1
+
+    def __parse_rules(self, nested):
+        """
+            Parse rules until end of block
+            @param nested as bool: True if inside an at-rule block
+            @return [tuple]
+        """
+        rules = []
+        css = self.__css
+        simple_rule = self.__SIMPLE_RULE.match
+        while True:
+            # Fast path, rules needing a scan are read below
+            match = simple_rule(css, self.__position)
+            if match is not None:
+                declarations = match.group(2)
+                if "url(" not in declarations.lower():
+                    self.__position = match.end()
+                    rules.append((self.STYLE,
+                                  " ".join(match.group(1).split()),
+                                  self.__get_declarations(
+                                      declarations.split(";"))))
+                    continue
+            (prelude, stop) = self.__read("{};")
+            if stop is None or (stop == "}" and nested):
+                break
+            elif stop == "}":
+                # Stray bracket
+                continue
+            prelude = " ".join(prelude.split())
+            if not prelude.startswith("@"):
+                if stop == "{":
+                    rules.append((self.STYLE,
+                                  prelude,
+                                  self.__parse_declarations()))
+                continue
+            match = self.__AT_RULE.match(prelude)
+            name = match.group(1).lower() if match is not None else ""
+            if stop == ";":
+                if name == "import":
+                    url = self.__IMPORT_URL.match(match.group(2))
+                    if url is not None:
+                        rules.append((self.IMPORT,
+                                      url.group(1) or url.group(2) or
+                                      url.group(3),
+                                      None))
+            elif name == "media":
+                rules.append((self.MEDIA,
+                              match.group(2),
+                              self.__parse_rules(True)))
+            elif name == "supports":
+                rules.append((self.SUPPORTS,
+                              match.group(2),
+                              self.__parse_rules(True)))
+            else:
+                self.__skip_block()
+        return rules
+
+    def __parse_declarations(self):
+        """
+            Parse declarations until end of block
+            @return [(str, str)]
+        """
+        css = self.__css
+        position = self.__position
+        # Fast path, nothing to handle before end of block
+        end = css.find("}", position)
+        if end != -1 and self.__COMPLEX.search(css, position, end) is None:
+            self.__position = end + 1
+            texts = css[position:end].split(";")
+        else:
+            texts = []
+            while True:
+                (text, stop) = self.__read(";{}")
+                if stop == "{":
+                    # Nested rule, not supported
+                    self.__skip_block()
+                    continue
+                texts.append(text)
+                if stop != ";":
+                    break
+        return self.__get_declarations(texts)
+
+    def __get_declarations(self, texts):
+        """
+            Get declarations from texts
+            @param texts as [str]
+            @return [(str, str)]
+        """
+        declarations = []
+        for text in texts:
+            (prop, colon, value) = text.partition(":")
+            if colon:
+                declarations.append((prop.strip(), value.strip()))
+        return declarations
@@ -10,9 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from urllib.parse import urlparse
-import re
-from os.path import dirname
+from urllib.parse import urljoin
 
 from eolie.logger import Logger
 
@@ -22,34 +20,36 @@ class CSSImportRule:
         Represent an import rule
     """
 
-    def __init__(self, css, uri, cancellable):
+    def __init__(self, url, uri, cancellable):
         """
             Init rule
-            @param css as str
+            @param url as str: imported stylesheet, may be relative
             @param uri as str
             @param cancellable as Gio.Cancellable
         """
         self.__stylesheet = None
         try:
-            parsed = urlparse(uri)
-            search = re.search('@import url\(["\']?([^"\')]*)', css)
-            css = search.group(1)
-            if css.startswith(".."):
-                path_split = parsed.path.split("/")
-                css_uri = "%s://%s%s/%s" % (parsed.scheme, parsed.netloc,
-                                            "/".join(path_split[:-1]), css)
-            elif css.startswith("//"):
-                css_uri = "%s:%s" % (parsed.scheme, css)
-            elif not css.startswith("http"):
-                parent = dirname(parsed.path)
-                css_uri = "%s://%s%s/%s" % (
-                    parsed.scheme, parsed.netloc, parent, css)
+            css_uri = urljoin(uri, url)
             from eolie.css_stylesheet import StyleSheet
             self.__stylesheet = StyleSheet(uri=css_uri,
                                            cancellable=cancellable)
-            self.__stylesheet.populate()
         except Exception as e:
-            Logger.error("CSSImportRule::__init__: %s -> %s", e, css)
+            Logger.error("CSSImportRule::__init__: %s -> %s", e, url)
+
+    def populate(self, parents):
+        """
+            Populate imported stylesheet
+            @param parents as frozenset: URIs of importing stylesheets
+            @thread safe
+        """
+        if self.__stylesheet is None:
+            return
+        elif self.__stylesheet.uri in parents:
+            Logger.warning("CSSImportRule::populate(): import loop -> %s",
+                           self.__stylesheet.uri)
+            self.__stylesheet = None
+        else:
+            self.__stylesheet.populate(parents)
 
     @property
     def css_text(self):
@@ -62,13 +62,21 @@ class CSSImportRule:
         else:
             return self.__stylesheet.css_text
 
+    @property
+    def colors(self):
+        """
+            Get colors to transform, imported stylesheet has its own
+            @return [(str, ColorProperty)]
+        """
+        return []
+
     @property
     def populated(self):
         """
             True if rule is populated
             @return bool
         """
-        return self.__stylesheet is not None and self.__stylesheet.populated
+        return self.__stylesheet is None or self.__stylesheet.populated
 
 #######################
 # PRIVATE             #
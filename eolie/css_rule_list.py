@@ -10,8 +10,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
-
+from eolie.css_parser import CSSParser
 from eolie.css_rule_style import CSSStyleRule
 from eolie.css_rule_media import CSSMediaRule
 from eolie.css_rule_import import CSSImportRule
@@ -23,30 +22,24 @@ class CSSRuleList:
         Represent a list of rules
     """
 
-    def __init__(self, css, uri, cancellable):
+    def __init__(self, rules, uri, cancellable):
         """
             Init rule
-            @param css as str
+            @param rules as [tuple]: see CSSParser
             @param uri as str
             @param cancellable as Gio.Cancellable
         """
         self.__uri = uri
         self.__rules = []
-        for child in self.__get_children(css):
-            child = child.strip()
-            # Remove any comment
-            child = re.sub("\/\*[^*]*[^/]*\*\/", "", child)
-            if child.startswith("@media"):
-                rule = CSSMediaRule(child, uri, cancellable)
-            elif child.startswith("@supports"):
-                rule = CSSSupportsRule(child, uri, cancellable)
-            elif child.startswith("@import"):
-                rule = CSSImportRule(child, uri, cancellable)
-            elif child.startswith("@"):
-                # Ignore others at-rules
-                continue
+        for (rule_type, prelude, content) in rules:
+            if rule_type == CSSParser.MEDIA:
+                rule = CSSMediaRule(prelude, content, uri, cancellable)
+            elif rule_type == CSSParser.SUPPORTS:
+                rule = CSSSupportsRule(prelude, content, uri, cancellable)
+            elif rule_type == CSSParser.IMPORT:
+                rule = CSSImportRule(prelude, uri, cancellable)
             else:
-                rule = CSSStyleRule(child)
+                rule = CSSStyleRule(prelude, content)
             self.__rules.append(rule)
 
     @property
@@ -57,6 +50,26 @@ class CSSRuleList:
         css = [rule.css_text for rule in self.__rules]
         return "".join(css)
 
+    @property
+    def colors(self):
+        """
+            Get colors to transform
+            @return [(str, ColorProperty)]
+        """
+        colors = []
+        for rule in self.__rules:
+            colors += rule.colors
+        return colors
+
+    @property
+    def imports(self):
+        """
+            Get import rules, @import is only valid at top level
+            @return [CSSImportRule]
+        """
+        return [rule for rule in self.__rules
+                if isinstance(rule, CSSImportRule)]
+
     @property
     def populated(self):
         """
@@ -71,26 +84,3 @@ class CSSRuleList:
 #######################
 # PRIVATE             #
 #######################
-    def __get_children(self, css):
-        """
-            Get children for css
-            @param css as str
-            @return [str]
-        """
-        children = []
-        css = css.replace("\n", "").strip()
-        css_split = css.split("}")
-        bracket_count = 0
-        children = []
-        subcss = []
-        while css_split:
-            item = css_split.pop(0)
-            for import_css in re.findall("@import[^;]*;", item):
-                children.append(import_css)
-                item.replace(import_css, "")
-            bracket_count += item.count("{") - 1
-            subcss.append(item)
-            if bracket_count == 0:
-                children.append("%s}" % "}".join(subcss))
-                subcss = []
-        return children
@@ -10,8 +10,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
-
 from eolie.logger import Logger
 
 
@@ -20,24 +18,21 @@ class CSSMediaRule:
         Represent a media rule
     """
 
-    def __init__(self, css, uri, cancellable):
+    def __init__(self, condition, rules, uri, cancellable):
         """
             Init rule
-            @param css as str
+            @param condition as str
+            @param rules as [tuple]: see CSSParser
             @param uri as str
             @param cancellable as Gio.Cancellable
         """
         self.__rules = None
-        self.__condition = None
+        self.__condition = condition
         try:
-            # Get condition @media ... {
-            search = re.search('@media ([^{]*){(.*)', css)
-            if search is not None:
-                from eolie.css_rule_list import CSSRuleList
-                self.__condition = search.group(1)
-                self.__rules = CSSRuleList(search.group(2), uri, cancellable)
+            from eolie.css_rule_list import CSSRuleList
+            self.__rules = CSSRuleList(rules, uri, cancellable)
         except Exception as e:
-            Logger.error("CSSMediaRule::__init__(): %s -> %s", e, css)
+            Logger.error("CSSMediaRule::__init__(): %s -> %s", e, condition)
 
     @property
     def css_text(self):
@@ -51,6 +46,16 @@ class CSSMediaRule:
                 return "@media %s { %s } " % (self.__condition, css_text)
         return ""
 
+    @property
+    def colors(self):
+        """
+            Get colors to transform
+            @return [(str, ColorProperty)]
+        """
+        if self.__rules is None:
+            return []
+        return self.__rules.colors
+
     @property
     def populated(self):
         """
@@ -10,10 +10,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gio, GObject, GLib, Soup
+from gi.repository import Gio, GObject, GLib
 
+from threading import Thread, BoundedSemaphore
+
+from eolie.css_colors import CSSColors
+from eolie.css_parser import CSSParser
 from eolie.css_rule_list import CSSRuleList
-from eolie.logger import Logger
+from eolie.define import App
 
 
 class StyleSheet(GObject.Object):
@@ -24,6 +28,8 @@ class StyleSheet(GObject.Object):
     __gsignals__ = {
         "populated": (GObject.SignalFlags.RUN_FIRST, None, ()),
     }
+    # Threads populating imports, shared by all stylesheets
+    __import_threads = BoundedSemaphore(4)
 
     def __init__(self, uri=None, contents=None, cancellable=None):
         """
@@ -43,16 +49,22 @@ class StyleSheet(GObject.Object):
         self.__css_text = None
         self.__started_time = 0
 
-    def populate(self):
+    def populate(self, parents=frozenset()):
         """
-            Populate styleheet
+            Populate styleheet, imported stylesheets are populated
+            concurrently
+            @param parents as frozenset: URIs of importing stylesheets
         """
         if self.__uri is not None and self.__contents is None:
-            self.__contents = self.__get_uri_contents(self.__uri)
+            self.__contents = App().css_downloader.get(self.__uri,
+                                                       self.__cancellable)
         if self.__contents is not None:
-            self.__css_rules = CSSRuleList(self.__contents,
+            rules = CSSParser(self.__contents).parse()
+            self.__css_rules = CSSRuleList(rules,
                                            self.__uri,
                                            self.__cancellable)
+            self.__populate_imports(self.__css_rules.imports,
+                                    parents | {self.__uri})
         GLib.idle_add(self.emit, "populated")
 
     def set_css_text(self, css_text):
@@ -86,6 +98,7 @@ class StyleSheet(GObject.Object):
         if self.__css_text is not None:
             return self.__css_text
         elif self.__css_rules is not None:
+            CSSColors.prepare_colors(self.__css_rules.colors)
             self.__css_text = self.__css_rules.css_text
             return self.__css_text
         return ""
@@ -118,27 +131,37 @@ class StyleSheet(GObject.Object):
 #######################
 # PRIVATE             #
 #######################
-    def __get_uri_contents(self, uri):
+    def __populate_imports(self, imports, parents):
+        """
+            Populate imported stylesheets, in a few threads. Imports are
+            populated in current thread when no thread is available, so
+            nested imports never wait for a thread
+            @param imports as [CSSImportRule]
+            @param parents as frozenset: URIs of importing stylesheets
+        """
+        threads = []
+        pending = imports[:1]
+        for rule in imports[1:]:
+            if self.__import_threads.acquire(blocking=False):
+                thread = Thread(target=self.__populate_import,
+                                args=(rule, parents))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+            else:
+                pending.append(rule)
+        for rule in pending:
+            rule.populate(parents)
+        for thread in threads:
+            thread.join()
+
+    def __populate_import(self, rule, parents):
         """
-            Get URI content
-            @param uri as str
-            @return str
+            Populate imported stylesheet, release thread
+            @param rule as CSSImportRule
+            @param parents as frozenset: URIs of importing stylesheets
         """
         try:
-            session = Soup.Session.new()
-            request = session.request(uri)
-            stream = request.send(self.__cancellable)
-            bytes = bytearray(0)
-            buf = stream.read_bytes(1024, self.__cancellable).get_data()
-            while buf:
-                bytes += buf
-                buf = stream.read_bytes(1024, self.__cancellable).get_data()
-            stream.close()
-            try:
-                return bytes.decode("utf-8")
-            except:
-                return bytes.decode("iso8859-1")
-        except Exception as e:
-            Logger.error("StyleSheet::__get_uri_contents(): %s -> %s" %
-                         (e, uri))
-        return None
+            rule.populate(parents)
+        finally:
+            self.__import_threads.release()
@@ -0,0 +1,164 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+
+from eolie.helper_task import TaskHelper
+from eolie.define import App
+from eolie.css_stylesheet import StyleSheet
+from eolie.css_disk_cache import CSSDiskCache
+from eolie.logger import Logger
+
+
+class StyleSheetCache:
+    """
+        Night mode CSS shared by all web views
+        Transformed CSS is kept in memory (LRU) then on disk. Requests for
+        a stylesheet being loaded wait for it instead of loading it again.
+        Cached stylesheets are checked upstream in background, a modified
+        one is transformed again on next load
+    """
+    # Characters of CSS kept in memory
+    __MAX_SIZE = 16 * 1024 * 1024
+
+    def __init__(self):
+        """
+            Init cache
+        """
+        self.__task_helper = TaskHelper()
+        self.__disk_cache = CSSDiskCache()
+        # Not on first use, that would be in main thread
+        self.__task_helper.run(self.__disk_cache.load)
+        # {key: css text}
+        self.__css = OrderedDict()
+        self.__size = 0
+        # {key: [(callback, *args)]}
+        self.__loading = {}
+
+    def load(self, key, uri, contents, callback, *args):
+        """
+            Get transformed CSS for key
+            @param key as str: uri or contents hash
+            @param uri as str
+            @param contents as str/None: None to download uri
+            @param callback as function
+            @param *args as callback arguments
+            @callback (css text as str, *args)
+            @return bool: False if CSS has to be transformed
+        """
+        if key in self.__css.keys():
+            self.__css.move_to_end(key)
+            callback(self.__css[key], *args)
+            self.__revalidate(key)
+            return True
+        cached = self.__disk_cache.contains(key)
+        if key in self.__loading.keys():
+            self.__loading[key].append((callback, *args))
+            return cached
+        self.__loading[key] = [(callback, *args)]
+        self.__task_helper.run(self.__load, key, uri, contents,
+                               callback=(self.__on_load, key))
+        return cached
+
+    def remove(self, key):
+        """
+            Remove CSS for key from memory and disk
+            @param key as str
+        """
+        if key in self.__css.keys():
+            self.__size -= len(self.__css.pop(key))
+        self.__disk_cache.remove(key)
+
+    def save(self):
+        """
+            Save disk cache index
+        """
+        self.__disk_cache.save()
+
+    def vacuum(self):
+        """
+            Remove unused and old disk cache entries
+            @return generator of reclaimed bytes
+        """
+        return self.__disk_cache.vacuum()
+
+#######################
+# PRIVATE             #
+#######################
+    def __load(self, key, uri, contents):
+        """
+            Load CSS from disk or transform it
+            @param key as str
+            @param uri as str
+            @param contents as str/None
+            @return str/None: None on failure
+            @thread safe
+        """
+        css_text = self.__disk_cache.get(key)
+        if css_text is not None:
+            return css_text
+        try:
+            stylesheet = StyleSheet(uri=uri, contents=contents)
+            stylesheet.populate()
+            # Download failed
+            if stylesheet.contents is None:
+                return None
+            css_text = stylesheet.css_text
+            # Inline stylesheets are keyed by their contents hash
+            if contents is None:
+                (etag, modified) = App().css_downloader.get_validators(uri)
+                self.__disk_cache.set(key, css_text, uri, etag, modified)
+            else:
+                self.__disk_cache.set(key, css_text, None, None, None)
+            return css_text
+        except Exception as e:
+            Logger.error("StyleSheetCache::__load(): %s", e)
+        return None
+
+    def __revalidate(self, key):
+        """
+            Check stylesheet for key upstream if needed
+            @param key as str
+        """
+        revalidation = self.__disk_cache.get_revalidation(key)
+        if revalidation is not None:
+            self.__task_helper.run(App().css_downloader.is_modified,
+                                   *revalidation,
+                                   callback=(self.__on_revalidated, key))
+
+    def __on_load(self, css_text, key):
+        """
+            Cache CSS and pass it to waiting callbacks
+            @param css_text as str/None: None on failure
+            @param key as str
+        """
+        # Not cached, next load will try again
+        if css_text is None:
+            css_text = ""
+        else:
+            self.__revalidate(key)
+            self.__css[key] = css_text
+            self.__size += len(css_text)
+            while self.__size > self.__MAX_SIZE and len(self.__css) > 1:
+                self.__size -= len(self.__css.popitem(last=False)[1])
+        for (callback, *args) in self.__loading.pop(key, []):
+            callback(css_text, *args)
+
+    def __on_revalidated(self, modified, key):
+        """
+            Remove cache for key if stylesheet changed upstream
+            @param modified as bool
+            @param key as str
+        """
+        if modified:
+            Logger.info("StyleSheetCache: %s changed upstream", key)
+            self.remove(key)
@@ -10,14 +10,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import Gio, GObject, GLib
+from gi.repository import GObject, GLib
 
 from hashlib import md5
 
-from eolie.helper_task import TaskHelper
-from eolie.define import EOLIE_CACHE_PATH
-from eolie.css_stylesheet import StyleSheet
-from eolie.logger import Logger
+from eolie.define import App
 
 
 class StyleSheets(GObject.Object):
@@ -35,9 +32,9 @@ class StyleSheets(GObject.Object):
             Init StyleSheet
         """
         GObject.Object.__init__(self)
-        self.__task_helper = TaskHelper()
         self.__cancellable = None
         self.__populated = True
+        # {key: [started time, css text/None if loading]}
         self.__stylesheets = {}
 
     def set_cancellable(self, cancellable):
@@ -57,23 +54,7 @@ class StyleSheets(GObject.Object):
         if not uri:
             self.emit("populated")
             return
-        if uri in self.__stylesheets.keys():
-            self.__stylesheets[uri].set_started_time(started_time)
-            self.__check_populated()
-        else:
-            self.__populated = False
-            stylesheet = self.__load_from_cache(uri)
-            if stylesheet is None:
-                self.emit("not-cached")
-                stylesheet = StyleSheet(uri=uri)
-                stylesheet.connect("populated", self.__on_stylesheet_populated)
-                self.__stylesheets[uri] = stylesheet
-                stylesheet.set_started_time(started_time)
-                self.__task_helper.run(stylesheet.populate)
-            else:
-                self.__stylesheets[uri] = stylesheet
-                stylesheet.set_started_time(started_time)
-                self.__check_populated()
+        self.__load(uri, uri, None, started_time)
 
     def load_css_text(self, message, uri, started_time):
         """
@@ -85,16 +66,7 @@ class StyleSheets(GObject.Object):
         contents = message.replace("@EOLIE_CSS_TEXT@", "")
         if contents:
             css_hash = md5(contents.encode("utf-8")).hexdigest()
-            if css_hash in self.__stylesheets.keys():
-                self.__stylesheets[css_hash].set_started_time(started_time)
-                self.__check_populated()
-                return
-            self.__populated = False
-            stylesheet = StyleSheet(uri=uri, contents=contents)
-            self.__stylesheets[css_hash] = stylesheet
-            stylesheet.set_started_time(started_time)
-            stylesheet.connect("populated", self.__on_stylesheet_populated)
-            self.__task_helper.run(stylesheet.populate)
+            self.__load(css_hash, uri, contents, started_time)
 
     def get_css_text(self, started_time):
         """
@@ -104,9 +76,9 @@ class StyleSheets(GObject.Object):
         """
         css = []
         for key in list(self.__stylesheets.keys()):
-            stylesheet = self.__stylesheets[key]
-            if stylesheet.started_time == started_time:
-                css.append(stylesheet.css_text)
+            (stylesheet_time, css_text) = self.__stylesheets[key]
+            if stylesheet_time == started_time:
+                css.append(css_text or "")
             else:
                 del self.__stylesheets[key]
         return "".join(css)
@@ -115,15 +87,8 @@ class StyleSheets(GObject.Object):
         """
             Remove cache for current stylesheets
         """
-        try:
-            for uri in self.__stylesheets.keys():
-                encoded = md5(uri.encode("utf-8")).hexdigest()
-                filepath = "%s/css/%s.css" % (EOLIE_CACHE_PATH, encoded)
-                f = Gio.File.new_for_path(filepath)
-                if f.query_exists():
-                    f.delete(None)
-        except Exception as e:
-            Logger.error("StyleSheets::remove_cache(): %s", e)
+        for key in self.__stylesheets.keys():
+            App().stylesheet_cache.remove(key)
 
     def reset(self):
         """
@@ -142,50 +107,41 @@ class StyleSheets(GObject.Object):
 #######################
 # PRIVATE             #
 #######################
+    def __load(self, key, uri, contents, started_time):
+        """
+            Load stylesheet from shared cache
+            @param key as str
+            @param uri as str
+            @param contents as str/None
+            @param started_time as int
+        """
+        if key in self.__stylesheets.keys():
+            self.__stylesheets[key][0] = started_time
+            self.__check_populated()
+            return
+        self.__populated = False
+        self.__stylesheets[key] = [started_time, None]
+        if not App().stylesheet_cache.load(key, uri, contents,
+                                           self.__on_load, key):
+            self.emit("not-cached")
+
     def __check_populated(self):
         """
             Check all stylsheets are populated and emit signal if so
         """
         if not self.__populated:
-            for uri in self.__stylesheets.keys():
-                if not self.__stylesheets[uri].populated:
+            for (started_time, css_text) in self.__stylesheets.values():
+                if css_text is None:
                     return
             self.__populated = True
             GLib.idle_add(self.emit, "populated")
 
-    def __load_from_cache(self, uri):
+    def __on_load(self, css_text, key):
         """
-            Load CSS from cache
-            @param uri as str
-            @return StyleSheet
-        """
-        try:
-            encoded = md5(uri.encode("utf-8")).hexdigest()
-            filepath = "%s/css/%s.css" % (EOLIE_CACHE_PATH, encoded)
-            f = Gio.File.new_for_path(filepath)
-            if f.query_exists():
-                (status, contents, tags) = f.load_contents(None)
-                if status:
-                    stylesheet = StyleSheet(uri=uri)
-                    stylesheet.set_css_text(contents.decode("utf-8"))
-                    return stylesheet
-        except Exception as e:
-            Logger.error("StyleSheets::__load_from_cache(): %s", e)
-        return None
-
-    def __on_stylesheet_populated(self, stylesheet):
-        """
-            Load stylesheet
-            @param stylesheet as StyleSheet
-        """
-        if stylesheet.uri is not None:
-            encoded = md5(stylesheet.uri.encode("utf-8")).hexdigest()
-            filepath = "%s/css/%s.css" % (EOLIE_CACHE_PATH, encoded)
-            f = Gio.File.new_for_path(filepath)
-            fstream = f.replace(None, False,
-                                Gio.FileCreateFlags.REPLACE_DESTINATION,
-                                None)
-            if fstream is not None:
-                fstream.write(stylesheet.css_text.encode("utf-8"), None)
-                fstream.close()
-        self.__check_populated()
+            Set stylesheet CSS
+            @param css_text as str
+            @param key as str
+        """
+        if key in self.__stylesheets.keys():
+            self.__stylesheets[key][1] = css_text
+            self.__check_populated()
@@ -10,16 +10,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import GLib, Gio
+from gi.repository import GLib
 
 import sqlite3
 import itertools
 from urllib.parse import urlparse
 from threading import Lock
 
-from eolie.utils import noaccents, get_random_string
+from eolie.utils import noaccents, get_random_string, get_fts_filters
+from eolie.utils import get_sql_chunks
 from eolie.define import EOLIE_DATA_PATH, Type
 from eolie.localized import LocalizedCollation
+from eolie.bookmarks_html import BookmarksHtmlParser
 from eolie.sqlcursor import SqlCursor
 from eolie.logger import Logger
 from eolie.database_upgrade import DatabaseUpgrade
@@ -31,6 +33,8 @@ class DatabaseBookmarks:
     """
 
     DB_PATH = "%s/bookmarks.db" % EOLIE_DATA_PATH
+    # Rows written per executemany() call when importing
+    __IMPORT_BATCH = 1000
 
     # SQLite documentation:
     # In SQLite, a column with type INTEGER PRIMARY KEY
@@ -60,6 +64,29 @@ class DatabaseBookmarks:
                                         bookmark_id INT NOT NULL,
                                         parent_guid TEXT NOT NULL,
                                         parent_name TEXT NOT NULL)'''
+    # Trigram tokens keep LIKE '%word%' semantics for words >= 3 chars
+    FTS_TABLE = "bookmarks_fts"
+    FTS_SCHEMA = [
+        """CREATE VIRTUAL TABLE bookmarks_fts USING fts5(
+                                     title, uri,
+                                     content='bookmarks', content_rowid='id',
+                                     tokenize='trigram')""",
+        """CREATE TRIGGER bookmarks_fts_ai AFTER INSERT ON bookmarks BEGIN
+             INSERT INTO bookmarks_fts(rowid, title, uri)
+             VALUES (new.id, new.title, new.uri);
+           END""",
+        """CREATE TRIGGER bookmarks_fts_ad AFTER DELETE ON bookmarks BEGIN
+             INSERT INTO bookmarks_fts(bookmarks_fts, rowid, title, uri)
+             VALUES ('delete', old.id, old.title, old.uri);
+           END""",
+        """CREATE TRIGGER bookmarks_fts_au AFTER UPDATE OF title, uri
+           ON bookmarks BEGIN
+             INSERT INTO bookmarks_fts(bookmarks_fts, rowid, title, uri)
+             VALUES ('delete', old.id, old.title, old.uri);
+             INSERT INTO bookmarks_fts(rowid, title, uri)
+             VALUES (new.id, new.title, new.uri);
+           END"""
+    ]
 
     def __init__(self):
         """
@@ -77,6 +104,12 @@ class DatabaseBookmarks:
                     sql.execute(self.__create_tags)
                     sql.execute(self.__create_bookmarks_tags)
                     sql.execute(self.__create_parents)
+                    # Without FTS5 trigram, search falls back to LIKE
+                    try:
+                        for request in self.FTS_SCHEMA:
+                            sql.execute(request)
+                    except Exception as e:
+                        Logger.warning("DatabaseBookmarks::__init__(): %s", e)
                     sql.execute("PRAGMA user_version=%s" % upgrade.version)
             except Exception as e:
                 Logger.error("DatabaseBookmarks::__init__(): %s", e)
@@ -332,6 +365,69 @@ class DatabaseBookmarks:
             result = sql.execute("SELECT guid FROM bookmarks")
             return list(itertools.chain(*result))
 
+    def get_record(self, bookmark_id):
+        """
+            Get bookmark record
+            @param bookmark_id as int
+            @return (int, str, str, str, int, str, str, [str])/None
+                    as get_records()
+        """
+        records = self.get_records([bookmark_id])
+        if records:
+            return records[0]
+        return None
+
+    def get_records(self, bookmark_ids):
+        """
+            Get bookmark records, one request for rows and one for tags
+            @param bookmark_ids as [int]
+            @return [(int, str, str, str, int, str, str, [str])]
+                    as [(id, guid, uri, title, position,
+                         parent guid, parent name, tags)]
+        """
+        rows = {}
+        tags = {}
+        with SqlCursor(self) as sql:
+            for (placeholders, ids) in get_sql_chunks(bookmark_ids):
+                result = sql.execute("SELECT bookmarks.rowid,\
+                                             bookmarks.guid,\
+                                             bookmarks.uri,\
+                                             bookmarks.title,\
+                                             bookmarks.position,\
+                                             parents.parent_guid,\
+                                             parents.parent_name\
+                                      FROM bookmarks\
+                                      LEFT JOIN parents\
+                                      ON parents.bookmark_id=bookmarks.rowid\
+                                      WHERE bookmarks.rowid IN (%s)" %
+                                     placeholders, ids)
+                for row in result:
+                    rows[row[0]] = row
+                result = sql.execute("SELECT bookmarks_tags.bookmark_id,\
+                                             tags.title\
+                                      FROM tags, bookmarks_tags\
+                                      WHERE bookmarks_tags.bookmark_id\
+                                            IN (%s)\
+                                      AND bookmarks_tags.tag_id=tags.rowid\
+                                      ORDER BY title COLLATE LOCALIZED" %
+                                     placeholders, ids)
+                for (bookmark_id, title) in result:
+                    if bookmark_id in tags:
+                        tags[bookmark_id].append(title)
+                    else:
+                        tags[bookmark_id] = [title]
+        records = []
+        for bookmark_id in bookmark_ids:
+            row = rows.get(bookmark_id)
+            if row is None:
+                continue
+            (rowid, guid, uri, title, position,
+             parent_guid, parent_name) = row
+            records.append((rowid, guid, uri, title, position,
+                            parent_guid or "unfiled", parent_name or "",
+                            tags.get(rowid, [])))
+        return records
+
     def get_children(self, guid):
         """
             Get guid children
@@ -495,6 +591,21 @@ class DatabaseBookmarks:
                                   ORDER BY bookmarks.mtime DESC")
             return list(result)
 
+    def get_for_tag(self, tag_id):
+        """
+            Get bookmarks for tag id, handles static tags
+            @param tag_id as int
+            @return [(id, title, uri)]
+        """
+        if tag_id == Type.POPULARS:
+            return self.get_populars(50)
+        elif tag_id == Type.RECENTS:
+            return self.get_recents()
+        elif tag_id == Type.UNCLASSIFIED:
+            return self.get_unclassified()
+        else:
+            return self.get_bookmarks(tag_id)
+
     def get_popularity(self, bookmark_id):
         """
             Get popularity for bookmark id
@@ -774,168 +885,65 @@ class DatabaseBookmarks:
                 return True
             return False
 
-    def import_html(self, path):
+    def import_html(self, path, progress=None):
         """
             Import html bookmarks
             @param path as str
+            @param progress as function
+            @return imported bookmarks count as int
         """
         try:
-            from bs4 import BeautifulSoup
-            SqlCursor.add(self)
-            f = Gio.File.new_for_path(path)
-            if not f.query_exists():
-                return
-            (status, content, tag) = f.load_contents(None)
-            if status:
-                data = content.decode("utf-8")
-                soup = BeautifulSoup(data, "html.parser")
-                parent_name = ""
-                position = 0
-                for dt in soup.findAll("dt"):
-                    h3 = dt.find("h3")
-                    if h3 is not None:
-                        parent_name = h3.contents[0]
-                        continue
-                    else:
-                        a = dt.find("a")
-                        uri = a.get("href")
-                        if a.get("tags") is None:
-                            tags = [parent_name]
-                        else:
-                            tags = [a.get("tags")]
-                        title = a.contents[0]
-                        if uri is None:
-                            parent_name = title
-                            continue
-                        elif not uri.startswith('http') or not title:
-                            continue
-                        uri = uri.rstrip('/')
-                        rowid = self.get_id(uri)
-                        if rowid is None:
-                            if not tags:
-                                tags = [parent_name]
-                            # Add bookmark
-                            bookmark_id = self.add(title, uri, None,
-                                                   tags, 0)
-                            # Set position
-                            self.set_position(bookmark_id, position)
-                            position += 1
-            SqlCursor.remove(self)
+            if not GLib.file_test(path, GLib.FileTest.IS_REGULAR):
+                return 0
+            return self.__import(self.__get_html_bookmarks(path), progress)
         except Exception as e:
             Logger.error("DatabaseBookmarks::import_html(): %s", e)
+        return 0
 
-    def import_chromium(self, chrome):
+    def import_chromium(self, chrome, progress=None):
         """
             Chromium/Chrome importer
             As Eolie doesn't sync with Chromium, we do not handle parent
             guid and just import parents as tags
             @param chrome as bool
+            @param progress as function
+            @return imported bookmarks count as int
         """
         try:
-            SqlCursor.add(self)
-            import json
             homedir = GLib.get_home_dir()
             if chrome:
                 path = homedir + "/.config/chrome/Default/Bookmarks"
             else:
                 path = homedir + "/.config/chromium/Default/Bookmarks"
-            status = False
-            f = Gio.File.new_for_path(path)
-            if f.query_exists():
-                (status, content, tag) = f.load_contents(None)
-            if status:
-                data = content.decode("utf-8")
-                j = json.loads(data)
-                parents = []
-                # Setup initial parents
-                for root in j["roots"]:
-                    parents.append(("", j["roots"][root]["children"]))
-                # Walk parents and children
-                while parents:
-                    (parent_name, children) = parents.pop(0)
-                    bookmarks = []
-                    for child in children:
-                        if child["type"] == "folder":
-                            parents.append((child["name"], child["children"]))
-                        elif child["type"] == "url":
-                            bookmarks.append((child["name"],
-                                              child["url"]))
-                    position = 0
-                    for bookmark in bookmarks:
-                        tags = [parent_name]
-                        title = bookmark[0]
-                        uri = bookmark[1]
-                        if not uri.startswith('http') or not title:
-                            continue
-                        uri = uri.rstrip('/')
-                        rowid = self.get_id(uri)
-                        if rowid is None:
-                            # Add bookmark
-                            bookmark_id = self.add(title, uri, None,
-                                                   tags, 0)
-                            # Set position
-                            self.set_position(bookmark_id, position)
-                            position += 1
-            SqlCursor.remove(self)
+            if not GLib.file_test(path, GLib.FileTest.IS_REGULAR):
+                return 0
+            return self.__import(self.__get_chromium_bookmarks(path),
+                                 progress)
         except Exception as e:
             Logger.error("DatabaseBookmarks::import_chromium(): %s", e)
+        return 0
 
-    def import_firefox(self, profile):
+    def import_firefox(self, profile, progress=None):
         """
             Mozilla Firefox importer
             @param profile as str
+            @param progress as function
+            @return imported bookmarks count as int
         """
         try:
-            SqlCursor.add(self)
             path = "%s/.mozilla/firefox/%s/places.sqlite" % \
                 (GLib.get_home_dir(),
                  profile)
-            f = Gio.File.new_for_path(path)
-            if f.query_exists():
-                c = sqlite3.connect(path, 600.0)
-                # Add bookmarks
-                bookmarks = self.__get_firefox_bookmarks(c)
-                for (title, uri, parent_name, bookmark_guid,
-                     parent_guid, position) in bookmarks:
-                    tags = self.__get_tags_for_firefox_bookmark(c,
-                                                                bookmark_guid)
-                    bookmark_guid = self.__clean_guid(bookmark_guid)
-                    parent_guid = self.__clean_guid(parent_guid)
-                    if not uri.startswith('http') or not title:
-                        continue
-                    uri = uri.rstrip('/')
-                    rowid = self.get_id(uri)
-                    if rowid is None:
-                        # If bookmark is not tagged, we use parent name
-                        if not tags:
-                            tags = [parent_name]
-                        # Bookmarks and folder
-                        bookmark_id = self.add(title, uri, bookmark_guid,
-                                               tags, 0)
-                        self.set_parent(bookmark_id, parent_guid,
-                                        parent_name)
-                        self.set_position(bookmark_id, position)
-                # Add folders, we need to get them
-                # as Firefox needs children order
-                parents = self.__get_firefox_parents(c)
-                for (title, parent_name, bookmark_guid,
-                     parent_guid, position) in parents:
-                    bookmark_guid = self.__clean_guid(bookmark_guid)
-                    parent_guid = self.__clean_guid(parent_guid)
-                    if not title or bookmark_guid == "root":
-                        continue
-                    uri = bookmark_guid
-                    rowid = self.get_id(uri)
-                    if rowid is None:
-                        # Bookmarks and folder
-                        bookmark_id = self.add(title, uri, bookmark_guid,
-                                               [], 0)
-                        self.set_parent(bookmark_id, parent_guid,
-                                        parent_name)
-                        self.set_position(bookmark_id, position)
-            SqlCursor.remove(self)
+            if not GLib.file_test(path, GLib.FileTest.IS_REGULAR):
+                return 0
+            c = sqlite3.connect(path, 600.0)
+            try:
+                return self.__import(self.__get_firefox_items(c), progress)
+            finally:
+                c.close()
         except Exception as e:
             Logger.error("DatabaseBookmarks::import_firefox(): %s", e)
+        return 0
 
     def exists_guid(self, guid):
         """
@@ -956,6 +964,58 @@ class DatabaseBookmarks:
             @return [(id, title, uri)] as [(int, str, str)]
         """
         words = search.lower().split()
+        (match, likes) = get_fts_filters(words)
+        if match is None:
+            return self.__search_like(words, limit)
+        items = []
+        with SqlCursor(self) as sql:
+            filters = (match,)
+            request = "SELECT bookmarks.rowid, bookmarks.title, bookmarks.uri\
+                       FROM bookmarks_fts, bookmarks\
+                       WHERE bookmarks_fts MATCH ?\
+                       AND bookmarks.rowid=bookmarks_fts.rowid\
+                       AND bookmarks.guid != bookmarks.uri"
+            for word in likes:
+                filters += ("%" + word + "%", "%" + word + "%")
+                request += " AND (bookmarks.title LIKE ?\
+                             OR bookmarks.uri LIKE ?)"
+            filters += (limit,)
+            # BM25 is negative, lower is better
+            request += " ORDER BY bm25(bookmarks_fts) *\
+                         (1.0 + popularity / (popularity + 10.0)),\
+                         length(bookmarks.uri) ASC LIMIT ?"
+            try:
+                result = sql.execute(request, filters)
+                items = list(result)
+            except Exception as e:
+                Logger.error("DatabaseBookmarks::search(): %s", e)
+                return self.__search_like(words, limit)
+        return items
+
+    def get_cursor(self):
+        """
+            Return a new sqlite cursor
+        """
+        try:
+            c = sqlite3.connect(self.DB_PATH, 600.0,
+                                check_same_thread=False)
+            c.create_collation('LOCALIZED', LocalizedCollation())
+            c.create_function("noaccents", 1, noaccents)
+            return c
+        except Exception as e:
+            Logger.error("DatabaseBookmarks::get_cursor(): %s", e)
+            exit(-1)
+
+#######################
+# PRIVATE             #
+#######################
+    def __search_like(self, words, limit):
+        """
+            Search words in db with a full scan
+            @param words as [str]
+            @param limit as int
+            @return [(id, title, uri)] as [(int, str, str)]
+        """
         items = []
         with SqlCursor(self) as sql:
             filters = ()
@@ -977,22 +1037,209 @@ class DatabaseBookmarks:
             items = list(result)
         return items
 
-    def get_cursor(self):
+    def __import(self, items, progress):
         """
-            Return a new sqlite cursor
+            Import bookmarks in one transaction
+            Duplicates and tags are resolved in memory, rows are written
+            by batches with executemany()
+            @param items as iterable of (title, uri, guid, tags,
+                                         parent_guid, parent_name, position)
+            @param progress as function
+            @return imported bookmarks count as int
         """
-        try:
-            c = sqlite3.connect(self.DB_PATH, 600.0)
-            c.create_collation('LOCALIZED', LocalizedCollation())
-            c.create_function("noaccents", 1, noaccents)
-            return c
-        except Exception as e:
-            Logger.error("DatabaseBookmarks::get_cursor(): %s", e)
-            exit(-1)
+        count = 0
+        with SqlCursor(self, True) as sql:
+            if not sql.in_transaction:
+                sql.execute("BEGIN IMMEDIATE")
+            try:
+                uris = set()
+                guids = set()
+                result = sql.execute("SELECT uri, guid FROM bookmarks")
+                for (uri, guid) in result:
+                    uris.add(self.__get_uri_key(uri))
+                    guids.add(guid)
+                tags = {}
+                result = sql.execute("SELECT rowid, title FROM tags")
+                for (tag_id, title) in result:
+                    tags[title.lower()] = tag_id
+                result = sql.execute("SELECT MAX(rowid) FROM bookmarks")
+                first_id = bookmark_id = (result.fetchone()[0] or 0) + 1
+                # Index new rows once at the end instead of per insert
+                # No trigger when SQLite lacks FTS5 trigram
+                result = sql.execute("SELECT COUNT(*) FROM sqlite_master\
+                                      WHERE type='trigger'\
+                                      AND name='bookmarks_fts_ai'")
+                fts = result.fetchone()[0] != 0
+                if fts:
+                    sql.execute("DROP TRIGGER bookmarks_fts_ai")
+                bookmarks = []
+                bookmarks_tags = []
+                parents = []
+                for (title, uri, guid, item_tags,
+                     parent_guid, parent_name, position) in items:
+                    key = self.__get_uri_key(uri)
+                    if key is not None and key in uris:
+                        continue
+                    if guid is None:
+                        guid = get_random_string(12)
+                        while guid in guids:
+                            guid = get_random_string(12)
+                    elif guid in guids:
+                        continue
+                    uris.add(key)
+                    guids.add(guid)
+                    bookmarks.append((bookmark_id, title, uri, 0, 0,
+                                      guid, 0, position))
+                    tag_ids = set()
+                    for tag in item_tags:
+                        if not tag:
+                            continue
+                        tag_id = tags.get(tag.lower())
+                        if tag_id is None:
+                            result = sql.execute("INSERT INTO tags\
+                                                  (title) VALUES (?)",
+                                                 (tag,))
+                            tag_id = tags[tag.lower()] = result.lastrowid
+                        if tag_id not in tag_ids:
+                            tag_ids.add(tag_id)
+                            bookmarks_tags.append((bookmark_id, tag_id))
+                    if parent_guid is not None:
+                        parents.append((bookmark_id, parent_guid,
+                                        parent_name))
+                    bookmark_id += 1
+                    if len(bookmarks) >= self.__IMPORT_BATCH:
+                        count += len(bookmarks)
+                        self.__import_batch(sql, bookmarks,
+                                            bookmarks_tags, parents)
+                        if progress is not None:
+                            progress(count)
+                count += len(bookmarks)
+                self.__import_batch(sql, bookmarks, bookmarks_tags, parents)
+                if fts:
+                    sql.execute("INSERT INTO bookmarks_fts(rowid, title, uri)\
+                                 SELECT id, title, uri FROM bookmarks\
+                                 WHERE id >= ?", (first_id,))
+                    sql.execute(self.FTS_SCHEMA[1])
+            except Exception:
+                sql.rollback()
+                raise
+        if progress is not None:
+            progress(count)
+        Logger.info("DatabaseBookmarks::__import(): %s bookmarks", count)
+        return count
+
+    def __import_batch(self, sql, bookmarks, bookmarks_tags, parents):
+        """
+            Write pending import rows and empty lists
+            @param sql as sqlite3.Connection
+            @param bookmarks as [(int, str, str, int, int, str, int, int)]
+            @param bookmarks_tags as [(int, int)]
+            @param parents as [(int, str, str)]
+        """
+        sql.executemany("INSERT INTO bookmarks\
+                         (id, title, uri, popularity, atime,\
+                          guid, mtime, position)\
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)", bookmarks)
+        sql.executemany("INSERT INTO bookmarks_tags\
+                         (bookmark_id, tag_id) VALUES (?, ?)",
+                        bookmarks_tags)
+        sql.executemany("INSERT INTO parents\
+                         (bookmark_id, parent_guid, parent_name)\
+                         VALUES (?, ?, ?)", parents)
+        del bookmarks[:]
+        del bookmarks_tags[:]
+        del parents[:]
+
+    def __get_uri_key(self, uri):
+        """
+            Get key used to detect duplicated bookmarks, same as get_id()
+            @param uri as str
+            @return str/None
+        """
+        parsed = urlparse(uri.rstrip('/'))
+        if not parsed.netloc:
+            return None
+        return parsed.netloc + parsed.path
+
+    def __get_html_bookmarks(self, path):
+        """
+            Read bookmarks from a Netscape html file, chunk by chunk
+            @param path as str
+            @return generator of import items
+        """
+        parser = BookmarksHtmlParser()
+        position = 0
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                data = f.read(65536)
+                if data:
+                    parser.feed(data)
+                else:
+                    parser.close()
+                for (title, uri, tags) in parser.pop_bookmarks():
+                    if not uri.startswith('http') or not title:
+                        continue
+                    yield (title, uri.rstrip('/'), None, tags,
+                           None, None, position)
+                    position += 1
+                if not data:
+                    break
+
+    def __get_chromium_bookmarks(self, path):
+        """
+            Read bookmarks from a Chromium profile
+            @param path as str
+            @return generator of import items
+        """
+        import json
+        with open(path, "r", encoding="utf-8") as f:
+            j = json.load(f)
+        parents = []
+        # Setup initial parents
+        for root in j["roots"]:
+            parents.append(("", j["roots"][root]["children"]))
+        # Walk parents and children
+        while parents:
+            (parent_name, children) = parents.pop(0)
+            position = 0
+            for child in children:
+                if child["type"] == "folder":
+                    parents.append((child["name"], child["children"]))
+                elif child["type"] == "url":
+                    title = child["name"]
+                    uri = child["url"]
+                    if not uri.startswith('http') or not title:
+                        continue
+                    yield (title, uri.rstrip('/'), None, [parent_name],
+                           None, None, position)
+                    position += 1
+
+    def __get_firefox_items(self, c):
+        """
+            Read bookmarks and folders from a Firefox profile
+            @param c as Sqlite cursor
+            @return generator of import items
+        """
+        tags = self.__get_firefox_tags(c)
+        for (title, uri, parent_name, bookmark_guid,
+             parent_guid, position) in self.__get_firefox_bookmarks(c):
+            if not uri.startswith('http') or not title:
+                continue
+            # If bookmark is not tagged, we use parent name
+            bookmark_tags = tags.get(bookmark_guid, [parent_name])
+            yield (title, uri.rstrip('/'),
+                   self.__clean_guid(bookmark_guid), bookmark_tags,
+                   self.__clean_guid(parent_guid), parent_name, position)
+        # Add folders, we need to get them
+        # as Firefox needs children order
+        for (title, parent_name, bookmark_guid,
+             parent_guid, position) in self.__get_firefox_parents(c):
+            bookmark_guid = self.__clean_guid(bookmark_guid)
+            if not title or bookmark_guid == "root":
+                continue
+            yield (title, bookmark_guid, bookmark_guid, [],
+                   self.__clean_guid(parent_guid), parent_name, position)
 
-#######################
-# PRIVATE             #
-#######################
     def __get_firefox_bookmarks(self, c):
         """
             Return firefox bookmarks
@@ -1014,24 +1261,26 @@ class DatabaseBookmarks:
                             AND bookmarks.type=1")
         return list(result)
 
-    def __get_tags_for_firefox_bookmark(self, c, guid):
+    def __get_firefox_tags(self, c):
         """
-            Return firefox bookmarks
+            Return firefox tags for all bookmarks
             @param c as Sqlite cursor
-            @param guid as str
-            @return (title, url, parent title, guid, parent guid, position)
-             as (str, str, str, str, str, int)
+            @return {str: [str]} as {guid: [tag]}
         """
-        result = c.execute("SELECT parent.title\
+        tags = {}
+        result = c.execute("SELECT bookmarks.guid, parent.title\
                             FROM moz_bookmarks AS bookmarks,\
                                  moz_bookmarks AS tag,\
                                  moz_bookmarks AS parent\
                             WHERE bookmarks.fk=tag.fk\
-                            AND tag.fk=bookmarks.fk\
                             AND tag.title is null\
-                            AND parent.id=tag.parent\
-                            AND bookmarks.guid=?", (guid,))
-        return list(itertools.chain(*result))
+                            AND parent.id=tag.parent")
+        for (guid, title) in result:
+            if guid in tags:
+                tags[guid].append(title)
+            else:
+                tags[guid] = [title]
+        return tags
 
     def __get_firefox_parents(self, c):
         """
@@ -14,10 +14,12 @@ from gi.repository import GLib
 
 import sqlite3
 import itertools
+from time import time
 from urllib.parse import urlparse
 from threading import Lock
 
-from eolie.utils import noaccents, get_random_string
+from eolie.utils import noaccents, get_random_string, get_fts_filters
+from eolie.utils import get_sql_chunks
 from eolie.define import EOLIE_DATA_PATH, Type
 from eolie.localized import LocalizedCollation
 from eolie.sqlcursor import SqlCursor
@@ -52,12 +54,28 @@ class DatabaseHistory:
                                                guid TEXT NOT NULL,
                                                mtime REAL NOT NULL,
                                                opened INT NOT NULL DEFAULT 0,
-                                               popularity INT NOT NULL
+                                               popularity INT NOT NULL,
+                                               frecency REAL NOT NULL DEFAULT 0
                                                )'''
     __create_history_atime = '''CREATE TABLE history_atime (
                                                 history_id INT NOT NULL,
                                                 atime REAL NOT NULL
                                                )'''
+    # Visits older than __COMPACT_DAYS, counted by day
+    __create_history_day = '''CREATE TABLE history_day (
+                                                history_id INT NOT NULL,
+                                                day INT NOT NULL,
+                                                visits INT NOT NULL,
+                                                PRIMARY KEY (history_id, day)
+                                               )'''
+    __create_history_atime_id_idx = """CREATE UNIQUE INDEX
+                                               idx_atime_id ON history_atime(
+                                               history_id, atime)"""
+    __create_history_atime_idx = """CREATE INDEX
+                                               idx_atime ON history_atime(
+                                               atime)"""
+    __create_history_day_idx = """CREATE INDEX
+                                               idx_day ON history_day(day)"""
 
     __create_history_orderby_idx = """CREATE INDEX
                                                idx_orderby ON history(
@@ -65,13 +83,54 @@ class DatabaseHistory:
     __create_history_where_idx = """CREATE INDEX
                                                idx_where ON history(
                                                uri, title)"""
-
-    def __init__(self):
+    __create_history_frecency_idx = """CREATE INDEX
+                                               idx_frecency ON history(
+                                               frecency)"""
+    __create_history_netloc_frecency_idx = """CREATE INDEX
+                                               idx_netloc_frecency ON history(
+                                               netloc, frecency)"""
+    # Firefox like frecency: visit weight by age in days
+    # Last sampled visits are averaged and multiplied by visit count
+    __FRECENCY_BUCKETS = [(4, 100), (14, 70), (31, 50), (90, 30)]
+    __FRECENCY_DEFAULT_WEIGHT = 10
+    __FRECENCY_SAMPLES = 10
+    # Keep exact visit times for this amount of days
+    __COMPACT_DAYS = 90
+    # Trigram tokens keep LIKE '%word%' semantics for words >= 3 chars
+    FTS_TABLE = "history_fts"
+    FTS_SCHEMA = [
+        """CREATE VIRTUAL TABLE history_fts USING fts5(
+                                     title, uri, netloc,
+                                     content='history', content_rowid='id',
+                                     tokenize='trigram')""",
+        """CREATE TRIGGER history_fts_ai AFTER INSERT ON history BEGIN
+             INSERT INTO history_fts(rowid, title, uri, netloc)
+             VALUES (new.id, new.title, new.uri, new.netloc);
+           END""",
+        """CREATE TRIGGER history_fts_ad AFTER DELETE ON history BEGIN
+             INSERT INTO history_fts(history_fts, rowid, title, uri, netloc)
+             VALUES ('delete', old.id, old.title, old.uri, old.netloc);
+           END""",
+        """CREATE TRIGGER history_fts_au AFTER UPDATE OF title, uri, netloc
+           ON history BEGIN
+             INSERT INTO history_fts(history_fts, rowid, title, uri, netloc)
+             VALUES ('delete', old.id, old.title, old.uri, old.netloc);
+             INSERT INTO history_fts(rowid, title, uri, netloc)
+             VALUES (new.id, new.title, new.uri, new.netloc);
+           END"""
+    ]
+
+    def __init__(self, read_only=False):
         """
             Create database tables or manage update if needed
+            @param read_only as bool: database is owned by another process
         """
         upgrade = DatabaseUpgrade(Type.HISTORY)
         self.thread_lock = Lock()
+        self.__read_only = read_only
+        # Never create or upgrade a database owned by Eolie
+        if read_only:
+            return
         if not GLib.file_test(self.DB_PATH, GLib.FileTest.IS_REGULAR):
             try:
                 if not GLib.file_test(EOLIE_DATA_PATH, GLib.FileTest.IS_DIR):
@@ -80,8 +139,20 @@ class DatabaseHistory:
                 with SqlCursor(self, True) as sql:
                     sql.execute(self.__create_history)
                     sql.execute(self.__create_history_atime)
+                    sql.execute(self.__create_history_day)
+                    sql.execute(self.__create_history_atime_id_idx)
+                    sql.execute(self.__create_history_atime_idx)
+                    sql.execute(self.__create_history_day_idx)
                     sql.execute(self.__create_history_orderby_idx)
                     sql.execute(self.__create_history_where_idx)
+                    sql.execute(self.__create_history_frecency_idx)
+                    sql.execute(self.__create_history_netloc_frecency_idx)
+                    # Without FTS5 trigram, search falls back to LIKE
+                    try:
+                        for request in self.FTS_SCHEMA:
+                            sql.execute(request)
+                    except Exception as e:
+                        Logger.warning("DatabaseHistory::__init__(): %s", e)
                     sql.execute("PRAGMA user_version=%s" % upgrade.version)
             except Exception as e:
                 Logger.error("DatabaseHistory::__init__(): %s", e)
@@ -103,13 +174,14 @@ class DatabaseHistory:
         uri = uri.rstrip('/')
         parsed = urlparse(uri)
         with SqlCursor(self, True) as sql:
-            result = sql.execute("SELECT rowid, popularity FROM history\
+            result = sql.execute("SELECT rowid, popularity, guid\
+                                  FROM history\
                                   WHERE uri=?", (uri,))
             v = result.fetchone()
             # Update current item
             if v is not None:
                 history_id = v[0]
-                guid = self.get_guid(history_id)
+                guid = v[2]
                 sql.execute("UPDATE history\
                              SET uri=?, netloc=?, mtime=?,\
                                  title=?, guid=?, popularity=?\
@@ -132,12 +204,8 @@ class DatabaseHistory:
             # Only add new atimes to db
             if not atimes:
                 atimes = [mtime]
-            current_atimes = self.get_atimes(history_id)
-            for atime in atimes:
-                if atime not in current_atimes:
-                    sql.execute("INSERT INTO history_atime\
-                                 (history_id, atime)\
-                                 VALUES (?, ?)", (history_id, atime))
+            self.__add_atimes(sql, history_id, atimes)
+            self.__update_frecency(sql, history_id)
             return history_id
 
     def remove(self, history_id):
@@ -150,6 +218,8 @@ class DatabaseHistory:
                          WHERE rowid=?", (history_id,))
             sql.execute("DELETE from history_atime\
                          WHERE history_id=?", (history_id,))
+            sql.execute("DELETE from history_day\
+                         WHERE history_id=?", (history_id,))
 
     def clear_from(self, atime):
         """
@@ -159,6 +229,8 @@ class DatabaseHistory:
         with SqlCursor(self, True) as sql:
             sql.execute("DELETE FROM history_atime\
                          WHERE atime >= ?", (atime,))
+            sql.execute("DELETE FROM history_day\
+                         WHERE day * 86400 >= ?", (atime,))
 
     def clear_to(self, atime):
         """
@@ -168,6 +240,8 @@ class DatabaseHistory:
         with SqlCursor(self, True) as sql:
             sql.execute("DELETE FROM history_atime\
                          WHERE atime <= ?", (atime,))
+            sql.execute("DELETE FROM history_day\
+                         WHERE day * 86400 <= ?", (atime,))
 
     def get_from_atime(self, atime):
         """
@@ -176,10 +250,14 @@ class DatabaseHistory:
             @return modified history ids as [int]
         """
         with SqlCursor(self) as sql:
-            result = sql.execute("SELECT DISTINCT history.rowid\
-                                  FROM history, history_atime\
-                                  WHERE history_atime.history_id=history.rowid\
-                                  AND atime >= ?", (atime,))
+            result = sql.execute("SELECT history_id\
+                                  FROM history_atime\
+                                  WHERE atime >= ?\
+                                  UNION\
+                                  SELECT history_id\
+                                  FROM history_day\
+                                  WHERE day >= CAST(? / 86400 AS INTEGER)",
+                                 (atime, atime))
             return list(itertools.chain(*result))
 
     def get_empties(self):
@@ -191,7 +269,10 @@ class DatabaseHistory:
             result = sql.execute("SELECT history.rowid FROM history\
                                   WHERE NOT EXISTS (\
                                     SELECT rowid FROM history_atime AS ha\
-                                    WHERE ha.history_id=history.rowid)")
+                                    WHERE ha.history_id=history.rowid)\
+                                  AND NOT EXISTS (\
+                                    SELECT rowid FROM history_day AS hd\
+                                    WHERE hd.history_id=history.rowid)")
             return list(itertools.chain(*result))
 
     def get(self, atime):
@@ -203,9 +284,17 @@ class DatabaseHistory:
         one_day = 86400
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT history.rowid, title, uri, atime\
-                                  FROM history, history_atime\
-                                  WHERE history.rowid=history_atime.history_id\
-                                  AND atime >= ? AND atime <= ?\
+                                  FROM history_atime, history\
+                                  WHERE atime >= ?1 AND atime <= ?2\
+                                  AND history.rowid=history_atime.history_id\
+                                  UNION ALL\
+                                  SELECT history.rowid, title, uri,\
+                                         day * 86400 AS atime\
+                                  FROM history_day, history\
+                                  WHERE day >= CAST((?1 + 86399) / 86400\
+                                                    AS INTEGER)\
+                                  AND day <= CAST(?2 / 86400 AS INTEGER)\
+                                  AND history.rowid=history_day.history_id\
                                   ORDER BY atime DESC",
                                  (atime, atime + one_day))
             return list(result)
@@ -289,16 +378,69 @@ class DatabaseHistory:
 
     def get_atimes(self, history_id):
         """
-            Get history access times
+            Get history access times, compacted visits are at day start
             @param history_id as int
             @return [int]
         """
         with SqlCursor(self) as sql:
             result = sql.execute("SELECT atime\
                                   FROM history_atime\
-                                  WHERE history_id=?", (history_id,))
+                                  WHERE history_id=?1\
+                                  UNION ALL\
+                                  SELECT day * 86400\
+                                  FROM history_day\
+                                  WHERE history_id=?1", (history_id,))
             return list(itertools.chain(*result))
 
+    def get_record(self, history_id):
+        """
+            Get history record
+            @param history_id as int
+            @return (int, str, str, str, [int])/None as get_records()
+        """
+        records = self.get_records([history_id])
+        if records:
+            return records[0]
+        return None
+
+    def get_records(self, history_ids):
+        """
+            Get history records, one request for rows and one for atimes
+            @param history_ids as [int]
+            @return [(int, str, str, str, [int])]
+                    as [(id, guid, uri, title, atimes)]
+        """
+        rows = {}
+        atimes = {}
+        with SqlCursor(self) as sql:
+            for (placeholders, ids) in get_sql_chunks(history_ids):
+                result = sql.execute("SELECT rowid, guid, uri, title\
+                                      FROM history\
+                                      WHERE rowid IN (%s)" % placeholders,
+                                     ids)
+                for row in result:
+                    rows[row[0]] = row
+                result = sql.execute("SELECT history_id, atime\
+                                      FROM history_atime\
+                                      WHERE history_id IN (%s)\
+                                      UNION ALL\
+                                      SELECT history_id, day * 86400\
+                                      FROM history_day\
+                                      WHERE history_id IN (%s)" %
+                                     (placeholders, placeholders),
+                                     ids + ids)
+                for (history_id, atime) in result:
+                    if history_id in atimes:
+                        atimes[history_id].append(atime)
+                    else:
+                        atimes[history_id] = [atime]
+        records = []
+        for history_id in history_ids:
+            row = rows.get(history_id)
+            if row is not None:
+                records.append(row + (atimes.get(row[0], []),))
+        return records
+
     def get_id_by_guid(self, guid):
         """
             Get id for guid
@@ -368,7 +510,7 @@ class DatabaseHistory:
         """
         with SqlCursor(self) as sql:
             request = "SELECT rowid, title, uri FROM history\
-                       ORDER BY popularity DESC LIMIT ?"
+                       ORDER BY frecency DESC, popularity DESC LIMIT ?"
             result = sql.execute(request, (limit,))
             return list(result)
         return []
@@ -391,7 +533,7 @@ class DatabaseHistory:
                                 FROM history\
                                 WHERE netloc=?\
                                 AND popularity!=0\
-                                ORDER BY popularity DESC,\
+                                ORDER BY frecency DESC,\
                                 mtime DESC\
                                 LIMIT ?", (netloc, limit))
             else:
@@ -403,7 +545,7 @@ class DatabaseHistory:
                                        COUNT(uri)\
                                 FROM history\
                                 GROUP BY netloc\
-                                ORDER BY MAX(popularity) DESC,\
+                                ORDER BY MAX(frecency) DESC,\
                                 mtime DESC\
                                 LIMIT ?", (limit,))
             return list(result)
@@ -452,11 +594,8 @@ class DatabaseHistory:
             @param commit as bool
         """
         with SqlCursor(self, True) as sql:
-            current_atimes = self.get_atimes(history_id)
-            for atime in atimes:
-                if atime not in current_atimes:
-                    sql.execute("INSERT INTO history_atime (history_id, atime)\
-                                 VALUES (?, ?)", (history_id, atime))
+            self.__add_atimes(sql, history_id, atimes)
+            self.__update_frecency(sql, history_id)
 
     def set_mtime(self, history_id, mtime):
         """
@@ -476,28 +615,31 @@ class DatabaseHistory:
             @return [(id, title, uri)] as [(int, str, str)]
         """
         words = search.lower().split()
+        (match, likes) = get_fts_filters(words)
+        if match is None:
+            return self.__search_like(words, limit)
         items = []
         with SqlCursor(self) as sql:
-            filters = ()
-            for word in words:
+            filters = (match,)
+            request = "SELECT history.rowid, history.title, history.uri\
+                       FROM history_fts, history\
+                       WHERE history_fts MATCH ?\
+                       AND history.rowid=history_fts.rowid"
+            for word in likes:
                 filters += ("%" + word + "%", "%" + word + "%")
+                request += " AND (history.title LIKE ?\
+                             OR history.uri LIKE ?)"
             filters += (limit,)
-            request = "SELECT rowid, title, uri FROM history"
-            if words:
-                request += " WHERE"
-                words_copy = list(words)
-                while words_copy:
-                    word = words_copy.pop(0)
-                    request += " (title LIKE ? OR uri LIKE ?)"
-                    if words_copy:
-                        request += " AND "
-            request += " ORDER BY length(uri) ASC LIMIT ?"
+            # BM25 is negative, lower is better
+            request += " ORDER BY bm25(history_fts, 1.0, 1.0, 2.0) *\
+                         (1.0 + frecency / (frecency + 1000.0)),\
+                         length(history.uri) ASC LIMIT ?"
             try:
                 result = sql.execute(request, filters)
                 items = list(result)
-            except:
-                Logger.error("DatabaseHistory::search(): %s -> %s",
-                             (request, filters))
+            except Exception as e:
+                Logger.error("DatabaseHistory::search(): %s", e)
+                return self.__search_like(words, limit)
         return items
 
     def reset_popularity(self, uri):
@@ -508,11 +650,125 @@ class DatabaseHistory:
         with SqlCursor(self, True) as sql:
             parsed = urlparse(uri)
             if parsed.scheme:
-                sql.execute("UPDATE history SET popularity=0 WHERE uri=?",
-                            (uri,))
+                sql.execute("UPDATE history SET popularity=0, frecency=0\
+                             WHERE uri=?", (uri,))
             else:
-                sql.execute("UPDATE history SET popularity=0 WHERE netloc=?",
-                            (uri,))
+                sql.execute("UPDATE history SET popularity=0, frecency=0\
+                             WHERE netloc=?", (uri,))
+
+    def get_frecencies(self, uris):
+        """
+            Get frecency for uris
+            @param uris as [str]
+            @return {str: float}
+        """
+        # History uris are stored without trailing slash
+        keys = {}
+        for uri in uris:
+            keys.setdefault(uri.rstrip('/'), []).append(uri)
+        if not keys:
+            return {}
+        frecencies = {}
+        with SqlCursor(self) as sql:
+            for (placeholders, chunk) in get_sql_chunks(list(keys.keys())):
+                result = sql.execute("SELECT uri, frecency FROM history\
+                                      WHERE uri IN (%s)" % placeholders,
+                                     chunk)
+                for (uri, frecency) in result:
+                    for key in keys[uri]:
+                        frecencies[key] = frecency
+        return frecencies
+
+    def compact_atimes(self):
+        """
+            Replace old visit times by per day visit counts
+            @thread safe
+        """
+        day = int(time() / 86400) - self.__COMPACT_DAYS
+        with SqlCursor(self, True) as sql:
+            sql.execute("INSERT INTO history_day (history_id, day, visits)\
+                         SELECT history_id, CAST(atime / 86400 AS INTEGER),\
+                                COUNT(*)\
+                         FROM history_atime\
+                         WHERE atime < ?\
+                         GROUP BY 1, 2\
+                         ON CONFLICT (history_id, day)\
+                         DO UPDATE SET visits=visits + excluded.visits",
+                        (day * 86400,))
+            sql.execute("DELETE FROM history_atime WHERE atime < ?",
+                        (day * 86400,))
+
+    def update_frecencies(self, from_id=0, limit=-1):
+        """
+            Recompute frecencies, visits get older so scores decay
+            @param from_id as int: update entries after this id
+            @param limit as int: entries to update, -1 for all
+            @return last updated id as int/None if nothing to update
+            @thread safe
+        """
+        with SqlCursor(self, True) as sql:
+            result = sql.execute("SELECT MAX(rowid) FROM (\
+                                    SELECT rowid FROM history\
+                                    WHERE rowid > ?\
+                                    ORDER BY rowid LIMIT ?)",
+                                 (from_id, limit))
+            last_id = result.fetchone()[0]
+            if last_id is not None:
+                sql.execute("UPDATE history SET frecency=%s\
+                             WHERE rowid > ?2 AND rowid <= ?3" %
+                            self.__get_frecency_request(),
+                            (time(), from_id, last_id))
+            return last_id
+
+    def expire(self, atime, max_rows, limit):
+        """
+            Remove up to limit visits older than atime, then up to limit
+            entries without visits or over max_rows, least frecent first
+            @param atime as int/None
+            @param max_rows as int/None: no budget if None
+            @param limit as int
+            @return removed rows count as int
+            @thread safe
+        """
+        removed = 0
+        with SqlCursor(self, True) as sql:
+            if atime is not None:
+                result = sql.execute("DELETE FROM history_atime\
+                                      WHERE rowid IN (\
+                                        SELECT rowid FROM history_atime\
+                                        WHERE atime <= ? LIMIT ?)",
+                                     (atime, limit))
+                removed += result.rowcount
+                result = sql.execute("DELETE FROM history_day\
+                                      WHERE rowid IN (\
+                                        SELECT rowid FROM history_day\
+                                        WHERE day * 86400 <= ? LIMIT ?)",
+                                     (atime, limit))
+                removed += result.rowcount
+            result = sql.execute("SELECT history.rowid FROM history\
+                                  WHERE NOT EXISTS (\
+                                    SELECT rowid FROM history_atime AS ha\
+                                    WHERE ha.history_id=history.rowid)\
+                                  AND NOT EXISTS (\
+                                    SELECT rowid FROM history_day AS hd\
+                                    WHERE hd.history_id=history.rowid)\
+                                  LIMIT ?", (limit,))
+            history_ids = list(itertools.chain(*result))
+            self.__remove_entries(sql, history_ids)
+            removed += len(history_ids)
+            # Only over budget once all empty entries are gone
+            result = sql.execute("SELECT COUNT(*) FROM history")
+            count = result.fetchone()[0]
+            if max_rows is not None and count > max_rows and\
+                    len(history_ids) < limit:
+                result = sql.execute("SELECT rowid FROM history\
+                                      ORDER BY frecency ASC, mtime ASC\
+                                      LIMIT ?",
+                                     (min(count - max_rows, limit),))
+                history_ids = list(itertools.chain(*result))
+                self.__remove_entries(sql, history_ids)
+                removed += len(history_ids)
+        return removed
 
     def exists_guid(self, guid):
         """
@@ -530,14 +786,115 @@ class DatabaseHistory:
             Return a new sqlite cursor
         """
         try:
-            c = sqlite3.connect(self.DB_PATH, 600.0)
+            if self.__read_only:
+                c = sqlite3.connect("file:%s?mode=ro" % self.DB_PATH, 600.0,
+                                    check_same_thread=False, uri=True)
+            else:
+                c = sqlite3.connect(self.DB_PATH, 600.0,
+                                    check_same_thread=False)
             c.create_collation('LOCALIZED', LocalizedCollation())
             c.create_function("noaccents", 1, noaccents)
             return c
         except Exception as e:
             Logger.error("DatabaseHistory::get_cursor(): %s", e)
+            # Let caller handle a missing database
+            if self.__read_only:
+                raise
             exit(-1)
 
 #######################
 # PRIVATE             #
 #######################
+    def __remove_entries(self, sql, history_ids):
+        """
+            Remove history entries and their visits
+            @param sql as sqlite3.Connection
+            @param history_ids as [int]
+        """
+        for (placeholders, ids) in get_sql_chunks(history_ids):
+            for table in ["history_atime", "history_day"]:
+                sql.execute("DELETE FROM %s WHERE history_id IN (%s)" %
+                            (table, placeholders), ids)
+            sql.execute("DELETE FROM history WHERE rowid IN (%s)" %
+                        placeholders, ids)
+
+    def __get_frecency_request(self):
+        """
+            Get SQL expression computing frecency of current history row
+            @return str, needs current time as parameter
+        """
+        weights = ""
+        for (days, weight) in self.__FRECENCY_BUCKETS:
+            weights += " WHEN ?1 - atime < %s THEN %s" % (
+                days * 86400, weight)
+        # Compacted visits are old enough to get default weight
+        return "CASE WHEN history.popularity=0 THEN 0 ELSE\
+                 ((SELECT COUNT(*) FROM history_atime\
+                   WHERE history_id=history.rowid) +\
+                  (SELECT COALESCE(SUM(visits), 0) FROM history_day\
+                   WHERE history_id=history.rowid)) *\
+                 COALESCE((SELECT AVG(CASE %s ELSE %s END)\
+                           FROM (SELECT atime FROM history_atime\
+                                 WHERE history_id=history.rowid\
+                                 ORDER BY atime DESC LIMIT %s)), %s)\
+                END" % (weights,
+                        self.__FRECENCY_DEFAULT_WEIGHT,
+                        self.__FRECENCY_SAMPLES,
+                        self.__FRECENCY_DEFAULT_WEIGHT)
+
+    def __add_atimes(self, sql, history_id, atimes):
+        """
+            Add missing atimes for history id
+            @param sql as sqlite3.Connection
+            @param history_id as int
+            @param atimes as [int]
+        """
+        # Ignore known atimes and atimes of already compacted days
+        sql.executemany("INSERT OR IGNORE INTO history_atime\
+                         (history_id, atime)\
+                         SELECT ?1, ?2 WHERE NOT EXISTS (\
+                            SELECT rowid FROM history_day\
+                            WHERE history_id=?1\
+                            AND day=CAST(?2 / 86400 AS INTEGER))",
+                        [(history_id, atime) for atime in atimes])
+
+    def __update_frecency(self, sql, history_id):
+        """
+            Update frecency for history id
+            @param sql as sqlite3.Connection
+            @param history_id as int
+        """
+        sql.execute("UPDATE history SET frecency=%s WHERE rowid=?2" %
+                    self.__get_frecency_request(),
+                    (time(), history_id))
+
+    def __search_like(self, words, limit):
+        """
+            Search words in db with a full scan
+            @param words as [str]
+            @param limit as int
+            @return [(id, title, uri)] as [(int, str, str)]
+        """
+        items = []
+        with SqlCursor(self) as sql:
+            filters = ()
+            for word in words:
+                filters += ("%" + word + "%", "%" + word + "%")
+            filters += (limit,)
+            request = "SELECT rowid, title, uri FROM history"
+            if words:
+                request += " WHERE"
+                words_copy = list(words)
+                while words_copy:
+                    word = words_copy.pop(0)
+                    request += " (title LIKE ? OR uri LIKE ?)"
+                    if words_copy:
+                        request += " AND "
+            request += " ORDER BY length(uri) ASC LIMIT ?"
+            try:
+                result = sql.execute(request, filters)
+                items = list(result)
+            except:
+                Logger.error("DatabaseHistory::search(): %s -> %s",
+                             (request, filters))
+        return items
@@ -13,7 +13,6 @@
 from gi.repository import GLib
 
 import sqlite3
-import itertools
 from urllib.parse import urlparse
 from threading import Lock
 
@@ -31,6 +30,8 @@ class DatabaseSettings:
 
     # Allows to return someting if not result
     __DEFAULTS = {"audio": 1}
+    # Log cache statistics every __STATS_INTERVAL lookups
+    __STATS_INTERVAL = 500
     # SQLite documentation:
     # In SQLite, a column with type INTEGER PRIMARY KEY
     # is an alias for the ROWID.
@@ -57,6 +58,10 @@ class DatabaseSettings:
         """
         self.thread_lock = Lock()
         self.__DB_PATH = "%s/settings.db" % EOLIE_DATA_PATH
+        # {netloc: {option: value}}
+        self.__cache = {}
+        self.__hits = 0
+        self.__misses = 0
         upgrade = DatabaseUpgrade(Type.SETTINGS)
         if not GLib.file_test(self.__DB_PATH, GLib.FileTest.IS_REGULAR):
             try:
@@ -70,6 +75,7 @@ class DatabaseSettings:
                 Logger.error("DatabaseSettings::__init__(): %s", e)
         else:
             upgrade.upgrade(self)
+        self.__load_cache()
 
     def set(self, option, uri, status):
         """
@@ -84,10 +90,7 @@ class DatabaseSettings:
         try:
             netloc = get_safe_netloc(uri)
             with SqlCursor(self, True) as sql:
-                result = sql.execute("SELECT rowid FROM settings\
-                                      WHERE netloc=?", (netloc,))
-                v = result.fetchone()
-                if v is not None:
+                if netloc in self.__cache.keys():
                     sql.execute("UPDATE settings\
                                  SET %s=?\
                                  WHERE netloc=?" % option,
@@ -97,6 +100,7 @@ class DatabaseSettings:
                                           (netloc, %s)\
                                           VALUES (?, ?)" % option,
                                 (netloc, status))
+                self.__update_cache(sql, netloc)
         except Exception as e:
             Logger.error("DatabaseSettings::set(): %s", e)
 
@@ -107,16 +111,24 @@ class DatabaseSettings:
             @param uri as str
             @return object
         """
-        with SqlCursor(self) as sql:
-            result = sql.execute("SELECT %s FROM settings\
-                                  WHERE netloc=?" % option,
-                                 (get_safe_netloc(uri),))
-            v = result.fetchone()
-            if v is not None:
-                return v[0]
-            if option in self.__DEFAULTS.keys():
-                return self.__DEFAULTS[option]
-            return None
+        return self.get_all(uri).get(option)
+
+    def get_all(self, uri):
+        """
+            Get all options for URI
+            @param uri as str
+            @return {str: object}
+        """
+        options = self.__cache.get(get_safe_netloc(uri))
+        if options is None:
+            self.__misses += 1
+            options = self.__DEFAULTS
+        else:
+            self.__hits += 1
+        if (self.__hits + self.__misses) % self.__STATS_INTERVAL == 0:
+            Logger.debug("DatabaseSettings cache: %s hits, %s misses",
+                         self.__hits, self.__misses)
+        return dict(options)
 
     def get_languages(self, uri):
         """
@@ -125,27 +137,23 @@ class DatabaseSettings:
             @return codes as [str]
             @raise if not found
         """
-        with SqlCursor(self) as sql:
-            result = sql.execute("SELECT languages FROM settings\
-                                  WHERE netloc=?", (get_safe_netloc(uri),))
-            v = result.fetchone()
-            if v is not None:
-                languages = v[0]
-                if languages:
-                    return languages.split(";")
-                else:
-                    return []
+        options = self.__cache.get(get_safe_netloc(uri))
+        if options is not None:
+            languages = options["languages"]
+            if languages:
+                return languages.split(";")
             else:
-                return None
+                return []
+        else:
+            return None
 
     def get_pinned_netlocs(self):
         """
             Get pinned netlocs
             return [str]
         """
-        with SqlCursor(self) as sql:
-            result = sql.execute("SELECT netloc FROM settings WHERE pinned=1")
-            return list(itertools.chain(*result))
+        return [netloc for (netloc, options) in self.__cache.items()
+                if options["pinned"] == 1]
 
     def add_language(self, code, uri):
         """
@@ -157,6 +165,7 @@ class DatabaseSettings:
         if parsed.scheme not in ["http", "https"]:
             return
         try:
+            netloc = get_safe_netloc(uri)
             with SqlCursor(self, True) as sql:
                 codes = self.get_languages(uri)
                 if codes is not None:
@@ -164,13 +173,13 @@ class DatabaseSettings:
                         codes.append(code)
                     sql.execute("UPDATE settings\
                                  SET languages=?\
-                                 WHERE netloc=?", (";".join(codes),
-                                                   get_safe_netloc(uri)))
+                                 WHERE netloc=?", (";".join(codes), netloc))
                 else:
                     sql.execute("INSERT INTO settings\
-                                          (uri, languages)\
+                                          (netloc, languages)\
                                           VALUES (?, ?)",
-                                (get_safe_netloc(uri), code))
+                                (netloc, code))
+                self.__update_cache(sql, netloc)
         except Exception as e:
             Logger.error("DatabaseSettings::add_language(): %s", e)
 
@@ -183,19 +192,53 @@ class DatabaseSettings:
         codes = self.get_languages(uri)
         if codes is not None and code in codes:
             codes.remove(code)
+            netloc = get_safe_netloc(uri)
             with SqlCursor(self, True) as sql:
                 sql.execute("UPDATE settings\
                                  SET languages=?\
-                                 WHERE netloc=?", (";".join(codes),
-                                                   get_safe_netloc(uri)))
+                                 WHERE netloc=?", (";".join(codes), netloc))
+                self.__update_cache(sql, netloc)
 
     def get_cursor(self):
         """
             Return a new sqlite cursor
         """
         try:
-            c = sqlite3.connect(self.__DB_PATH, 600.0)
+            c = sqlite3.connect(self.__DB_PATH, 600.0,
+                                check_same_thread=False)
             return c
         except Exception as e:
             Logger.error("DatabaseSettings::get_cursor(): %s", e)
             exit(-1)
+
+#######################
+# PRIVATE             #
+#######################
+    def __load_cache(self):
+        """
+            Load all settings in memory
+        """
+        try:
+            with SqlCursor(self) as sql:
+                result = sql.execute("SELECT * FROM settings")
+                names = [column[0] for column in result.description]
+                for row in result:
+                    options = dict(zip(names, row))
+                    self.__cache[options["netloc"]] = options
+        except Exception as e:
+            Logger.error("DatabaseSettings::__load_cache(): %s", e)
+
+    def __update_cache(self, sql, netloc):
+        """
+            Reload netloc settings in cache
+            @param sql as sqlite3.Connection
+            @param netloc as str
+        """
+        result = sql.execute("SELECT * FROM settings WHERE netloc=?",
+                             (netloc,))
+        names = [column[0] for column in result.description]
+        row = result.fetchone()
+        if row is None:
+            self.__cache.pop(netloc, None)
+        else:
+            self.__cache[netloc] = dict(zip(names, row))
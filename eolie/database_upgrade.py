@@ -30,6 +30,8 @@ class DatabaseUpgrade:
             self.__UPGRADES = {
                 1: self.__upgrade_bookmarks_1,
                 2: "ALTER TABLE bookmarks ADD startup INT NOT NULL DEFAULT 0",
+                3: self.__upgrade_fts,
+                4: self.__upgrade_auto_vacuum,
             }
         elif t == Type.HISTORY:
             self.__UPGRADES = {
@@ -39,7 +41,11 @@ class DatabaseUpgrade:
                 4: "DELETE FROM history_atime WHERE NOT EXISTS (SELECT * FROM\
                     history WHERE history.rowid=history_atime.history_id)",
                 5: "CREATE INDEX idx_orderby ON history(mtime, popularity)",
-                6: "CREATE INDEX idx_where ON history(uri, title)"
+                6: "CREATE INDEX idx_where ON history(uri, title)",
+                7: self.__upgrade_fts,
+                8: self.__upgrade_history_frecency,
+                9: self.__upgrade_history_atime,
+                10: self.__upgrade_auto_vacuum
             }
         elif t == Type.SETTINGS:
             self.__UPGRADES = {
@@ -52,7 +58,7 @@ class DatabaseUpgrade:
             @param db as Database
         """
         version = 0
-        with SqlCursor(db) as sql:
+        with SqlCursor(db, True) as sql:
             result = sql.execute("PRAGMA user_version")
             v = result.fetchone()
             if v is not None:
@@ -101,3 +107,57 @@ class DatabaseUpgrade:
                            SELECT id, title, uri, popularity, atime, guid,
                             mtime, position FROM _bookmarks""")
             sql.execute("DROP TABLE _bookmarks")
+
+    def __upgrade_fts(self, db):
+        """
+            Add full text search index
+            @param db as BookmarksDatabase/HistoryDatabase
+        """
+        with SqlCursor(db, True) as sql:
+            for request in db.FTS_SCHEMA:
+                sql.execute(request)
+            sql.execute("INSERT INTO %s(%s) VALUES ('rebuild')" %
+                        (db.FTS_TABLE, db.FTS_TABLE))
+
+    def __upgrade_auto_vacuum(self, db):
+        """
+            Switch to incremental vacuum
+            Needs a full VACUUM, too slow on startup: MaintenanceScheduler
+            runs it once when application is idle
+            @param db as BookmarksDatabase/HistoryDatabase
+        """
+        with SqlCursor(db) as sql:
+            sql.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+    def __upgrade_history_frecency(self, db):
+        """
+            Add frecency column
+            @param db as HistoryDatabase
+        """
+        with SqlCursor(db, True) as sql:
+            sql.execute("ALTER TABLE history\
+                         ADD frecency REAL NOT NULL DEFAULT 0")
+            sql.execute("CREATE INDEX idx_frecency ON history(frecency)")
+            sql.execute("CREATE INDEX idx_netloc_frecency\
+                         ON history(netloc, frecency)")
+
+    def __upgrade_history_atime(self, db):
+        """
+            Deduplicate and index visits, compact old ones
+            @param db as HistoryDatabase
+        """
+        with SqlCursor(db, True) as sql:
+            sql.execute("DELETE FROM history_atime WHERE rowid NOT IN (\
+                            SELECT MIN(rowid) FROM history_atime\
+                            GROUP BY history_id, atime)")
+            sql.execute("CREATE TABLE history_day (\
+                            history_id INT NOT NULL,\
+                            day INT NOT NULL,\
+                            visits INT NOT NULL,\
+                            PRIMARY KEY (history_id, day))")
+            sql.execute("CREATE UNIQUE INDEX idx_atime_id\
+                         ON history_atime(history_id, atime)")
+            sql.execute("CREATE INDEX idx_atime ON history_atime(atime)")
+            sql.execute("CREATE INDEX idx_day ON history_day(day)")
+        db.compact_atimes()
+        db.update_frecencies()
@@ -0,0 +1,180 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from threading import Thread, Condition, current_thread
+from time import monotonic
+
+from eolie.sqlcursor import SqlCursor
+from eolie.logger import Logger
+
+
+class DatabaseWriter:
+    """
+        Write behind queue for database mutations
+        All queued commands run in a single thread and are committed
+        together, every FLUSH_INTERVAL seconds or FLUSH_COUNT commands
+    """
+    FLUSH_INTERVAL = 0.25
+    FLUSH_COUNT = 100
+
+    def __init__(self):
+        """
+            Init writer and start writer thread
+        """
+        self.__pending = []
+        self.__batch = []
+        self.__dbs = []
+        self.__urgent = False
+        self.__stopped = False
+        self.__condition = Condition()
+        self.__thread = Thread(target=self.__run, name="DatabaseWriter")
+        self.__thread.daemon = True
+        self.__thread.start()
+        SqlCursor.set_writer(self)
+
+    def queue(self, command, *args, key=None, callback=None):
+        """
+            Queue a database command
+            @param command as database bound method
+            @param *args as command arguments
+            @param key as object: a new command with same key replaces
+                                  pending one
+            @param callback as function: called in main loop with result
+        """
+        with self.__condition:
+            stopped = self.__stopped
+            if not stopped:
+                if key is not None:
+                    self.__pending = [item for item in self.__pending
+                                      if item[0] != key]
+                self.__pending.append((key, command, args, callback))
+                self.__condition.notify_all()
+        if stopped:
+            # Writer thread is gone, do not lose the mutation
+            Logger.warning("DatabaseWriter::queue(): stopped, running %s",
+                           command)
+            self.__run_command(command, args, callback)
+
+    def wait(self, db):
+        """
+            Wait for pending commands on db to be committed
+            @param db as Database
+        """
+        if current_thread() == self.__thread:
+            return
+        with self.__condition:
+            while self.__is_pending(db):
+                self.__urgent = True
+                self.__condition.notify_all()
+                self.__condition.wait()
+
+    def stop(self):
+        """
+            Flush pending commands and stop writer thread
+        """
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+        self.__thread.join()
+        SqlCursor.set_writer(None)
+
+#######################
+# PRIVATE             #
+#######################
+    def __is_pending(self, db):
+        """
+            True if a command is pending for db
+            @param db as Database
+            @return bool
+        """
+        for (key, command, args, callback) in self.__pending + self.__batch:
+            if command.__self__ is db:
+                return True
+        return False
+
+    def __run(self):
+        """
+            Wait for commands and flush them
+            @thread safe
+        """
+        while True:
+            with self.__condition:
+                while not self.__pending and not self.__stopped:
+                    self.__condition.wait()
+                if not self.__pending:
+                    break
+                # Let more commands join the transaction
+                deadline = monotonic() + self.FLUSH_INTERVAL
+                while not self.__stopped and not self.__urgent and\
+                        len(self.__pending) < self.FLUSH_COUNT:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+                self.__batch = self.__pending
+                self.__pending = []
+                self.__urgent = False
+            self.__flush(self.__batch)
+            with self.__condition:
+                self.__batch = []
+                self.__condition.notify_all()
+        for db in self.__dbs:
+            SqlCursor.remove(db)
+
+    def __run_command(self, command, args, callback):
+        """
+            Run command in its own transaction
+            @param command as database bound method
+            @param args as tuple
+            @param callback as function/None
+        """
+        try:
+            # Nested cursors share this connection, committed on exit
+            with SqlCursor(command.__self__, True):
+                result = command(*args)
+            if callback is not None:
+                GLib.idle_add(callback, result)
+        except Exception as e:
+            Logger.error("DatabaseWriter::__run_command(): %s, %s",
+                         e, command)
+
+    def __flush(self, batch):
+        """
+            Run commands in one transaction per database
+            @param batch as [(object, function, tuple, function)]
+            @thread safe
+        """
+        dbs = []
+        results = []
+        for (key, command, args, callback) in batch:
+            db = command.__self__
+            if db not in self.__dbs:
+                SqlCursor.add(db)
+                self.__dbs.append(db)
+            if db not in dbs:
+                dbs.append(db)
+            try:
+                result = command(*args)
+                if callback is not None:
+                    results.append((callback, result))
+            except Exception as e:
+                Logger.error("DatabaseWriter::__flush(): %s, %s", e, command)
+        for db in dbs:
+            try:
+                SqlCursor.commit(db)
+            except Exception as e:
+                Logger.error("DatabaseWriter::__flush(): %s", e)
+        Logger.debug("DatabaseWriter::__flush(): %s commands", len(batch))
+        for (callback, result) in results:
+            GLib.idle_add(callback, result)
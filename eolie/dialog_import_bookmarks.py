@@ -39,13 +39,7 @@ class ImportBookmarksDialog:
         items = []
         for (name, path) in self.__firefox_items:
             items.append("Firefox: %s" % name)
-        items += ["Chromium", "Chrome"]
-        try:
-            from bs4 import BeautifulSoup
-            BeautifulSoup
-            items.append(_("Others"))
-        except Exception as e:
-            Logger.error("ImportBookmarksDialog::__init__(): %s", e)
+        items += ["Chromium", "Chrome", _("Others")]
         for item in items:
             label = Gtk.Label.new(item)
             label.show()
@@ -76,12 +70,18 @@ class ImportBookmarksDialog:
             profile = label.replace("Firefox: ", "")
             for item in self.__firefox_items:
                 if item[0] == profile:
-                    App().bookmarks.import_firefox(item[1])
+                    App().task_helper.run(App().bookmarks.import_firefox,
+                                          item[1], self.__on_progress,
+                                          callback=(self.__on_imported,))
                     break
         elif label == "Chrome":
-            App().bookmarks.import_chromium(True)
+            App().task_helper.run(App().bookmarks.import_chromium, True,
+                                  self.__on_progress,
+                                  callback=(self.__on_imported,))
         elif label == "Chromium":
-            App().bookmarks.import_chromium(False)
+            App().task_helper.run(App().bookmarks.import_chromium, False,
+                                  self.__on_progress,
+                                  callback=(self.__on_imported,))
         else:
             dialog = Gtk.FileChooserNative.new(
                 _("Import HTML bookmarks"), self.__window,
@@ -130,4 +130,30 @@ class ImportBookmarksDialog:
         """
         if response_id == Gtk.ResponseType.ACCEPT:
             path = dialog.get_filename()
-            App().bookmarks.import_html(path)
+            App().task_helper.run(App().bookmarks.import_html, path,
+                                  self.__on_progress,
+                                  callback=(self.__on_imported,))
+
+    def __on_progress(self, count):
+        """
+            Show import activity, called from import thread
+            @param count as int: bookmarks imported
+        """
+        GLib.idle_add(self.__pulse)
+
+    def __pulse(self):
+        """
+            Pulse progress bar
+        """
+        progress = self.__window.toolbar.title.entry.progress
+        progress.show()
+        progress.pulse()
+
+    def __on_imported(self, count):
+        """
+            Tell user import is done
+            @param count as int
+        """
+        self.__window.toolbar.title.entry.progress.hide()
+        self.__window.toolbar.title.show_message(
+            _("%s bookmarks imported") % count)
@@ -395,22 +395,30 @@ class SyncWorker(GObject.Object):
             @param sync as bool
         """
         try:
-            record = {}
-            atimes = App().history.get_atimes(history_id)
-            guid = App().history.get_guid(history_id)
-            record["histUri"] = App().history.get_uri(history_id)
-            record["id"] = guid
-            record["title"] = App().history.get_title(history_id)
-            record["visits"] = []
-            for atime in atimes:
-                record["visits"].append({"date": atime * 1000000,
-                                         "type": 1})
-            self.__pending_records["history"].append(record)
+            record = App().history.get_record(history_id)
+            if record is not None:
+                self.__add_history_record(record)
             if sync:
                 self.__sync_pendings()
         except Exception as e:
             Logger.error("SyncWorker::__push_history(): %s", e)
 
+    def __add_history_record(self, history_record):
+        """
+            Add history item to pending records
+            @param history_record as DatabaseHistory.get_records() item
+        """
+        (history_id, guid, uri, title, atimes) = history_record
+        record = {}
+        record["histUri"] = uri
+        record["id"] = guid
+        record["title"] = title
+        record["visits"] = []
+        for atime in atimes:
+            record["visits"].append({"date": atime * 1000000,
+                                     "type": 1})
+        self.__pending_records["history"].append(record)
+
     def __push_bookmark(self, bookmark_id, sync=True):
         """
             Push bookmark
@@ -418,41 +426,53 @@ class SyncWorker(GObject.Object):
             @param sync as bool
         """
         try:
-            parent_guid = App().bookmarks.get_parent_guid(bookmark_id)
-            # No parent, move it to unfiled
-            if parent_guid is None:
-                parent_guid = "unfiled"
-            parent_id = App().bookmarks.get_id_by_guid(parent_guid)
-            record = {}
-            record["bmkUri"] = App().bookmarks.get_uri(bookmark_id)
-            record["id"] = App().bookmarks.get_guid(bookmark_id)
-            record["title"] = App().bookmarks.get_title(bookmark_id)
-            record["tags"] = App().bookmarks.get_tags(bookmark_id)
-            record["parentid"] = parent_guid
-            record["parentName"] = App().bookmarks.get_parent_name(bookmark_id)
-            record["type"] = "bookmark"
-            self.__pending_records["bookmarks"].append(record)
-            parent_guid = App().bookmarks.get_guid(parent_id)
-            parent_name = App().bookmarks.get_title(parent_id)
-            children = App().bookmarks.get_children(parent_guid)
-            record = {}
-            record["id"] = parent_guid
-            record["type"] = "folder"
-            # A parent with parent as unfiled needs to be moved to places
-            # Firefox internal
-            grand_parent_guid = App().bookmarks.get_parent_guid(parent_id)
-            if grand_parent_guid == "unfiled":
-                grand_parent_guid = "places"
-            record["parentid"] = grand_parent_guid
-            record["parentName"] = App().bookmarks.get_parent_name(parent_id)
-            record["title"] = parent_name
-            record["children"] = children
-            self.__pending_records["bookmarks"].append(record)
+            record = App().bookmarks.get_record(bookmark_id)
+            if record is not None:
+                self.__add_bookmark_record(record, set())
             if sync:
                 self.__sync_pendings()
         except Exception as e:
             Logger.error("SyncWorker::__push_bookmark(): %s", e)
 
+    def __add_bookmark_record(self, bookmark_record, folders):
+        """
+            Add bookmark and its parent folder to pending records
+            @param bookmark_record as DatabaseBookmarks.get_records() item
+            @param folders as set: folder guids already pending
+        """
+        (bookmark_id, guid, uri, title, position,
+         parent_guid, parent_name, tags) = bookmark_record
+        record = {}
+        record["bmkUri"] = uri
+        record["id"] = guid
+        record["title"] = title
+        record["tags"] = tags
+        record["parentid"] = parent_guid
+        record["parentName"] = parent_name
+        record["type"] = "bookmark"
+        self.__pending_records["bookmarks"].append(record)
+        if parent_guid in folders:
+            return
+        folders.add(parent_guid)
+        parent_id = App().bookmarks.get_id_by_guid(parent_guid)
+        parent_record = App().bookmarks.get_record(parent_id)
+        if parent_record is None:
+            return
+        (parent_id, parent_guid, parent_uri, parent_title, position,
+         grand_parent_guid, grand_parent_name, tags) = parent_record
+        record = {}
+        record["id"] = parent_guid
+        record["type"] = "folder"
+        # A parent with parent as unfiled needs to be moved to places
+        # Firefox internal
+        if grand_parent_guid == "unfiled":
+            grand_parent_guid = "places"
+        record["parentid"] = grand_parent_guid
+        record["parentName"] = grand_parent_name
+        record["title"] = parent_title
+        record["children"] = App().bookmarks.get_children(parent_guid)
+        self.__pending_records["bookmarks"].append(record)
+
     def __push_password(self, user_form_name, user_form_value, pass_form_name,
                         pass_form_value, uri, form_uri, uuid, sync=True):
         """
@@ -630,15 +650,19 @@ class SyncWorker(GObject.Object):
             ######################
             # History Management #
             ######################
-            for history_id in App().history.get_from_atime(0):
-                self.__push_history(history_id, False)
+            history_ids = App().history.get_from_atime(0)
+            for record in App().history.get_records(history_ids):
+                self.__add_history_record(record)
 
             self.__check_worker()
             ########################
             # Bookmarks Management #
             ########################
-            for (bookmark_id, title, uri) in App().bookmarks.get_bookmarks():
-                self.__push_bookmark(bookmark_id, False)
+            bookmark_ids = [bookmark_id for (bookmark_id, title, uri)
+                            in App().bookmarks.get_bookmarks()]
+            folders = set()
+            for record in App().bookmarks.get_records(bookmark_ids):
+                self.__add_bookmark_record(record, folders)
             self.__check_worker()
             self.__sync_pendings()
             Logger.sync_debug("Stop pushing")
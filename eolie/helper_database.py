@@ -0,0 +1,98 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from threading import Thread
+from queue import Queue
+
+from eolie.logger import Logger
+
+
+class DatabaseHelper:
+    """
+        Run database queries off the main loop
+        Queries run in a small pool of worker threads, each one keeping
+        its own pooled connection per database
+    """
+    WORKERS = 2
+
+    def __init__(self):
+        """
+            Init helper and start worker threads
+        """
+        self.__queue = Queue()
+        self.__threads = []
+        for i in range(0, self.WORKERS):
+            thread = Thread(target=self.__run,
+                            name="DatabaseHelper%s" % i)
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+
+    def run(self, command, *args, callback=(None,), cancellable=None):
+        """
+            Run database command with params and return to callback
+            Callback is not called if cancellable has been cancelled
+            @param command as database bound method
+            @param *args as command arguments
+            @param callback as (function, *args)
+            @param cancellable as Gio.Cancellable/None
+        """
+        self.__queue.put((command, args, callback, cancellable))
+
+    def stop(self):
+        """
+            Stop worker threads, pending commands are dropped
+        """
+        while not self.__queue.empty():
+            self.__queue.get_nowait()
+        for thread in self.__threads:
+            self.__queue.put(None)
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+#######################
+# PRIVATE             #
+#######################
+    def __run(self):
+        """
+            Run queued commands
+            @thread safe
+        """
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            (command, args, callback, cancellable) = item
+            if cancellable is not None and cancellable.is_cancelled():
+                continue
+            try:
+                result = command(*args)
+                (function, *callback_args) = callback
+                if function is not None:
+                    GLib.idle_add(self.__deliver, cancellable,
+                                  function, result, *callback_args)
+            except Exception as e:
+                Logger.error("DatabaseHelper::__run(): %s, %s", e, command)
+
+    def __deliver(self, cancellable, function, result, *args):
+        """
+            Pass result to function if not cancelled
+            @param cancellable as Gio.Cancellable/None
+            @param function as function
+            @param result as object
+            @param *args as function arguments
+        """
+        if cancellable is None or not cancellable.is_cancelled():
+            function(result, *args)
@@ -0,0 +1,270 @@
+# Copyright (c) 2017-2021 Cedric Bellegarde <cedric.bellegarde@adishatz.org>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GLib
+
+from threading import Thread
+from time import time, monotonic, sleep
+
+from eolie.define import App, TimeSpan, TimeSpanValues
+from eolie.sqlcursor import SqlCursor
+from eolie.logger import Logger
+
+
+class MaintenanceScheduler:
+    """
+        Run database and cache maintenance while application is idle
+        Tasks are generators: each step does a bounded amount of work and
+        yields reclaimed bytes. Steps run in a background thread, which
+        stops between two steps as soon as application is busy again
+    """
+    # Seconds between two idle checks
+    __INTERVAL = 30
+    # Seconds to wait for running step on stop
+    __STOP_TIMEOUT = 2
+    # Seconds to sleep between two steps
+    __STEP_PAUSE = 0.05
+    # Rows removed by an history expiry step
+    __EXPIRE_LIMIT = 500
+    # History entries to keep, unless history is kept forever
+    __MAX_HISTORY = 100000
+    # History entries updated by a frecency step
+    __FRECENCY_LIMIT = 1000
+    # Pages freed by an incremental vacuum step
+    __VACUUM_PAGES = 256
+
+    def __init__(self):
+        """
+            Init scheduler
+        """
+        # (name, period in seconds, task)
+        self.__tasks = [
+            ("history", 21600, self.__update_history),
+            ("expire", 3600, self.__expire_history),
+            ("vacuum", 86400, self.__vacuum_databases),
+            ("optimize", 86400, self.__optimize_databases),
+            ("art", 86400, self.__vacuum_art),
+            ("css", 86400, self.__vacuum_css)]
+        self.__last_runs = {}
+        # (name, generator, duration, reclaimed bytes)
+        self.__current = None
+        self.__idle = False
+        self.__stopped = False
+        self.__thread = None
+        GLib.timeout_add_seconds(self.__INTERVAL, self.__on_timeout)
+
+    def pause(self):
+        """
+            Stop running steps until application is idle again
+        """
+        self.__idle = False
+
+    def stop(self):
+        """
+            Stop scheduler, wait for running step
+        """
+        self.__stopped = True
+        if self.__thread is not None:
+            # Thread is a daemon, do not delay quit for a slow step
+            self.__thread.join(self.__STOP_TIMEOUT)
+            if self.__thread.is_alive():
+                Logger.warning("MaintenanceScheduler::stop(): step running")
+            self.__thread = None
+
+#######################
+# PRIVATE             #
+#######################
+    def __is_idle(self):
+        """
+            True if no page is loading
+            @return bool
+        """
+        for window in App().windows:
+            for webview in window.container.webviews:
+                if webview.is_loading():
+                    return False
+        return True
+
+    def __get_due_task(self):
+        """
+            Get next task to run
+            @return (str, generator)/None
+        """
+        now = time()
+        for (name, period, task) in self.__tasks:
+            if now - self.__last_runs.get(name, 0) >= period:
+                return (name, task())
+        return None
+
+    def __run(self):
+        """
+            Run steps while application is idle
+            @thread safe
+        """
+        while self.__idle and not self.__stopped:
+            if self.__current is None:
+                due = self.__get_due_task()
+                if due is None:
+                    break
+                self.__current = [due[0], due[1], 0, 0]
+            (name, task, duration, reclaimed) = self.__current
+            start = monotonic()
+            try:
+                reclaimed += next(task)
+                done = False
+            except StopIteration:
+                done = True
+            except Exception as e:
+                Logger.error("MaintenanceScheduler::__run(): %s, %s",
+                             name, e)
+                done = True
+            duration += monotonic() - start
+            self.__current = [name, task, duration, reclaimed]
+            if done:
+                Logger.info("MaintenanceScheduler: %s took %.3fs,"
+                            " reclaimed %s bytes", name, duration, reclaimed)
+                self.__last_runs[name] = time()
+                self.__current = None
+            sleep(self.__STEP_PAUSE)
+
+    def __get_sizes(self, db):
+        """
+            Get database size and free space
+            @param db as Database
+            @return (int, int) as (bytes, free bytes)
+        """
+        with SqlCursor(db) as sql:
+            page_size = sql.execute("PRAGMA page_size").fetchone()[0]
+            page_count = sql.execute("PRAGMA page_count").fetchone()[0]
+            freelist = sql.execute("PRAGMA freelist_count").fetchone()[0]
+            return (page_count * page_size, freelist * page_size)
+
+    def __update_history(self):
+        """
+            Compact old visits and update frecencies
+            @return generator of reclaimed bytes
+        """
+        (size, free) = self.__get_sizes(App().history)
+        App().history.compact_atimes()
+        yield self.__get_sizes(App().history)[1] - free
+        # Do not hold write lock for whole history
+        last_id = 0
+        while last_id is not None:
+            last_id = App().history.update_frecencies(
+                last_id, self.__FRECENCY_LIMIT)
+            yield 0
+
+    def __expire_history(self):
+        """
+            Remove visits older than history storage setting and entries
+            over history budget
+            @return generator of reclaimed bytes
+        """
+        active_id = str(App().settings.get_enum("history-storage"))
+        if active_id in [TimeSpan.FOREVER, TimeSpan.NEVER]:
+            atime = None
+        else:
+            atime = int(time() - TimeSpanValues[active_id] / 1000000)
+        # User wants to keep everything
+        if active_id == TimeSpan.FOREVER:
+            max_rows = None
+        else:
+            max_rows = self.__MAX_HISTORY
+        removed = None
+        while removed != 0:
+            (size, free) = self.__get_sizes(App().history)
+            removed = App().history.expire(atime, max_rows,
+                                           self.__EXPIRE_LIMIT)
+            yield self.__get_sizes(App().history)[1] - free
+
+    def __vacuum_databases(self):
+        """
+            Give free pages back to filesystem
+            @return generator of reclaimed bytes
+        """
+        for db in [App().history, App().bookmarks]:
+            with SqlCursor(db) as sql:
+                mode = sql.execute("PRAGMA auto_vacuum").fetchone()[0]
+            (size, free) = self.__get_sizes(db)
+            # Switched by DatabaseUpgrade, a full VACUUM is needed once
+            if mode != 2:
+                self.__vacuum_full(db)
+                yield size - self.__get_sizes(db)[0]
+                continue
+            while free > 0:
+                # execute() would only free one page per call
+                with SqlCursor(db) as sql:
+                    sql.executescript("PRAGMA incremental_vacuum(%s)" %
+                                      self.__VACUUM_PAGES)
+                (new_size, new_free) = self.__get_sizes(db)
+                yield size - new_size
+                # Pages are in use again or can not be freed
+                if new_free >= free:
+                    break
+                (size, free) = (new_size, new_free)
+
+    def __vacuum_full(self, db):
+        """
+            Rebuild database with incremental auto vacuum
+            @param db as Database
+        """
+        with SqlCursor(db) as sql:
+            # VACUUM can not run in a transaction
+            sql.commit()
+            sql.isolation_level = None
+            try:
+                sql.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                sql.execute("VACUUM")
+            finally:
+                sql.isolation_level = ""
+
+    def __optimize_databases(self):
+        """
+            Let SQLite update its query planner statistics
+            @return generator of reclaimed bytes
+        """
+        for db in [App().history, App().bookmarks, App().websettings]:
+            with SqlCursor(db) as sql:
+                sql.execute("PRAGMA optimize")
+            yield 0
+
+    def __vacuum_art(self):
+        """
+            Remove old artwork
+            @return generator of reclaimed bytes
+        """
+        for reclaimed in App().art.vacuum():
+            yield reclaimed
+
+    def __vacuum_css(self):
+        """
+            Remove old night mode stylesheets
+            @return generator of reclaimed bytes
+        """
+        for reclaimed in App().stylesheet_cache.vacuum():
+            yield reclaimed
+
+    def __on_timeout(self):
+        """
+            Start or pause maintenance
+            @return bool
+        """
+        if self.__stopped:
+            return False
+        self.__idle = self.__is_idle()
+        if self.__idle and (self.__thread is None or
+                            not self.__thread.is_alive()):
+            self.__thread = Thread(target=self.__run,
+                                   name="MaintenanceScheduler")
+            self.__thread.daemon = True
+            self.__thread.start()
+        return True
@@ -155,6 +155,8 @@ class ScriptsMenu(Gtk.Grid):
             @return bool
         """
         content_blocker = App().get_content_blocker("block-scripts")
+        if content_blocker is None:
+            return False
         if script == ".*":
             uri = ".*"
         else:
@@ -216,6 +218,8 @@ class ScriptsMenu(Gtk.Grid):
         """
         parsed = urlparse(self.__window.container.webview.uri)
         content_blocker = App().get_content_blocker("block-scripts")
+        if content_blocker is None:
+            return
         if row.uri == self.__ALLOW_ALL:
             uri = ".*"
             for _row in self.__listbox.get_children()[1:]:
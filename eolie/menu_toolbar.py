@@ -58,8 +58,11 @@ class ToolbarMenu(Gtk.PopoverMenu):
                             "block-images", "block-medias"]:
                 if not App().settings.get_value(blocker):
                     continue
-                builder.get_object(blocker).show()
+                # Content blockers are created after first window
                 content_blocker = App().get_content_blocker(blocker)
+                if content_blocker is None:
+                    continue
+                builder.get_object(blocker).show()
                 exception = content_blocker.exceptions.is_domain_exception(
                     netloc)
                 action = Gio.SimpleAction.new_stateful(
@@ -71,8 +74,9 @@ class ToolbarMenu(Gtk.PopoverMenu):
                                netloc,
                                blocker)
                 window.add_action(action)
+            websettings = App().websettings.get_all(uri)
             # Audio policy
-            netloc_audio = App().websettings.get("audio", uri)
+            netloc_audio = websettings["audio"]
             builder.get_object("audio_policy").show()
             action = Gio.SimpleAction.new_stateful(
                     "audio-policy",
@@ -84,7 +88,7 @@ class ToolbarMenu(Gtk.PopoverMenu):
             window.add_action(action)
             # Night mode
             night_mode = App().settings.get_value("night-mode")
-            netloc_night_mode = App().websettings.get("night_mode", uri)
+            netloc_night_mode = websettings.get("night_mode")
             builder.get_object("night_mode").show()
             enabled = night_mode and netloc_night_mode in [1, None]
             action = Gio.SimpleAction.new_stateful(
@@ -183,6 +187,8 @@ class ToolbarMenu(Gtk.PopoverMenu):
         """
         action.set_state(param)
         content_blocker = App().get_content_blocker(blocker)
+        if content_blocker is None:
+            return
         if content_blocker.exceptions.is_domain_exception(domain):
             content_blocker.exceptions.remove_domain_exception(domain)
         else:
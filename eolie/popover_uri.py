@@ -173,12 +173,14 @@ class UriPopover(Gtk.Popover, UriPopoverEvents, UriPopoverContent,
             Remove bookmarks
             @param button as Gtk.Button
         """
-        for row in self._bookmarks_box.get_selected_rows():
-            item_id = row.item.get_property("id")
-            if App().sync_worker is not None:
-                guid = App().bookmarks.get_guid(item_id)
+        rows = self._bookmarks_box.get_selected_rows()
+        if App().sync_worker is not None:
+            ids = [row.item.get_property("id") for row in rows]
+            for (bookmark_id, guid, *ignore) in \
+                    App().bookmarks.get_records(ids):
                 App().sync_worker.remove_from_bookmarks(guid)
-            App().bookmarks.remove(item_id)
+        for row in rows:
+            App().bookmarks.remove(row.item.get_property("id"))
             self._bookmarks_box.remove(row)
             self._remove_button.hide()
         App().bookmarks.clean_tags()
@@ -268,8 +270,9 @@ class UriPopover(Gtk.Popover, UriPopoverEvents, UriPopoverContent,
                    _("Recent")),
                   (Type.UNCLASSIFIED,
                    _("Unclassified"))]
-        GLib.idle_add(self._add_tags,
-                      static + App().bookmarks.get_all_tags(), current)
+        App().database_helper.run(
+            App().bookmarks.get_all_tags,
+            callback=(lambda tags: self._add_tags(static + tags, current),))
 
     def _on_day_selected(self, calendar):
         """
@@ -279,9 +282,10 @@ class UriPopover(Gtk.Popover, UriPopoverEvents, UriPopoverContent,
         (year, month, day) = calendar.get_date()
         date = datetime(year, month + 1, day, 0, 0)
         atime = mktime(date.timetuple())
-        result = App().history.get(atime)
         self._history_model.remove_all()
-        GLib.idle_add(self._add_history_items, result, (year, month, day))
+        App().database_helper.run(App().history.get, atime,
+                                  callback=(self._add_history_items,
+                                            (year, month, day)))
         self.__infobar.hide()
 
     def _on_clear_history_clicked(self, button):
@@ -32,6 +32,7 @@ class UriPopoverContent:
         self._input = None
         self._bookmarks_model = Gio.ListStore()
         self._history_model = Gio.ListStore()
+        self.__bookmarks_cancellable = Gio.Cancellable.new()
 
     def search_value(self, value, cancellable):
         """
@@ -39,7 +40,9 @@ class UriPopoverContent:
            @param value as str
            @param cancellable as Gio.Cancellable
         """
-        self._task_helper.run(self.__search_value, value, cancellable)
+        App().database_helper.run(self.__search_value, value,
+                                  callback=(self.__add_searches, cancellable),
+                                  cancellable=cancellable)
 
 #######################
 # PROTECTED           #
@@ -111,18 +114,13 @@ class UriPopoverContent:
             Set bookmarks for tag id
             @param tag id as int
         """
+        self.__bookmarks_cancellable.cancel()
+        self.__bookmarks_cancellable = Gio.Cancellable.new()
         self._bookmarks_model.remove_all()
         self._remove_button.hide()
-        if tag_id == Type.POPULARS:
-            items = App().bookmarks.get_populars(50)
-        elif tag_id == Type.RECENTS:
-            items = App().bookmarks.get_recents()
-        elif tag_id == Type.UNCLASSIFIED:
-            items = App().bookmarks.get_unclassified()
-        else:
-            items = App().bookmarks.get_bookmarks(tag_id)
-        self._bookmarks_count.set_text(_("%s bookmarks") % len(items))
-        GLib.idle_add(self._add_bookmarks, items)
+        App().database_helper.run(App().bookmarks.get_for_tag, tag_id,
+                                  callback=(self.__on_get_bookmarks,),
+                                  cancellable=self.__bookmarks_cancellable)
 
     def _get_current_box(self):
         """
@@ -156,18 +154,19 @@ class UriPopoverContent:
 #######################
 # PRIVATE             #
 #######################
-    def __search_value(self, value, cancellable):
+    def __search_value(self, value):
         """
             Search for value in DB
             @param value as str
-            @param cancellable as Gio.Cancellable
+            @return [(str, str, int)]
+            @thread safe
         """
         if value == "":
             result = App().history.get_populars(25)
         else:
             result = App().bookmarks.search(value, 15)
             result += App().history.search(value, 15)
-        GLib.idle_add(self.__add_searches, result, cancellable)
+        return result
 
     def __add_searches(self, result, cancellable):
         """
@@ -189,6 +188,14 @@ class UriPopoverContent:
             self._search_box.add(child)
             GLib.idle_add(self.__add_searches, result, cancellable)
 
+    def __on_get_bookmarks(self, items):
+        """
+            Show bookmarks
+            @param items as [(int, str, str)]
+        """
+        self._bookmarks_count.set_text(_("%s bookmarks") % len(items))
+        self._add_bookmarks(items)
+
     def __on_row_activated(self, row):
         """
             Select row
@@ -242,21 +242,18 @@ class Row(Gtk.ListBoxRow):
             Open all bookmarks
             @param button as Gtk.Button
         """
+        def on_get_bookmarks(items):
+            i = 0
+            for (bid, uri, title) in items:
+                loading_type = wanted_loading_type(i)
+                self.__window.container.add_webview_for_uri(uri,
+                                                            loading_type)
+                i += 1
+
         self.__window.close_popovers()
         tag_id = self.__item.get_property("id")
-        if tag_id == Type.POPULARS:
-            items = App().bookmarks.get_populars(50)
-        elif tag_id == Type.RECENTS:
-            items = App().bookmarks.get_recents()
-        elif tag_id == Type.UNCLASSIFIED:
-            items = App().bookmarks.get_unclassified()
-        else:
-            items = App().bookmarks.get_bookmarks(tag_id)
-        i = 0
-        for (bid, uri, title) in items:
-            loading_type = wanted_loading_type(i)
-            self.__window.container.add_webview_for_uri(uri, loading_type)
-            i += 1
+        App().database_helper.run(App().bookmarks.get_for_tag, tag_id,
+                                  callback=(on_get_bookmarks,))
 
     def __on_delete_clicked(self, button):
         """
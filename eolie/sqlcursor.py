@@ -11,21 +11,43 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from threading import current_thread
+from sqlite3 import OperationalError
+from threading import current_thread, enumerate as threads, Lock
+from time import monotonic
 
 from eolie.define import App
+from eolie.logger import Logger
 
 
 class SqlCursor:
     """
         Context manager to get the SQL cursor
     """
+    # Connections kept alive per thread and database:
+    # {(thread ident, class name): [connection, depth, last use]}
+    __pool = {}
+    __pool_lock = Lock()
+    __last_eviction = 0
+    # DatabaseWriter with pending commands to wait for before reading
+    __writer = None
+    # Seconds before closing an unused connection
+    __IDLE_TIMEOUT = 60
+    # Seconds between two eviction passes
+    __EVICTION_INTERVAL = 30
+    # auto_vacuum only applies to new databases, others need a VACUUM
+    __PRAGMAS = ["PRAGMA auto_vacuum=INCREMENTAL",
+                 "PRAGMA journal_mode=WAL",
+                 "PRAGMA synchronous=NORMAL",
+                 "PRAGMA cache_size=-8192",
+                 "PRAGMA mmap_size=67108864",
+                 "PRAGMA temp_store=MEMORY"]
+
     def add(obj):
         """
             Add cursor to thread list
         """
         name = current_thread().getName() + obj.__class__.__name__
-        App().cursors[name] = obj.get_cursor()
+        App().cursors[name] = SqlCursor.connect(obj)
 
     def remove(obj):
         """
@@ -49,6 +71,47 @@ class SqlCursor:
             App().cursors[name].commit()
             obj.thread_lock.release()
 
+    def connect(obj):
+        """
+            Get a new connection for obj with tuned pragmas
+            @param obj as Database
+            @return sqlite3.Connection
+        """
+        c = obj.get_cursor()
+        for pragma in SqlCursor.__PRAGMAS:
+            try:
+                c.execute(pragma)
+            except OperationalError as e:
+                # Read only connections can not enable WAL
+                Logger.warning("SqlCursor::connect(): %s", e)
+        return c
+
+    def set_writer(writer):
+        """
+            Set write behind queue, cursors wait for its pending commands
+            @param writer as DatabaseWriter/None
+        """
+        SqlCursor.__writer = writer
+
+    def evict(force=False):
+        """
+            Close pooled connections owned by dead threads or unused for
+            too long
+            @param force as bool: close all unused connections
+        """
+        alive = [thread.ident for thread in threads()]
+        now = monotonic()
+        with SqlCursor.__pool_lock:
+            SqlCursor.__last_eviction = now
+            for key in list(SqlCursor.__pool.keys()):
+                (c, depth, atime) = SqlCursor.__pool[key]
+                if depth != 0:
+                    continue
+                if force or key[0] not in alive or\
+                        now - atime > SqlCursor.__IDLE_TIMEOUT:
+                    del SqlCursor.__pool[key]
+                    c.close()
+
     def __init__(self, obj, commit=False):
         """
             Init object
@@ -57,28 +120,56 @@ class SqlCursor:
         """
         self.__obj = obj
         self.__commit = commit
-        self.__cursor = None
+        self.__key = None
 
     def __enter__(self):
         """
-            Get thread cursor or a new one
+            Get thread cursor or a pooled one
         """
         name = current_thread().getName() + self.__obj.__class__.__name__
         if name in App().cursors.keys():
             cursor = App().cursors[name]
             return cursor
-        else:
-            self.__cursor = self.__obj.get_cursor()
-            return self.__cursor
+        if monotonic() - SqlCursor.__last_eviction >\
+                SqlCursor.__EVICTION_INTERVAL:
+            SqlCursor.evict()
+        self.__key = (current_thread().ident, self.__obj.__class__.__name__)
+        with SqlCursor.__pool_lock:
+            entry = SqlCursor.__pool.get(self.__key)
+            if entry is not None and entry[1] != 0:
+                entry[1] += 1
+                return entry[0]
+        # Read your writes, only outside of a transaction
+        writer = SqlCursor.__writer
+        if writer is not None:
+            writer.wait(self.__obj)
+        with SqlCursor.__pool_lock:
+            entry = SqlCursor.__pool.get(self.__key)
+            if entry is not None:
+                entry[1] += 1
+                return entry[0]
+        c = SqlCursor.connect(self.__obj)
+        with SqlCursor.__pool_lock:
+            SqlCursor.__pool[self.__key] = [c, 1, monotonic()]
+        return c
 
     def __exit__(self, type, value, traceback):
         """
-            Close cursor if not thread cursor
+            Release pooled cursor
         """
-        if self.__cursor is not None:
-            if self.__commit:
-                self.__obj.thread_lock.acquire()
-                self.__cursor.commit()
-                self.__obj.thread_lock.release()
-            self.__cursor.close()
-        self.__cursor = None
+        if self.__key is None:
+            return
+        with SqlCursor.__pool_lock:
+            entry = SqlCursor.__pool[self.__key]
+            entry[1] -= 1
+            entry[2] = monotonic()
+            depth = entry[1]
+        c = entry[0]
+        if self.__commit:
+            self.__obj.thread_lock.acquire()
+            c.commit()
+            self.__obj.thread_lock.release()
+        # Connection was closed before, uncommitted changes were dropped
+        elif depth == 0 and c.in_transaction:
+            c.rollback()
+        self.__key = None
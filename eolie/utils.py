@@ -13,6 +13,10 @@
 from gi.repository import Gdk, GLib, Gtk, Pango, GdkPixbuf
 
 from math import pi
+import json
+from os import replace
+from hashlib import md5
+from itertools import islice
 import unicodedata
 import string
 import cairo
@@ -275,6 +279,111 @@ def noaccents(string):
     return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 
+def get_fts_filters(words):
+    """
+        Split search words between a FTS5 trigram match expression and
+        words too short to be indexed (less than 3 chars)
+        @param words as [str]
+        @return (match as str/None, short words as [str])
+    """
+    tokens = []
+    likes = []
+    for word in words:
+        if len(word) < 3:
+            likes.append(word)
+        else:
+            tokens.append('"%s"' % word.replace('"', '""'))
+    if tokens:
+        return (" AND ".join(tokens), likes)
+    return (None, likes)
+
+
+def get_sql_chunks(ids, size=500):
+    """
+        Split ids for "IN (?, ...)" requests, SQLite limits host parameters
+        @param ids as [object]
+        @param size as int
+        @return generator of (placeholders as str, ids as [object])
+    """
+    for i in range(0, len(ids), size):
+        chunk = ids[i:i + size]
+        yield (", ".join(["?"] * len(chunk)), chunk)
+
+
+def get_json_items(stream, size=65536):
+    """
+        Read a JSON array item by item
+        @param stream as text file object
+        @param size as int: bytes read at once
+        @return generator of items
+        @raise ValueError if stream isn't a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip separators
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        item = end = None
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+        elif not started:
+            if buffer[position] != "[":
+                raise ValueError("Not a JSON array")
+            started = True
+            position += 1
+            continue
+        elif buffer[position] == "]":
+            return
+        else:
+            try:
+                (item, end) = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+            # A number may continue in next chunk: 1|.5, 1|e5, 12|3
+            if end is not None and (eof or (end < len(buffer) and
+                                            buffer[end] in " \t\r\n,]")):
+                position = end
+                yield item
+                continue
+        chunk = stream.read(size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def write_json_items(path, items, size=1000):
+    """
+        Write a JSON array item by item, file is replaced when written
+        @param path as str
+        @param items as iterable
+        @param size as int: items written at once
+        @return str as file checksum
+    """
+    checksum = md5()
+    items = iter(items)
+    with open(path + ".part", "wb") as stream:
+        stream.write(b"[")
+        checksum.update(b"[")
+        while True:
+            buffer = [json.dumps(item) for item in islice(items, size)]
+            if not buffer:
+                break
+            prefix = ", " if stream.tell() > 1 else ""
+            content = (prefix + ", ".join(buffer)).encode("utf-8")
+            checksum.update(content)
+            stream.write(content)
+        stream.write(b"]")
+        checksum.update(b"]")
+    replace(path + ".part", path)
+    return checksum.hexdigest()
+
+
 def get_ftp_cmd():
     """
         Try to guess best ftp app
@@ -199,6 +199,52 @@ class WebView(WebKit.WebView):
         if context.get_spell_checking_languages() != codes:
             context.set_spell_checking_languages(codes)
 
+    def update_content_filters(self, uri=None):
+        """
+            Add or remove content filters for uri
+            @param uri as str/None
+        """
+        netloc = urlparse(uri).netloc if uri else None
+        content_manager = self.get_user_content_manager()
+        for content_blocker in App().content_blockers:
+            content_filter = content_blocker.filter
+            if content_filter is None or not content_blocker.enabled or\
+                    (netloc and
+                     content_blocker.exceptions.is_domain_allowed(netloc)):
+                content_filter = None
+            current = self.__content_filters.get(content_blocker.name)
+            if current == content_filter:
+                continue
+            if current is not None:
+                content_manager.remove_filter(current)
+            if content_filter is not None:
+                content_manager.add_filter(content_filter)
+            self.__content_filters[content_blocker.name] = content_filter
+
+    def update_cosmetic_filter(self, uri=None):
+        """
+            Set element hiding style sheet for uri
+            @param uri as str/None
+        """
+        parsed = urlparse(uri) if uri else None
+        hostname = parsed.hostname if parsed else None
+        style_sheet = None
+        content_blocker = App().get_content_blocker("block-ads")
+        if hostname and content_blocker is not None and\
+                content_blocker.enabled and\
+                not content_blocker.exceptions.is_domain_allowed(
+                    parsed.netloc):
+            style_sheet = content_blocker.cosmetic_filter.get_style_sheet(
+                hostname)
+        if style_sheet == self.__cosmetic_style_sheet:
+            return
+        content_manager = self.get_user_content_manager()
+        if self.__cosmetic_style_sheet is not None:
+            content_manager.remove_style_sheet(self.__cosmetic_style_sheet)
+        if style_sheet is not None:
+            content_manager.add_style_sheet(style_sheet)
+        self.__cosmetic_style_sheet = style_sheet
+
     def add_text_entry(self, text):
         """
             Add an uri to text entry list
@@ -422,10 +468,10 @@ class WebView(WebKit.WebView):
         self.set_hexpand(True)
         self.set_vexpand(True)
         self.clear_text_entry()
-        content_manager = self.get_user_content_manager()
-        for content_filter in App().content_filters:
-            if content_filter is not None:
-                content_manager.add_filter(content_filter)
+        # Filters added to content manager: {blocker name: filter}
+        self.__content_filters = {}
+        self.__cosmetic_style_sheet = None
+        self.update_content_filters()
         if related is None:
             # Set settings
             settings = self.get_settings()
@@ -107,11 +107,28 @@ class WebViewArtwork:
         """
         self.__snapshot_id = None
         # Only save page if bookmarked
-        save = False
-        for uri in [self.uri, self.loaded_uri]:
+        App().database_helper.run(self.__is_bookmarked,
+                                  [self.uri, self.loaded_uri],
+                                  callback=(self.__get_snapshot,),
+                                  cancellable=self.__cancellable)
+
+    def __is_bookmarked(self, uris):
+        """
+            True if one of uris is bookmarked
+            @param uris as [str]
+            @return bool
+            @thread safe
+        """
+        for uri in uris:
             if uri is not None and App().bookmarks.get_id(uri) is not None:
-                save = True
-                break
+                return True
+        return False
+
+    def __get_snapshot(self, save):
+        """
+            Get webpage preview
+            @param save as bool
+        """
         self.get_snapshot(WebKit.SnapshotRegion.VISIBLE,
                           WebKit.SnapshotOptions.NONE,
                           self.__cancellable,
@@ -45,6 +45,34 @@ class WebViewErrors:
         """
         return self.__bad_tls
 
+    def show_phishing_warning(self, uri):
+        """
+            Show phishing warning page for uri
+            @param uri as str
+        """
+        self._loading_state = LoadingState.ERROR
+        f = Gio.File.new_for_uri("resource:///org/gnome/Eolie/error.css")
+        (status, css_content, tag) = f.load_contents(None)
+        css = css_content.decode("utf-8")
+        f = Gio.File.new_for_uri("resource:///org/gnome/Eolie/error.html")
+        (status, content, tag) = f.load_contents(None)
+        html = content.decode("utf-8")
+        html = html % (_("Deceptive website"),
+                       css,
+                       App().start_page,
+                       "internal://dialog-warning-symbolic",
+                       _("Deceptive website"),
+                       uri,
+                       _("This website is known for phishing.<br/>"
+                         "Attackers might be trying to trick you into"
+                         " installing software or revealing personal"
+                         " information (for example, passwords or credit"
+                         " card information)."),
+                       "suggested-action",
+                       _("Leave this website"))
+        # Alternate HTML for unreachable uri does not go through policy
+        self.load_alternate_html(html, uri)
+
 #######################
 # PROTECTED           #
 #######################
@@ -83,7 +83,8 @@ class WebViewNavigation:
             self.stop_loading()
             self.set_uri(uri)
             self.__loaded_uri = self.uri
-            GLib.idle_add(WebKit.WebView.load_uri, self, uri)
+            App().run_when_content_filters_ready(WebKit.WebView.load_uri,
+                                                 self, uri)
 
     @property
     def loaded_uri(self):
@@ -118,7 +119,10 @@ class WebViewNavigation:
         parsed = urlparse(webview.uri)
         if event == WebKit.LoadEvent.STARTED:
             self._loading_state = LoadingState.LOADING
+            App().maintenance_scheduler.pause()
         elif event == WebKit.LoadEvent.COMMITTED:
+            self.update_content_filters(webview.uri)
+            self.update_cosmetic_filter(webview.uri)
             if parsed.scheme in ["http", "https"]:
                 emit_signal(self, "title-changed", webview.uri)
                 self.update_zoom_level()
@@ -127,7 +131,9 @@ class WebViewNavigation:
             if self._loading_state not in [LoadingState.STOPPED,
                                            LoadingState.ERROR]:
                 self._loading_state = LoadingState.NONE
-            App().history.set_page_state(self.uri)
+            App().database_writer.queue(App().history.set_page_state,
+                                        self.uri,
+                                        key=("page-state", self.uri))
             self.__update_bookmark_metadata(self.uri)
             self.update_spell_checking(self.uri)
             if App().show_tls:
@@ -166,9 +172,17 @@ class WebViewNavigation:
             Update bookmark access time/popularity
             @param uri as str
         """
-        if App().bookmarks.get_id(uri) is not None:
-            App().bookmarks.set_access_time(uri, round(time(), 2))
-            App().bookmarks.set_more_popular(uri)
+        def on_get_id(bookmark_id, uri, atime):
+            if bookmark_id is not None:
+                App().database_writer.queue(App().bookmarks.set_access_time,
+                                            uri, atime,
+                                            key=("access-time", uri))
+                App().database_writer.queue(App().bookmarks.set_more_popular,
+                                            uri)
+
+        App().database_helper.run(App().bookmarks.get_id, uri,
+                                  callback=(on_get_id, uri,
+                                            round(time(), 2)))
 
     def __on_run_as_modal(self, webview):
         Logger.info("WebView::__on_run_as_modal(): TODO")
@@ -211,6 +225,33 @@ class WebViewNavigation:
             notification.set_reveal_child(True)
         return True
 
+    def __is_phishing(self, uri):
+        """
+            True if uri host is in phishing domains index
+            @param uri as str
+            @return bool
+        """
+        content_blocker = App().get_content_blocker("block-phishing")
+        return content_blocker is not None and\
+            content_blocker.is_phishing(uri)
+
+    def __is_main_frame_action(self, navigation_action):
+        """
+            True if navigation action is for main frame
+            WebKit does not tell frame for navigation actions: pages load
+            frames with other navigations. Links, forms and history are
+            checked, even in frames
+            @param navigation_action as WebKit.NavigationAction
+            @return bool
+        """
+        if navigation_action.get_navigation_type() !=\
+                WebKit.NavigationType.OTHER:
+            return True
+        # Loaded with load_uri()
+        uri = navigation_action.get_request().get_uri()
+        return self.__loaded_uri is not None and\
+            uri.rstrip("/") == self.__loaded_uri.rstrip("/")
+
     def __on_decide_policy(self, webview, decision, decision_type):
         """
             Navigation policy
@@ -225,6 +266,16 @@ class WebViewNavigation:
             mime_type = response.props.mime_type
             uri = response.get_uri()
             parsed = urlparse(uri)
+            # Before subresources load, uri is known after redirects
+            if decision.is_main_frame_main_resource():
+                # Only pages are checked, WebKit tells main frame for
+                # responses only
+                if parsed.scheme in ["http", "https"] and\
+                        self.__is_phishing(uri):
+                    decision.ignore()
+                    self.show_phishing_warning(uri)
+                    return True
+                self.update_content_filters(uri)
             if mime_type in self.__MIMES:
                 decision.use()
                 return False
@@ -258,8 +309,16 @@ class WebViewNavigation:
         mouse_button = navigation_action.get_mouse_button()
         parsed_navigation = urlparse(navigation_uri)
         self.clear_text_entry()
-        if parsed_navigation.scheme not in ["http", "https", "file", "about",
-                                            "populars", "accept"]:
+        # Do not send request (and form data) to a phishing domain
+        if decision_type == WebKit.PolicyDecisionType.NAVIGATION_ACTION and\
+                parsed_navigation.scheme in ["http", "https"] and\
+                self.__is_main_frame_action(navigation_action) and\
+                self.__is_phishing(navigation_uri):
+            decision.ignore()
+            self.show_phishing_warning(navigation_uri)
+            return True
+        elif parsed_navigation.scheme not in ["http", "https", "file",
+                                              "about", "populars", "accept"]:
             try:
                 Gtk.show_uri_on_window(self.window,
                                        navigation_uri,
@@ -30,6 +30,7 @@ class WebViewNightMode:
         self.__night_mode = False
         self.__started_time = 0
         self.__css_uri = None
+        self.__user_style_sheet = None
         self.__cancellable = Gio.Cancellable.new()
         self.__stylesheets = StyleSheets()
         self.__stylesheets.set_cancellable(self.__cancellable)
@@ -90,7 +91,7 @@ class WebViewNightMode:
             self.run_javascript_from_gresource(
                 "/org/gnome/Eolie/javascript/GetCSS.js", None, None)
         else:
-            self.get_user_content_manager().remove_all_style_sheets()
+            self.__remove_style_sheets()
 
     def remove_night_mode_cache(self):
         """
@@ -116,7 +117,7 @@ class WebViewNightMode:
             @param event as WebKit.LoadEvent
         """
         if not self.__should_apply_night_mode():
-            self.get_user_content_manager().remove_all_style_sheets()
+            self.__remove_style_sheets()
             return
         if event == WebKit.LoadEvent.STARTED:
             self.__css_uri = None
@@ -142,6 +143,16 @@ class WebViewNightMode:
         netloc_night_mode = App().websettings.get("night_mode", self.uri)
         return night_mode and netloc_night_mode in [1, None]
 
+    def __remove_style_sheets(self):
+        """
+            Remove night mode style sheets, keep other user style sheets
+        """
+        content_manager = self.get_user_content_manager()
+        content_manager.remove_style_sheet(self.__default_stylesheet)
+        if self.__user_style_sheet is not None:
+            content_manager.remove_style_sheet(self.__user_style_sheet)
+            self.__user_style_sheet = None
+
     def __on_stylesheets_not_cached(self, stylesheets):
         """
             Apply stylesheets
@@ -158,16 +169,16 @@ class WebViewNightMode:
             Apply stylesheets
             @param stylesheets as StyleSheets
         """
+        self.__remove_style_sheets()
         content_manager = self.get_user_content_manager()
-        content_manager.remove_all_style_sheets()
         content_manager.add_style_sheet(self.__default_stylesheet)
-        user_style_sheet = WebKit.UserStyleSheet(
+        self.__user_style_sheet = WebKit.UserStyleSheet(
                  stylesheets.get_css_text(self.__started_time),
                  WebKit.UserContentInjectedFrames.ALL_FRAMES,
                  WebKit.UserStyleLevel.USER,
                  None,
                  None)
-        content_manager.add_style_sheet(user_style_sheet)
+        content_manager.add_style_sheet(self.__user_style_sheet)
         GLib.timeout_add(250, self.run_javascript, """
             html = document.querySelector("html");
             if (html !== null) {
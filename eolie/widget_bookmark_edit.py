@@ -136,8 +136,14 @@ class BookmarkEditWidget(Adw.Bin):
         self.__remove_tag_button = builder.get_object("remove_tag_button")
         self.__title_entry = builder.get_object("title_entry")
         self.__uri_entry = builder.get_object("uri_entry")
-        self.__title_entry.set_text(App().bookmarks.get_title(bookmark_id))
-        self.__uri_entry.set_text(App().bookmarks.get_uri(bookmark_id))
+        record = App().bookmarks.get_record(bookmark_id)
+        # Bookmark may have been removed meanwhile (sync)
+        if record is None:
+            (uri, title, tags) = ("", "", [])
+        else:
+            (uri, title, tags) = (record[2], record[3], record[7])
+        self.__title_entry.set_text(title)
+        self.__uri_entry.set_text(uri)
         builder.get_object("startup_button").set_active(
             App().bookmarks.get_startup(bookmark_id))
         self.__new_tag_entry = builder.get_object("new_tag_entry")
@@ -152,7 +158,7 @@ class BookmarkEditWidget(Adw.Bin):
         for (tag_id, title) in App().bookmarks.get_all_tags():
             self.__completion_model.append([title])
 
-        for title in App().bookmarks.get_tags(bookmark_id):
+        for title in tags:
             tag = TagWidget(title, bookmark_id)
             tag.show()
             self.__flowbox.add(tag)
@@ -191,8 +191,7 @@ class UriEntryIcons(Gtk.Grid):
             Add/Remove page to/from bookmarks
             @param button as Gtk.Button
         """
-        def on_popover_closed(popover, webview):
-            bookmark_id = App().bookmarks.get_id(webview.uri)
+        def on_get_id(bookmark_id):
             image = self.__bookmark_button.get_image()
             if bookmark_id is None:
                 image.set_from_icon_name(
@@ -201,14 +200,11 @@ class UriEntryIcons(Gtk.Grid):
                 image.set_from_icon_name(
                     "starred-symbolic", Gtk.IconSize.BUTTON)
 
-        webview = self.__window.container.webview
-        icon_name = self.__bookmark_button.get_image().get_icon_name()[0]
-        if icon_name == "edit-clear-symbolic":
-            self.__entry.delete_text(0, -1)
-            webview.clear_text_entry()
-            self.__entry.grab_focus()
-        else:
-            bookmark_id = App().bookmarks.get_id(webview.uri)
+        def on_popover_closed(popover, webview):
+            App().database_helper.run(App().bookmarks.get_id, webview.uri,
+                                      callback=(on_get_id,))
+
+        def on_edit(bookmark_id, webview):
             if bookmark_id is None:
                 image = self.__bookmark_button.get_image()
                 image.set_from_icon_name(
@@ -223,3 +219,13 @@ class UriEntryIcons(Gtk.Grid):
             popover.connect("closed", on_popover_closed, webview)
             popover.add(widget)
             popover.popup()
+
+        webview = self.__window.container.webview
+        icon_name = self.__bookmark_button.get_image().get_icon_name()[0]
+        if icon_name == "edit-clear-symbolic":
+            self.__entry.delete_text(0, -1)
+            webview.clear_text_entry()
+            self.__entry.grab_focus()
+        else:
+            App().database_helper.run(App().bookmarks.get_id, webview.uri,
+                                      callback=(on_edit, webview))
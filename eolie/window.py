@@ -397,7 +397,7 @@ class Window(Adw.ApplicationWindow, WindowState):
             else:
                 self.fullscreen()
         elif string == "quit":
-            App().quit(True)
+            App().quit()
         elif string == "new_page":
             self.container.add_webview_for_uri(App().start_page,
                                                LoadingType.FOREGROUND)